@@ -0,0 +1,299 @@
+"""
+git_merge_auto 的基准测试: 用 git fast-import 生成指定规模的合成仓库和本地裸仓库 "origin"，
+离线测量 execute_git_workflow 和 continue_after_conflict 的端到端耗时和各步骤耗时，结果输出为JSON
+
+用法:
+    python benchmark.py [--sizes small,medium] [--scenarios clean,conflict,race] [--modes checkout,merge-tree]
+                        [--repeat 3] [--output result.json] [--workdir 目录] [--keep]
+
+规模可以是预设名称（见 SIZES），也可以是 "<文件数>x<提交数>"，例如 1000x200
+"""
+import os
+import sys
+import json
+import time
+import shutil
+import platform
+import statistics
+import subprocess
+import tempfile
+from datetime import datetime
+
+import git_merge_auto
+from git_merge_auto import get_cli_option
+
+# 预设规模: 名称 -> (文件数, 提交数)
+SIZES = {
+    "small": (100, 50),
+    "medium": (10000, 5000),
+    "large": (100000, 50000),
+}
+
+# 引擎模式: 名称 -> WorkflowRunner的可选参数
+MODES = {
+    "checkout": {},
+    "fetch-once": {"fetch_once": True},
+    "worktree": {"use_worktree": True},
+    "merge-tree": {"engine": "merge-tree"},
+}
+
+# 场景: clean 上游和开发分支修改不同文件，conflict 修改同一文件的同一行（步骤1出现冲突），
+# race 与clean相同，但步骤1完成后origin的develop再前进一个提交，快进推送被拒绝，
+# 测量回退到完整合并流程（merge-tree引擎为重新合并后重试推送）的耗时
+SCENARIOS = ("clean", "conflict", "race")
+
+# 每个目录中的文件数，避免单个目录过大
+FILES_PER_DIR = 1000
+
+def log(message):
+    """进度信息输出到stderr，stdout只输出JSON结果"""
+    print(message, file=sys.stderr, flush=True)
+
+def git(args, cwd, input_data=None):
+    """执行git命令，失败时抛出CalledProcessError"""
+    return subprocess.run(
+        ['git'] + args,
+        cwd=cwd,
+        input=input_data,
+        capture_output=True,
+        check=True
+    ).stdout
+
+def file_path(index):
+    """合成仓库中第index个文件的路径"""
+    return f"d{index // FILES_PER_DIR:03d}/f{index:06d}.txt"
+
+def file_content(index, revision):
+    """第index个文件在第revision次修改后的内容"""
+    return f"file {index}\nrevision {revision}\n" + "lorem ipsum dolor sit amet\n" * 8
+
+def data_block(text):
+    """fast-import 的 data 命令"""
+    data = text.encode('utf-8')
+    return b"data %d\n%s\n" % (len(data), data)
+
+def fast_import_stream(files, commits):
+    """
+    生成 fast-import 输入: 第一个提交添加全部文件，之后每个提交修改一个文件，都位于 refs/heads/develop
+    """
+    timestamp = 1700000000
+    yield b"commit refs/heads/develop\n"
+    yield b"committer Bench <bench@example.com> %d +0000\n" % timestamp
+    yield data_block("initial")
+    for index in range(files):
+        yield b"M 100644 inline %s\n" % file_path(index).encode()
+        yield data_block(file_content(index, 0))
+
+    for number in range(1, commits):
+        index = (number * 7919) % files
+        yield b"commit refs/heads/develop\n"
+        yield b"committer Bench <bench@example.com> %d +0000\n" % (timestamp + number)
+        yield data_block(f"change {number}")
+        yield b"M 100644 inline %s\n" % file_path(index).encode()
+        yield data_block(file_content(index, number))
+
+def build_template(directory, files, commits):
+    """用 fast-import 生成只有develop分支的裸仓库模板"""
+    git(['init', '-q', '--bare', directory], cwd=None)
+    process = subprocess.Popen(['git', 'fast-import', '--quiet'], cwd=directory, stdin=subprocess.PIPE)
+    for chunk in fast_import_stream(files, commits):
+        process.stdin.write(chunk)
+    process.stdin.close()
+    if process.wait() != 0:
+        raise RuntimeError("git fast-import 失败")
+    git(['symbolic-ref', 'HEAD', 'refs/heads/develop'], cwd=directory)
+
+def advance_origin(origin, index, text):
+    """在裸仓库的develop分支上直接追加一个修改第index个文件的提交（模拟其他人的推送）"""
+    stream = b"".join([
+        b"commit refs/heads/develop\n",
+        b"committer Upstream <upstream@example.com> %d +0000\n" % int(time.time()),
+        data_block("upstream change"),
+        b"from refs/heads/develop^0\n",
+        b"M 100644 inline %s\n" % file_path(index).encode(),
+        data_block(text),
+    ])
+    git(['fast-import', '--quiet'], cwd=origin, input_data=stream)
+
+def prepare_run(template, run_dir, files, scenario):
+    """复制模板作为origin，克隆并创建带一个提交的开发分支，然后让origin的develop前进一个提交"""
+    origin = os.path.join(run_dir, "origin.git")
+    clone = os.path.join(run_dir, "clone")
+    shutil.copytree(template, origin)
+    git(['clone', '-q', '--branch', 'develop', origin, clone], cwd=None)
+    git(['config', 'user.name', 'Bench'], cwd=clone)
+    git(['config', 'user.email', 'bench@example.com'], cwd=clone)
+    git(['checkout', '-q', '-b', 'feature'], cwd=clone)
+
+    feature_index = 0
+    with open(os.path.join(clone, file_path(feature_index)), 'w', encoding='utf-8', newline='\n') as f:
+        f.write(file_content(feature_index, "feature"))
+    git(['commit', '-q', '-am', 'feature change'], cwd=clone)
+
+    upstream_index = feature_index if scenario == "conflict" else files // 2
+    advance_origin(origin, upstream_index, file_content(upstream_index, "upstream"))
+    return clone
+
+def resolve_conflict(conflict):
+    """用开发分支的内容解决冲突文件并加入索引"""
+    directory = conflict["worktree"]
+    conflicted = git(['diff', '--name-only', '--diff-filter=U'], cwd=directory).decode().split()
+    for path in conflicted:
+        with open(os.path.join(directory, path), 'w', encoding='utf-8', newline='\n') as f:
+            f.write(file_content(0, "resolved"))
+    git(['add', '--'] + conflicted, cwd=directory)
+
+def timed(function, *args, on_event=None, **kwargs):
+    """执行工作流函数，收集step_finished事件，返回 (结果, 总耗时, 步骤耗时列表)；on_event 可以观察每个事件"""
+    steps = []
+
+    def event_callback(event):
+        if event["type"] == "step_finished" and not event.get("skipped"):
+            steps.append({"step": event["step"], "exit_code": event["exit_code"], "duration": event["duration"]})
+        if on_event:
+            on_event(event)
+
+    start = time.perf_counter()
+    result = function(*args, event_callback=event_callback, echo=False, record_history=False, **kwargs)
+    return result, round(time.perf_counter() - start, 4), steps
+
+def run_once(template, work_root, size_name, files, commits, scenario, mode, repeat):
+    """执行一次测量，返回结果字典"""
+    run_dir = tempfile.mkdtemp(prefix=f"{size_name}-{scenario}-{mode}-", dir=work_root)
+    try:
+        clone = prepare_run(template, run_dir, files, scenario)
+        options = MODES[mode]
+        if options.get("use_worktree"):
+            # 常驻工作树只在首次使用时创建，测量的是复用工作树时的耗时
+            git_merge_auto.WorkflowRunner(clone, "develop", echo=False, record_history=False, **options).ensure_worktree()
+
+        on_event = None
+        if scenario == "race":
+            origin = os.path.join(run_dir, "origin.git")
+            raced = []
+
+            def on_event(event):
+                # 步骤1（rebase）完成后模拟其他人推送，之后的快进推送因非快进被拒绝
+                if event["type"] == "step_finished" and event["step"] == 0 and not raced:
+                    raced.append(True)
+                    index = files // 2 + 1
+                    advance_origin(origin, index, file_content(index, "race"))
+
+        result, total, steps = timed(git_merge_auto.execute_git_workflow, clone, "develop", on_event=on_event, **options)
+        record = {
+            "size": size_name,
+            "files": files,
+            "commits": commits,
+            "scenario": scenario,
+            "mode": mode,
+            "repeat": repeat,
+            "total": total,
+            "steps": steps,
+        }
+
+        if isinstance(result, dict) and result.get("status") == "conflict":
+            record["conflict_step"] = result["step"]
+            resolve_conflict(dict(result, worktree=result.get("worktree") or clone))
+            result, continue_total, continue_steps = timed(
+                git_merge_auto.continue_after_conflict, clone, result["step"], result["branch"], "develop", **options
+            )
+            record["continue"] = {"total": continue_total, "steps": continue_steps}
+
+        record["outcome"] = "done" if result is True else "failed"
+        return record
+    finally:
+        git_merge_auto.close_query_services()
+        shutil.rmtree(run_dir, ignore_errors=True)
+
+def summarize(results):
+    """按 (规模, 场景, 模式) 汇总总耗时的中位数、最小值和最大值"""
+    groups = {}
+    for record in results:
+        total = record["total"] + record.get("continue", {}).get("total", 0)
+        groups.setdefault((record["size"], record["scenario"], record["mode"]), []).append(total)
+    return [
+        {
+            "size": size,
+            "scenario": scenario,
+            "mode": mode,
+            "runs": len(totals),
+            "median": round(statistics.median(totals), 4),
+            "min": round(min(totals), 4),
+            "max": round(max(totals), 4),
+        }
+        for (size, scenario, mode), totals in groups.items()
+    ]
+
+def parse_size(name):
+    """解析规模参数，返回 (文件数, 提交数)"""
+    if name in SIZES:
+        return SIZES[name]
+    files, _, commits = name.partition("x")
+    return int(files), int(commits)
+
+def parse_list(option, default, allowed=None):
+    """解析逗号分隔的参数列表"""
+    values = [value.strip() for value in get_cli_option(option, default).split(",") if value.strip()]
+    for value in values:
+        if allowed is not None and value not in allowed:
+            raise ValueError(f"无效的 {option} 参数: {value}")
+    return values
+
+def main():
+    try:
+        sizes = [(name, *parse_size(name)) for name in parse_list("--sizes", "small")]
+        scenarios = parse_list("--scenarios", ",".join(SCENARIOS), SCENARIOS)
+        modes = parse_list("--modes", ",".join(MODES), MODES)
+        repeats = int(get_cli_option("--repeat", "3"))
+    except ValueError as e:
+        log(f"[ERROR] {e}")
+        sys.exit(1)
+
+    # 冲突后 git rebase --continue 不打开编辑器
+    os.environ["GIT_EDITOR"] = "true"
+    # race 场景中推送重试前的退避等待是随机的，不计入测量
+    git_merge_auto.PUSH_RETRY_BASE_DELAY = 0
+
+    work_root = tempfile.mkdtemp(prefix="git-merge-bench-", dir=get_cli_option("--workdir"))
+    results = []
+    templates = {}
+    try:
+        for size_name, files, commits in sizes:
+            template = os.path.join(work_root, f"template-{size_name}.git")
+            log(f"生成 {size_name} 模板仓库: {files} 个文件, {commits} 个提交")
+            start = time.perf_counter()
+            build_template(template, files, commits)
+            templates[size_name] = {"files": files, "commits": commits, "build_time": round(time.perf_counter() - start, 2)}
+
+            for scenario in scenarios:
+                for mode in modes:
+                    for repeat in range(repeats):
+                        record = run_once(template, work_root, size_name, files, commits, scenario, mode, repeat)
+                        log(f"{size_name} {scenario} {mode} #{repeat + 1}: {record['outcome']} {record['total']}s")
+                        results.append(record)
+    finally:
+        if "--keep" not in sys.argv:
+            shutil.rmtree(work_root, ignore_errors=True)
+
+    report = {
+        "meta": {
+            "date": datetime.now().isoformat(timespec='seconds'),
+            "git": git(['--version'], cwd=None).decode().strip(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "templates": templates,
+        },
+        "summary": summarize(results),
+        "results": results,
+    }
+    report_json = json.dumps(report, ensure_ascii=False, indent=2)
+
+    output = get_cli_option("--output")
+    if output:
+        with open(output, 'w', encoding='utf-8') as f:
+            f.write(report_json)
+    print(report_json)
+    sys.exit(0 if all(record["outcome"] == "done" for record in results) else 1)
+
+if __name__ == "__main__":
+    main()
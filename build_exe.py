@@ -49,7 +49,8 @@ a = Analysis(
         ('git_merge_auto.py', '.'),
         ('git_macos_bigsur_icon_190141.ico', '.'),
     ],
-    hiddenimports=[],
+    # git_merge_auto.py 作为数据文件在运行时加载，PyInstaller无法分析它的导入
+    hiddenimports=['asyncio', 'concurrent.futures', 'sqlite3', 'http.server', 'urllib.request', 'urllib.error', 'random'],
     hookspath=[],
     hooksconfig={},
     runtime_hooks=[],
@@ -2,6 +2,23 @@ import os
 import sys
 import subprocess
 import json
+import math
+import re
+import time
+import random
+import sqlite3
+import unicodedata
+import heapq
+import atexit
+import signal
+import codecs
+import asyncio
+import threading
+import urllib.error
+import urllib.request
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
 from datetime import datetime
 
 # 颜色常量
@@ -10,6 +27,15 @@ COLOR_GREEN = "\033[32m"
 COLOR_YELLOW = "\033[33m"
 COLOR_RESET = "\033[0m"
 
+# 自定义返回码
+CONFLICT_RETURN_CODE = 10       # 检测到冲突
+TIMEOUT_RETURN_CODE = 124       # 超过总时长限制
+IDLE_TIMEOUT_RETURN_CODE = 125  # 超过无输出时长限制
+CANCELLED_RETURN_CODE = 130     # 被用户取消
+
+# 可取消的命令检查取消请求的间隔（秒）
+CANCEL_POLL_INTERVAL = 0.2
+
 def get_subprocess_flags():
     """获取subprocess的创建标志，在打包环境中隐藏控制台"""
     if hasattr(sys, '_MEIPASS') and os.name == 'nt':
@@ -50,331 +76,3755 @@ def log_warning(message):
     safe_print(f"{COLOR_YELLOW}[WARNING] {message}{COLOR_RESET}")
     safe_flush()
 
-def output_status(status_dict):
-    """输出状态信息到stdout，供GUI解析"""
-    safe_print(f"STATUS_JSON:{json.dumps(status_dict, ensure_ascii=False)}")
-    safe_flush()
+def pause_before_exit():
+    """在交互式终端中等待回车后再退出，打包环境和非交互环境直接返回"""
+    if hasattr(sys, '_MEIPASS'):
+        return
+    try:
+        if sys.stdin is not None and sys.stdin.isatty():
+            input("按回车键退出...")
+    except (EOFError, OSError):
+        pass
+
+# 工作流的步骤总数
+TOTAL_STEPS = 6
+
+# 输出样式对应的终端颜色，其它样式（command、step）不着色
+STYLE_COLORS = {"error": COLOR_RED, "success": COLOR_GREEN, "warning": COLOR_YELLOW}
+
+# git的进度行，例如 "Writing objects:  45% (9/20), 1.20 MiB | 3.40 MiB/s"
+PROGRESS_PATTERN = re.compile(r"^(?:remote: )?([A-Za-z][A-Za-z ]*):\s+(\d{1,3})% \(")
 
-def run_git_command(cmd, error_msg, allow_conflict=False, timeout=60, output_callback=None):
+def parse_progress(text):
+    """解析git的进度行，返回 (阶段, 百分比)，不是进度行时返回None"""
+    match = PROGRESS_PATTERN.match(text.strip())
+    if not match:
+        return None
+    return match.group(1), int(match.group(2))
+
+def open_event_log(path):
     """
-    执行git命令，添加超时机制，支持实时输出
+    以追加模式打开事件日志文件，返回写入事件的函数（线程安全，每个事件一行JSON）
+    """
+    log_file = open(path, 'a', encoding='utf-8', buffering=1)
+    lock = threading.Lock()
+    
+    def write_event(event):
+        with lock:
+            log_file.write(json.dumps(event, ensure_ascii=False) + "\n")
+    
+    atexit.register(log_file.close)
+    return write_event
+
+def build_git_env():
+    """构建执行git命令的环境变量，设置UTF-8编码"""
+    env = os.environ.copy()
+    env['LC_ALL'] = 'C.UTF-8'
+    env['LANG'] = 'C.UTF-8'
+    return env
+
+def kill_process_tree(process):
+    """终止进程及其所有子进程（shell启动的git以及git启动的ssh/远程助手等）"""
+    try:
+        if os.name == 'nt':
+            subprocess.run(
+                ['taskkill', '/F', '/T', '/PID', str(process.pid)],
+                capture_output=True,
+                creationflags=get_subprocess_flags()
+            )
+        else:
+            # 进程以新会话启动，进程组ID等于其PID
+            os.killpg(process.pid, signal.SIGKILL)
+    except (OSError, subprocess.SubprocessError):
+        pass
+    try:
+        process.kill()
+    except ProcessLookupError:
+        pass
+
+# 每条命令在内存中最多保留的输出行数，更早的行只写入转录文件（如果有）
+CAPTURE_MAX_LINES = 2000
+
+# 输出中出现这些文本时表示遇到冲突
+CONFLICT_MARKERS = ("CONFLICT", "git rebase --continue", "git merge --continue")
+
+class OutputCapture:
+    """
+    命令输出的有界捕获
+
+    内存中只保留最后 max_lines 行，完整输出可选地追加到转录文件（spill_path），
+    冲突标记在每行到达时检测，因此内存占用与命令输出的总量无关
+    """
+    
+    def __init__(self, max_lines=CAPTURE_MAX_LINES, spill_path=None):
+        self.lines = deque(maxlen=max_lines)
+        self.line_count = 0
+        self.conflict_detected = False
+        self.spill_path = spill_path
+        self.spill_file = None
+    
+    def open(self, header):
+        """打开转录文件（追加模式）并写入标题行，未指定转录文件时不做任何操作"""
+        if self.spill_path:
+            self.spill_file = open(self.spill_path, 'a', encoding='utf-8')
+            self.spill_file.write(header + "\n")
+    
+    def add(self, line):
+        """记录一行输出"""
+        self.lines.append(line)
+        self.line_count += 1
+        if not self.conflict_detected and any(marker in line for marker in CONFLICT_MARKERS):
+            self.conflict_detected = True
+        if self.spill_file:
+            self.spill_file.write(line + "\n")
+    
+    def close(self):
+        """关闭转录文件"""
+        if self.spill_file:
+            self.spill_file.close()
+            self.spill_file = None
+    
+    @property
+    def truncated(self):
+        """是否有较早的输出已从内存中丢弃"""
+        return self.line_count > len(self.lines)
+    
+    def text(self):
+        """内存中保留的输出"""
+        return '\n'.join(self.lines)
+
+async def run_command_async(cmd, cwd=None, env=None, timeout=60, idle_timeout=None, line_callback=None, cancel_event=None, capture=None, progress_callback=None):
+    """
+    异步执行shell命令，逐行回调输出（stderr合并到stdout）
+
+    分别限制总时长和无输出时长，超过任一限制时终止整个进程树。
+    按块读取输出，git的进度信息（以\\r刷新）也会被视为有输出；
+    一行中被\\r覆盖的内容只保留最后一段。
     
     Args:
         cmd: 要执行的命令
-        error_msg: 错误消息
-        allow_conflict: 是否允许冲突
-        timeout: 超时时间（秒），默认60秒
+        cwd: 执行目录
+        env: 环境变量
+        timeout: 总时长限制（秒）
+        idle_timeout: 无输出时长限制（秒），为None或0时不限制
+        line_callback: 每输出一行时调用，参数为不带换行的文本
+        cancel_event: threading.Event，被设置后终止进程树
+        capture: 记录输出的OutputCapture，默认只在内存中保留最后 CAPTURE_MAX_LINES 行
+        progress_callback: 行内以\r刷新的内容（git的进度信息）更新时调用，每读到一块输出最多调用一次
+    
+    Returns:
+        CompletedProcess，stdout为capture中保留的输出；
+        超过总时长时returncode为124，长时间无输出时为125，被取消时为130
     """
-    stdout_lines = []
-    stderr_lines = []
-    process = None
+    kwargs = {}
+    if os.name == 'nt':
+        kwargs["creationflags"] = get_subprocess_flags() | subprocess.CREATE_NEW_PROCESS_GROUP
+    else:
+        kwargs["start_new_session"] = True
     
-    try:
-        step_msg = f">>> 正在执行: {cmd}"
-        safe_print(step_msg)
-        safe_flush()
-        
-        # 如果有回调函数，立即发送步骤信息到GUI
-        if output_callback:
-            output_callback(step_msg + "\n")
-        
-        # 设置Git环境变量以使用UTF-8编码
-        env = os.environ.copy()
-        env['LC_ALL'] = 'C.UTF-8'
-        env['LANG'] = 'C.UTF-8'
+    process = await asyncio.create_subprocess_shell(
+        cmd,
+        cwd=cwd,
+        env=env,
+        stdin=subprocess.DEVNULL,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.STDOUT,
+        **kwargs
+    )
+    
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + timeout
+    decoder = codecs.getincrementaldecoder('utf-8')(errors='replace')
+    capture = capture if capture is not None else OutputCapture()
+    pending = ""
+    timeout_code = None
+    
+    def handle_line(text):
+        line = text.rstrip("\r").split("\r")[-1].rstrip()
+        capture.add(line)
+        if line_callback:
+            line_callback(line)
+    
+    last_output = loop.time()
+    
+    while True:
+        now = loop.time()
+        if cancel_event is not None and cancel_event.is_set():
+            timeout_code = CANCELLED_RETURN_CODE
+            break
+        if now >= deadline:
+            timeout_code = TIMEOUT_RETURN_CODE
+            break
+        if idle_timeout and now - last_output >= idle_timeout:
+            timeout_code = IDLE_TIMEOUT_RETURN_CODE
+            break
+        wait_time = deadline - now
+        if idle_timeout:
+            wait_time = min(wait_time, last_output + idle_timeout - now)
+        if cancel_event is not None:
+            wait_time = min(wait_time, CANCEL_POLL_INTERVAL)
+        try:
+            chunk = await asyncio.wait_for(process.stdout.read(4096), wait_time)
+        except asyncio.TimeoutError:
+            continue
+        if not chunk:
+            break
+        last_output = loop.time()
         
-        # 使用Popen实现实时输出，指定编码为utf-8
-        process = subprocess.Popen(
-            cmd, 
-            shell=True,
+        pending += decoder.decode(chunk)
+        *complete, pending = pending.split("\n")
+        for text in complete:
+            handle_line(text)
+        # 未结束的行中只需保留最后一次\r刷新后的内容（末尾的\r可能属于\r\n，暂时保留）
+        cut = pending.rfind("\r", 0, len(pending) - 1)
+        if cut >= 0:
+            if progress_callback:
+                progress_callback(pending[:cut].rsplit("\r", 1)[-1])
+            pending = pending[cut + 1:]
+    
+    if timeout_code is None:
+        pending += decoder.decode(b"", final=True)
+        if pending.strip():
+            handle_line(pending)
+        # 输出结束后进程仍可能未退出，继续受总时长限制
+        while True:
+            wait_time = max(deadline - loop.time(), 0.001)
+            if cancel_event is not None:
+                wait_time = min(wait_time, CANCEL_POLL_INTERVAL)
+            try:
+                return_code = await asyncio.wait_for(process.wait(), wait_time)
+                break
+            except asyncio.TimeoutError:
+                if cancel_event is not None and cancel_event.is_set():
+                    timeout_code = CANCELLED_RETURN_CODE
+                    break
+                if loop.time() >= deadline:
+                    timeout_code = TIMEOUT_RETURN_CODE
+                    break
+    
+    if timeout_code is not None:
+        kill_process_tree(process)
+        await process.wait()
+        return subprocess.CompletedProcess(cmd, timeout_code, capture.text(), "")
+    
+    return subprocess.CompletedProcess(cmd, return_code, capture.text(), "")
+
+# 网络命令连续无输出的默认最长时间（秒），网络命令带 --progress 参数，正常传输时会持续输出进度；
+# 其它命令（例如大仓库的检出和创建工作树）输出到管道时可能长时间没有输出，只受总时长限制
+DEFAULT_IDLE_TIMEOUT = 60
+
+# 默认的远程仓库名称
+DEFAULT_REMOTE = "origin"
+
+# 经典模式中访问远程仓库的命令数: pull --rebase、pull、push
+CLASSIC_NETWORK_OPS = 3
+# 可以快进时经典模式访问远程仓库的命令数: pull --rebase、push（跳过步骤2-4）
+CLASSIC_FAST_FORWARD_NETWORK_OPS = 2
+
+def is_network_command(cmd):
+    """判断git命令是否需要访问远程仓库"""
+    return cmd.startswith(("git pull", "git fetch", "git push"))
+
+def build_fetch_command(target_branch, remote=DEFAULT_REMOTE):
+    """构建只拉取目标分支、不拉取标签的fetch命令，更新 <远程>/<目标分支>"""
+    return f"git fetch --progress --no-tags {remote} +refs/heads/{target_branch}:refs/remotes/{remote}/{target_branch}"
+
+# 工作树模式中在目标分支工作树内执行的步骤索引，其余步骤在项目目录中执行
+WORKTREE_STEPS = (1, 2, 3, 4)
+
+def parse_target_branches(target_branch):
+    """目标分支参数（逗号分隔的字符串或列表）转换为去重后的列表，保持原有顺序"""
+    if isinstance(target_branch, str):
+        target_branch = target_branch.split(",")
+    branches = []
+    for branch in target_branch:
+        branch = branch.strip()
+        if branch and branch not in branches:
+            branches.append(branch)
+    return branches or ["develop"]
+
+# git push --porcelain 的每个引用一行: <标志>\t<源>:<目标>\t<摘要>，标志 "!" 表示被拒绝
+PUSH_PORCELAIN_PATTERN = re.compile(r'^([ +\-*!=])\t[^\t]*:(refs/\S+)\t')
+
+def parse_push_porcelain(output):
+    """解析 git push --porcelain 的输出，返回 {目标引用: 标志}"""
+    refs = {}
+    for line in output.splitlines():
+        match = PUSH_PORCELAIN_PATTERN.match(line)
+        if match:
+            refs[match.group(2)] = match.group(1)
+    return refs
+
+def find_non_fast_forward_refs(output):
+    """git push --porcelain 的输出中因非快进被拒绝的目标引用"""
+    refs = set()
+    for line in output.splitlines():
+        match = PUSH_PORCELAIN_PATTERN.match(line)
+        if match and match.group(1) == "!" and is_non_fast_forward(line):
+            refs.add(match.group(2))
+    return refs
+
+# 推送因远程分支已前进（非快进）被拒绝时，重新拉取、合并后重试的次数和退避时间（秒）
+PUSH_RETRY_LIMIT = 3
+PUSH_RETRY_BASE_DELAY = 1.0
+PUSH_RETRY_MAX_DELAY = 30.0
+
+# git push 被拒绝时说明原因的文本（LC_ALL=C 下不会被翻译），"[remote rejected]" 是服务器钩子拒绝，不在其中
+NON_FAST_FORWARD_MARKERS = ("(non-fast-forward)", "(fetch first)")
+
+def is_non_fast_forward(output):
+    """git push 的输出是否表示远程分支已前进（需要先拉取再推送）"""
+    return any(marker in output for marker in NON_FAST_FORWARD_MARKERS)
+
+def push_retry_delay(attempt):
+    """第attempt次（从1开始）重试前的等待时间: 指数退避，乘以0.5-1的随机因子，避免多人同时重试再次冲突"""
+    return min(PUSH_RETRY_MAX_DELAY, PUSH_RETRY_BASE_DELAY * 2 ** (attempt - 1)) * random.uniform(0.5, 1.0)
+
+# 多目标合并中每个目标分支的结果说明
+TARGET_STATUS_TEXT = {
+    "merged": "已合并",
+    "fast-forward": "已快进",
+    "up-to-date": "已包含开发分支，无需合并",
+    "conflict": "冲突",
+    "rejected": "推送被拒绝",
+    "unverified": "未通过推送前验证",
+    "failed": "失败",
+}
+
+def build_workflow_commands(current_branch, target_branch, fetch_once=False, use_worktree=False, remote=DEFAULT_REMOTE):
+    """
+    构建六步工作流的命令列表: (命令, 错误消息, 是否允许冲突, 超时时间, 步骤描述)
+
+    remote 为目标分支所在的远程仓库；
+    fetch_once 为True时，工作流开始前已通过一次fetch更新了 <远程>/<目标分支>，
+    步骤1和步骤3改为使用本地引用，整个流程只有推送需要再次访问远程仓库。
+    use_worktree 为True时，步骤2-5在目标分支的专用工作树中执行，开发分支的检出保持不变；
+    命令为None的步骤不需要执行
+    """
+    # 经典模式的步骤3和步骤5使用目标分支的上游配置，远程不是origin时显式指定
+    if remote == DEFAULT_REMOTE:
+        pull_target, push_target = "git pull --progress", "git push --progress"
+    else:
+        pull_target, push_target = f"git pull --progress {remote} {target_branch}", f"git push --progress {remote} {target_branch}"
+    if use_worktree:
+        if fetch_once:
+            step1 = (f"git rebase {remote}/{target_branch}", "rebase失败，请手动解决冲突！", True, 120, f"步骤1/6: 将当前分支rebase到{remote}/{target_branch}")
+            step3 = (None, None, False, 0, f"步骤3/6: {target_branch}分支已在开始时拉取，跳过")
+        else:
+            step1 = (f"git pull --progress --rebase {remote} {target_branch}", "rebase失败，请手动解决冲突！", True, 120, f"步骤1/6: 从{target_branch}分支拉取最新代码并rebase当前分支")
+            step3 = (f"git pull --progress --no-rebase {remote} {target_branch}", "拉取代码失败！", False, 60, f"步骤3/6: 在工作树中拉取{target_branch}分支最新代码")
+        return [
+            step1,
+            (f"git reset --hard {remote}/{target_branch}", "重置工作树失败！", False, 60, f"步骤2/6: 将{target_branch}工作树重置到{remote}/{target_branch}"),
+            step3,
+            # 工作树是分离HEAD，默认的合并信息会是 "into HEAD"，显式写明目标分支
+            (f"git merge -m \"Merge branch '{current_branch}' into {target_branch}\" {current_branch}", "合并失败，请在工作树中手动解决冲突！", True, 30, f"步骤4/6: 在工作树中将{current_branch}分支合并到{target_branch}"),
+            (f"git push --progress {remote} HEAD:{target_branch}", "推送失败！", False, 120, f"步骤5/6: 推送合并结果到远程{target_branch}分支"),
+            (None, None, False, 0, f"步骤6/6: 开发分支{current_branch}未被切换，跳过")
+        ]
+    if fetch_once:
+        return [
+            (f"git rebase {remote}/{target_branch}", "rebase失败，请手动解决冲突！", True, 120, f"步骤1/6: 将当前分支rebase到{remote}/{target_branch}"),
+            (f"git switch {target_branch}", "切换分支失败！", False, 10, f"步骤2/6: 切换到{target_branch}分支"),
+            (f"git merge {remote}/{target_branch}", "更新本地分支失败！", False, 60, f"步骤3/6: 将{target_branch}分支更新到{remote}/{target_branch}"),
+            (f"git merge {current_branch}", "合并失败，请手动解决冲突！", True, 30, f"步骤4/6: 将{current_branch}分支合并到{target_branch}"),
+            (f"git push --progress {remote} {target_branch}", "推送失败！", False, 120, f"步骤5/6: 推送更新后的{target_branch}分支到远程仓库"),
+            (f"git switch {current_branch}", "切换回原分支失败！", False, 10, f"步骤6/6: 切换回原开发分支{current_branch}")
+        ]
+    return [
+        (f"git pull --progress --rebase {remote} {target_branch}", "rebase失败，请手动解决冲突！", True, 120, f"步骤1/6: 从{target_branch}分支拉取最新代码并rebase当前分支"),
+        (f"git switch {target_branch}", "切换分支失败！", False, 10, f"步骤2/6: 切换到{target_branch}分支"),
+        (pull_target, "拉取代码失败！", False, 60, f"步骤3/6: 拉取{target_branch}分支最新代码"),
+        (f"git merge {current_branch}", "合并失败，请手动解决冲突！", True, 30, f"步骤4/6: 将{current_branch}分支合并到{target_branch}"),
+        (push_target, "推送失败！", False, 120, f"步骤5/6: 推送更新后的{target_branch}分支到远程仓库"),
+        (f"git switch {current_branch}", "切换回原分支失败！", False, 10, f"步骤6/6: 切换回原开发分支{current_branch}")
+    ]
+
+# 判断祖先关系时允许的提交时间偏差（秒），早于 祖先提交时间-偏差 的提交不再继续遍历
+CLOCK_SKEW_SLOP = 86400
+# 判断祖先关系时最多遍历的提交数，超过后交给 git merge-base 判断
+MAX_ANCESTRY_WALK = 5000
+# 每个查询服务最多缓存的提交数
+MAX_COMMIT_CACHE = 100000
+
+def find_git_dirs(project_path):
+    """
+    不启动git进程，查找项目的git目录和公共git目录（支持工作树和子目录）
+
+    Returns:
+        (git目录, 公共git目录)，不是git仓库时返回 (None, None)
+    """
+    path = os.path.abspath(project_path)
+    while True:
+        dot_git = os.path.join(path, ".git")
+        if os.path.isdir(dot_git):
+            git_dir = dot_git
+            break
+        if os.path.isfile(dot_git):
+            # 工作树中的 .git 是一个文件: "gitdir: <路径>"
+            with open(dot_git, 'r', encoding='utf-8') as f:
+                content = f.read().strip()
+            if not content.startswith("gitdir:"):
+                return None, None
+            git_dir = os.path.normpath(os.path.join(path, content[len("gitdir:"):].strip()))
+            break
+        parent = os.path.dirname(path)
+        if parent == path:
+            return None, None
+        path = parent
+    
+    common_dir = git_dir
+    commondir_file = os.path.join(git_dir, "commondir")
+    if os.path.isfile(commondir_file):
+        with open(commondir_file, 'r', encoding='utf-8') as f:
+            common_dir = os.path.normpath(os.path.join(git_dir, f.read().strip()))
+    return git_dir, common_dir
+
+# 表示有操作正在进行的标记文件（位于工作树的git目录中）: 文件名 -> 操作
+IN_PROGRESS_MARKERS = {
+    "rebase-merge": "rebase",
+    "rebase-apply": "rebase",
+    "MERGE_HEAD": "merge",
+    "CHERRY_PICK_HEAD": "cherry-pick",
+    "REVERT_HEAD": "revert",
+}
+
+class GitQueryService:
+    """
+    单个仓库的常驻git查询服务
+
+    保持一个 git cat-file --batch-command 进程用于解析引用和读取提交，
+    当前分支、远程仓库和远程分支列表直接从git目录中读取，都不需要为每次查询启动新进程。
+    远程分支列表按 packed-refs 和引用目录的修改时间缓存，未变化时不再遍历目录；
+    状态快照按HEAD、索引和相关引用的修改时间缓存，未变化时不启动git进程。
+    git进程意外退出时，下次查询会自动重启。所有方法都是线程安全的。
+    """
+    
+    def __init__(self, project_path):
+        self.project_path = os.path.abspath(project_path)
+        self.git_dir, self.common_dir = find_git_dirs(self.project_path)
+        self.lock = threading.Lock()
+        self.process = None
+        self.commit_cache = {}  # 提交对象不可变，可以一直缓存
+        self.ref_name_cache = {}  # 前缀 -> (文件签名, 引用名称列表, 遍历过的目录)
+        self.remotes_cache = None  # (config文件签名, 远程仓库列表)
+        self.status_cache = {}  # (远程仓库, 目标分支) -> (文件签名, 状态快照)
+        self.resolution_cache = None  # (文件签名, 冲突解决进度)
+    
+    def start(self):
+        """启动 cat-file 进程"""
+        self.process = subprocess.Popen(
+            ['git', 'cat-file', '--batch-command'],
+            cwd=self.project_path,
+            stdin=subprocess.PIPE,
             stdout=subprocess.PIPE,
-            stderr=subprocess.STDOUT,  # 将stderr重定向到stdout以实现实时输出
-            universal_newlines=True,
-            encoding='utf-8',
-            errors='replace',  # 遇到编码错误时替换为占位符
-            bufsize=1,  # 行缓冲
-            env=env,
+            stderr=subprocess.DEVNULL,
+            env=build_git_env(),
             creationflags=get_subprocess_flags()
         )
-        
-        # 实时读取输出
+    
+    def close(self):
+        """关闭 cat-file 进程"""
+        with self.lock:
+            self.stop()
+    
+    def stop(self):
+        if self.process is None:
+            return
         try:
-            while True:
-                if process.stdout is None:
-                    break
-                output = process.stdout.readline()
-                if output == '' and process.poll() is not None:
-                    break
-                if output:
-                    line = output.rstrip()
-                    safe_print(line)  # 实时打印输出
-                    safe_flush()
-                    stdout_lines.append(line)
-                    
-                    # 如果有回调函数，实时发送输出到GUI
-                    if output_callback:
-                        output_callback(line + "\n")
-            
-            # 等待进程完成，设置超时
-            return_code = process.wait(timeout=timeout)
-            
-        except subprocess.TimeoutExpired:
-            if process:
-                process.kill()
-                process.wait()
-            raise subprocess.TimeoutExpired(cmd, timeout)
+            self.process.stdin.close()
+            self.process.wait(timeout=5)
+        except (OSError, ValueError, subprocess.TimeoutExpired):
+            self.process.kill()
+        self.process = None
+    
+    def request(self, command, rev):
+        """
+        发送一条 info/contents 命令并读取响应，进程已退出时自动重启一次
+
+        Returns:
+            (oid, 类型, 内容)，对象不存在时返回None；info命令的内容为None
+        """
+        for attempt in range(2):
+            if self.process is None or self.process.poll() is not None:
+                self.start()
+            try:
+                self.process.stdin.write(f"{command} {rev}\n".encode('utf-8'))
+                self.process.stdin.flush()
+                header = self.process.stdout.readline()
+                if not header:
+                    raise OSError("git cat-file 已退出")
+                parts = header.decode('utf-8', errors='replace').split()
+                if len(parts) != 3:
+                    return None  # missing / ambiguous
+                oid, object_type, size = parts
+                content = None
+                if command == "contents":
+                    content = self.process.stdout.read(int(size) + 1)[:-1]
+                return oid, object_type, content
+            except (OSError, ValueError):
+                self.stop()
+                if attempt == 1:
+                    raise
+        return None
+    
+    def resolve(self, rev):
+        """解析引用或版本为完整的对象ID，不存在时返回None"""
+        with self.lock:
+            result = self.request("info", rev)
+        return result[0] if result else None
+    
+    def commit_info(self, rev):
+        """
+        读取提交对象
+
+        Returns:
+            {"oid", "tree", "parents", "time", "subject"}，不是提交时返回None
+        """
+        if rev in self.commit_cache:
+            return self.commit_cache[rev]
+        with self.lock:
+            result = self.request("contents", rev)
+        if not result or result[1] != "commit":
+            return None
         
-        stdout_output = '\n'.join(stdout_lines)
-        stderr_output = '\n'.join(stderr_lines)
+        oid, _, content = result
+        header, _, message = content.decode('utf-8', errors='replace').partition("\n\n")
+        info = {"oid": oid, "tree": None, "parents": [], "time": 0, "subject": message.split("\n", 1)[0]}
+        for line in header.split("\n"):
+            if line.startswith("tree "):
+                info["tree"] = line[5:]
+            elif line.startswith("parent "):
+                info["parents"].append(line[7:])
+            elif line.startswith("committer "):
+                try:
+                    info["time"] = int(line.rsplit(" ", 2)[1])
+                except (IndexError, ValueError):
+                    pass
+        if len(self.commit_cache) >= MAX_COMMIT_CACHE:
+            self.commit_cache.clear()
+        self.commit_cache[oid] = info
+        return info
+    
+    def is_ancestor(self, ancestor, descendant):
+        """
+        判断ancestor是否是descendant的祖先（或同一提交）
+
+        按提交时间从新到旧遍历descendant的历史，遍历到比ancestor早一天以上的提交为止。
+        提交时间偏差可能超过一天，因此有提交因时间过早被跳过时不能断定不是祖先。
         
-        # 检查返回码
-        if return_code != 0:
-            raise subprocess.CalledProcessError(return_code, cmd, stdout_output, stderr_output)
-            
-        return subprocess.CompletedProcess(
-            cmd, return_code, stdout_output, stderr_output
-        )
+        Returns:
+            True/False，引用不存在、遍历的提交过多或有提交因时间过早被跳过而无法确定时返回None
+        """
+        ancestor_info = self.commit_info(ancestor)
+        descendant_info = self.commit_info(descendant)
+        if not ancestor_info or not descendant_info:
+            return None
+        target = ancestor_info["oid"]
+        if descendant_info["oid"] == target:
+            return True
         
-    except subprocess.TimeoutExpired as e:
-        log_error(f"命令执行超时 ({timeout}秒): {cmd}")
-        log_error(f"{error_msg}")
-        if not allow_conflict:
-            input("按回车键退出...")
-            sys.exit(1)
-        return subprocess.CompletedProcess(
-            cmd, 124, "", f"命令执行超时: {cmd}"
-        )
+        cutoff = ancestor_info["time"] - CLOCK_SKEW_SLOP
+        heap = [(-descendant_info["time"], descendant_info["oid"])]
+        seen = {descendant_info["oid"]}
+        pruned = False
+        while heap:
+            _, oid = heapq.heappop(heap)
+            for parent in self.commit_info(oid)["parents"]:
+                if parent == target:
+                    return True
+                if parent in seen:
+                    continue
+                seen.add(parent)
+                if len(seen) > MAX_ANCESTRY_WALK:
+                    return None
+                parent_info = self.commit_info(parent)
+                if parent_info and parent_info["time"] >= cutoff:
+                    heapq.heappush(heap, (-parent_info["time"], parent))
+                else:
+                    pruned = True
+        return None if pruned else False
+    
+    def current_branch(self):
+        """读取当前分支名称，分离HEAD时返回 "HEAD"（与 git rev-parse --abbrev-ref HEAD 一致）"""
+        if not self.git_dir:
+            return None
+        with open(os.path.join(self.git_dir, "HEAD"), 'r', encoding='utf-8') as f:
+            head = f.read().strip()
+        if head.startswith("ref: refs/heads/"):
+            return head[len("ref: refs/heads/"):]
+        return "HEAD"
+    
+    def list_refs(self, prefix):
+        """列出以prefix开头的引用（合并松散引用和packed-refs），返回 {引用名: oid}"""
+        refs = {}
+        if not self.common_dir:
+            return refs
         
-    except subprocess.CalledProcessError as e:
-        # 对于实时输出的情况，错误信息已经在stdout中
-        stdout_output = '\n'.join(stdout_lines)
-        stderr_output = '\n'.join(stderr_lines)
-        
-        # 检查是否是冲突相关的错误
-        combined_output = stdout_output + stderr_output
-        if allow_conflict and ("CONFLICT" in combined_output or 
-                              "git rebase --continue" in combined_output or 
-                              "git merge --continue" in combined_output):
-            log_warning(f"{error_msg}")
-            log_warning("检测到冲突，请手动解决冲突后，在界面上点击'继续'按钮...")
-            return subprocess.CompletedProcess(
-                e.cmd, 10, stdout_output, stderr_output
-            )
+        packed_refs = os.path.join(self.common_dir, "packed-refs")
+        if os.path.isfile(packed_refs):
+            with open(packed_refs, 'r', encoding='utf-8', errors='replace') as f:
+                for line in f:
+                    if line.startswith(("#", "^")):
+                        continue
+                    parts = line.split()
+                    if len(parts) == 2 and parts[1].startswith(prefix):
+                        refs[parts[1]] = parts[0]
         
-        log_error(f"{error_msg}")
-        log_error(f"错误码: {e.returncode}")
-        if not allow_conflict:
-            # 在打包环境中不显示 input 提示
-            if not hasattr(sys, '_MEIPASS'):
-                input("按回车键退出...")
-            sys.exit(1)
-        return subprocess.CompletedProcess(
-            e.cmd, e.returncode, stdout_output, stderr_output
-        )
-
-def execute_git_workflow(project_path, target_branch="develop", output_callback=None):
-    """执行git工作流程"""
-    try:
-        os.chdir(project_path)
-    except Exception as e:
-        log_error(f"无法切换到目录: {e}")
-        return False
+        # 松散引用优先于packed-refs
+        ref_root = os.path.join(self.common_dir, *prefix.rstrip("/").split("/"))
+        for root, _, files in os.walk(ref_root):
+            for name in files:
+                full_path = os.path.join(root, name)
+                refname = os.path.relpath(full_path, self.common_dir).replace(os.sep, "/")
+                try:
+                    with open(full_path, 'r', encoding='utf-8') as f:
+                        refs[refname] = f.read().strip()
+                except OSError:
+                    continue
+        return refs
     
-    # 获取当前分支名称
-    try:
-        result = run_git_command('git rev-parse --abbrev-ref HEAD', "获取分支名称失败", timeout=10, output_callback=output_callback)
-        if result.returncode != 0:
-            return False
-        current_branch = result.stdout.strip()
-    except Exception as e:
-        log_error(f"获取分支名称失败: {str(e)}")
-        return False
+    def ref_names_signature(self, directories):
+        """packed-refs 和给定目录的修改时间，任何引用被创建、删除或打包时都会变化"""
+        signature = []
+        for path in [os.path.join(self.common_dir, "packed-refs")] + list(directories):
+            try:
+                stat = os.stat(path)
+                signature.append((stat.st_mtime_ns, stat.st_size))
+            except OSError:
+                signature.append(None)
+        return tuple(signature)
     
-    # 修改检查未提交改动的方式
-    try:
-        result = run_git_command(
-            f'git log {current_branch} --not origin/{target_branch} --oneline',
-            "检查本地提交失败",
-            timeout=10,
-            output_callback=output_callback
-        )
-        if result.returncode != 0:
-            return False
-        local_commits = result.stdout.strip()
-    except Exception as e:
-        log_error(f"检查本地提交失败: {str(e)}")
-        return False
+    def ref_names(self, prefix):
+        """
+        列出以prefix开头的引用名称（不读取松散引用的内容），已排序
+
+        git通过创建锁文件再重命名的方式写入引用，引用的增删都会改变所在目录的修改时间，
+        因此只要 packed-refs 和上次遍历过的目录都没有变化，就直接返回缓存的结果
+        """
+        if not self.common_dir:
+            return []
+        cached = self.ref_name_cache.get(prefix)
+        if cached and self.ref_names_signature(cached[2]) == cached[0]:
+            return cached[1]
+        
+        ref_root = os.path.join(self.common_dir, *prefix.rstrip("/").split("/"))
+        directories = [ref_root]
+        signature = self.ref_names_signature(directories)
+        names = set()
+        
+        packed_refs = os.path.join(self.common_dir, "packed-refs")
+        if os.path.isfile(packed_refs):
+            with open(packed_refs, 'r', encoding='utf-8', errors='replace') as f:
+                for line in f:
+                    if line.startswith(("#", "^")):
+                        continue
+                    parts = line.split()
+                    if len(parts) == 2 and parts[1].startswith(prefix):
+                        names.add(parts[1])
+        
+        for root, dirs, files in os.walk(ref_root):
+            directories.extend(os.path.join(root, name) for name in dirs)
+            for name in files:
+                if not name.endswith(".lock"):
+                    names.add(os.path.relpath(os.path.join(root, name), self.common_dir).replace(os.sep, "/"))
+        
+        # packed-refs和根目录的签名在遍历之前计算，遍历期间新增的引用会在下次调用时被发现
+        signature = signature + self.ref_names_signature(directories[1:])[1:]
+        names = sorted(names)
+        self.ref_name_cache[prefix] = (signature, names, directories)
+        return names
     
-    if not local_commits:
-        log_success(f"当前分支 {current_branch} 没有需要同步到{target_branch}的改动，无需操作")
-        return True
+    def remotes(self):
+        """从仓库的config文件中读取远程仓库名称，默认远程排在最前面"""
+        if not self.common_dir:
+            return []
+        config_path = os.path.join(self.common_dir, "config")
+        signature = self.ref_names_signature([config_path])
+        if self.remotes_cache and self.remotes_cache[0] == signature:
+            return self.remotes_cache[1]
+        
+        remotes = set()
+        try:
+            with open(config_path, 'r', encoding='utf-8', errors='replace') as f:
+                for line in f:
+                    match = re.match(r'\s*\[remote\s+"([^"]+)"\]', line)
+                    if match:
+                        remotes.add(match.group(1))
+        except OSError:
+            pass
+        remotes = sorted(remotes, key=lambda name: (name != DEFAULT_REMOTE, name))
+        self.remotes_cache = (signature, remotes)
+        return remotes
+    
+    def remote_branches(self, remote=DEFAULT_REMOTE):
+        """列出远程分支名称（不含 <远程名>/ 前缀和HEAD），已排序"""
+        prefix = f"refs/remotes/{remote}/"
+        return [refname[len(prefix):] for refname in self.ref_names(prefix) if refname != prefix + "HEAD"]
 
-    workflow_info = f"\n当前分支: {current_branch}\n目标分支: {target_branch}\n开始时间: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n\n"
-    safe_print(workflow_info)
-    safe_flush()
+    def status_signature(self, branch, target_ref):
+        """HEAD、索引、packed-refs、当前分支和目标分支的松散引用以及进行中操作标记文件的修改时间"""
+        paths = [os.path.join(self.git_dir, "HEAD"), os.path.join(self.git_dir, "index")]
+        paths.append(os.path.join(self.common_dir, "refs", "heads", *branch.split("/")))
+        paths.append(os.path.join(self.common_dir, *target_ref.split("/")))
+        paths.extend(os.path.join(self.git_dir, name) for name in IN_PROGRESS_MARKERS)
+        return self.ref_names_signature(paths)
     
-    # 发送工作流信息到GUI
-    if output_callback:
-        output_callback(workflow_info)
+    def operation_in_progress(self):
+        """根据git目录中的标记文件判断正在进行的操作，没有时返回None"""
+        for name, operation in IN_PROGRESS_MARKERS.items():
+            if os.path.exists(os.path.join(self.git_dir, name)):
+                return operation
+        return None
     
-    # 执行git操作流程
-    commands = [
-        (f"git pull --rebase origin {target_branch}", "rebase失败，请手动解决冲突！", True, 120, f"步骤1/6: 从{target_branch}分支拉取最新代码并rebase当前分支"),
-        (f"git switch {target_branch}", "切换分支失败！", False, 10, f"步骤2/6: 切换到{target_branch}分支"),
-        ("git pull", "拉取代码失败！", False, 60, f"步骤3/6: 拉取{target_branch}分支最新代码"),
-        (f"git merge {current_branch}", "合并失败，请手动解决冲突！", True, 30, f"步骤4/6: 将{current_branch}分支合并到{target_branch}"),
-        ("git push", "推送失败！", False, 120, f"步骤5/6: 推送更新后的{target_branch}分支到远程仓库"),
-        (f"git switch {current_branch}", "切换回原分支失败！", False, 10, f"步骤6/6: 切换回原开发分支{current_branch}")
-    ]
+    def git_output(self, args):
+        """执行只读git命令并返回标准输出，失败时返回None；不获取可选的锁，不会改写索引"""
+        try:
+            result = subprocess.run(
+                ['git'] + args,
+                cwd=self.project_path,
+                capture_output=True,
+                text=True,
+                encoding='utf-8',
+                errors='replace',
+                timeout=30,
+                env=dict(build_git_env(), GIT_OPTIONAL_LOCKS="0"),
+                creationflags=get_subprocess_flags()
+            )
+        except (OSError, subprocess.TimeoutExpired):
+            return None
+        return result.stdout if result.returncode == 0 else None
     
-    # 记录当前执行到的步骤索引
-    step_index = 0
-    while step_index < len(commands):
-        cmd, error_msg, allow_conflict, timeout, step_desc = commands[step_index]
+    def status_snapshot(self, target_branch, remote=DEFAULT_REMOTE, force=False):
+        """
+        仓库的状态快照（在后台线程中调用）
+
+        HEAD、索引、packed-refs和相关松散引用都没有变化时直接返回上次的快照（同一个对象），
+        只修改了工作区文件而没有更新索引时不会被发现，可以用force强制重新计算
+
+        Returns:
+            {"branch", "ahead", "behind", "dirty", "operation"}，不是git仓库时返回None；
+            远程目标分支不存在时 ahead/behind 为None
+        """
+        if not self.git_dir:
+            return None
+        branch = self.current_branch()
+        target_ref = f"refs/remotes/{remote}/{target_branch}"
+        key = (remote, target_branch)
+        signature = self.status_signature(branch, target_ref)
+        cached = self.status_cache.get(key)
+        if cached and cached[0] == signature and not force:
+            return cached[1]
         
-        # 输出步骤描述
-        step_info = f"\n=== {step_desc} ===\n"
-        safe_print(step_info)
-        safe_flush()
-        if output_callback:
-            output_callback(step_info)
-        
-        result = run_git_command(cmd, error_msg, allow_conflict, timeout, output_callback)
-        
-        # 检查是否遇到冲突
-        if result.returncode == 10:  # 自定义状态码，表示冲突
-            # 输出冲突状态供GUI解析
-            conflict_info = {
-                "status": "conflict", 
-                "step": step_index, 
-                "branch": current_branch,
-                "target_branch": target_branch,
-                "command": cmd
-            }
-            output_status(conflict_info)
-            return conflict_info
+        snapshot = {"branch": branch, "ahead": None, "behind": None, "dirty": False, "operation": self.operation_in_progress()}
+        counts = self.git_output(['rev-list', '--left-right', '--count', f'{target_ref}...HEAD'])
+        if counts:
+            behind, ahead = counts.split()
+            snapshot["ahead"], snapshot["behind"] = int(ahead), int(behind)
+        # 未跟踪的文件不影响合并，只检查已跟踪文件的修改
+        status = self.git_output(['status', '--porcelain', '--untracked-files=no', '--ignore-submodules=dirty'])
+        snapshot["dirty"] = bool(status and status.strip())
         
-        # 检查是否超时或其他错误
-        if result.returncode != 0:
-            if result.returncode == 124:  # 超时
-                log_error("操作超时，请检查网络连接或手动执行命令")
-            return False
+        if cached and cached[1] == snapshot:
+            snapshot = cached[1]
+        self.status_cache[key] = (signature, snapshot)
+        return snapshot
+
+    def conflict_resolution(self):
+        """
+        冲突解决的进度（在后台线程中轮询），索引和标记文件未变化时不启动git进程
+
+        Returns:
+            "ended": 没有正在进行的rebase/merge（已在外部继续或中止）
+            "resolved": 没有未合并的文件，解决结果都已加入索引
+            "unresolved": 仍有未合并的文件
+        """
+        if not self.git_dir or not self.operation_in_progress():
+            return "ended"
+        paths = [os.path.join(self.git_dir, "index")] + [os.path.join(self.git_dir, name) for name in IN_PROGRESS_MARKERS]
+        signature = self.ref_names_signature(paths)
+        if self.resolution_cache and self.resolution_cache[0] == signature:
+            return self.resolution_cache[1]
         
-        step_index += 1
-    
-    log_success("\n所有操作已完成！")
-    safe_print(f"结束时间: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
-    safe_flush()
-    return True
+        unmerged = self.git_output(['ls-files', '--unmerged'])
+        state = "resolved" if unmerged is not None and not unmerged.strip() else "unresolved"
+        self.resolution_cache = (signature, state)
+        return state
 
-def continue_after_conflict(project_path, step_index, current_branch, target_branch="develop", output_callback=None):
-    """冲突解决后继续执行"""
-    try:
-        os.chdir(project_path)
-    except Exception as e:
-        log_error(f"无法切换到目录: {e}")
-        return False
+# 按仓库路径共享的查询服务，引擎和GUI使用同一个实例
+_query_services = {}
+_query_services_lock = threading.Lock()
+
+def get_query_service(project_path):
+    """获取（必要时创建）仓库的常驻查询服务"""
+    key = os.path.normcase(os.path.abspath(project_path))
+    with _query_services_lock:
+        service = _query_services.get(key)
+        if service is None:
+            service = GitQueryService(project_path)
+            _query_services[key] = service
+        return service
+
+def close_query_services():
+    """关闭所有查询服务的git进程"""
+    with _query_services_lock:
+        services = list(_query_services.values())
+        _query_services.clear()
+    for service in services:
+        service.close()
+
+atexit.register(close_query_services)
+
+# 后台预取: 单次fetch的超时（秒）和连续失败后的最长退避间隔（秒）
+PREFETCH_TIMEOUT = 120
+PREFETCH_MAX_BACKOFF = 3600
+
+def build_prefetch_command(target_branch, remote=DEFAULT_REMOTE):
+    """只更新 <远程>/<目标分支>（可以是逗号分隔的多个）的静默fetch，不写FETCH_HEAD，不影响同时执行的 git pull"""
+    return ['git', 'fetch', '--quiet', '--no-tags', '--no-write-fetch-head', remote] + [
+        f'+refs/heads/{branch}:refs/remotes/{remote}/{branch}' for branch in parse_target_branches(target_branch)
+    ]
+
+class PrefetchScheduler:
+    """
+    后台预取调度器: 定期以低优先级为多个仓库fetch目标分支，之后运行工作流时拉取只需移动引用
+
+    调用方定期调用 tick 提交到期的仓库；同时执行的fetch不超过 max_workers 个，
+    失败后按 interval * 2^失败次数 退避（最长 PREFETCH_MAX_BACKOFF 秒）。
+    每次fetch结束后以 {"path", "time", "success", "error", "failures", "last_success"} 调用 result_callback（在后台线程中）
+    """
     
-    continue_info = f"\n继续执行，当前分支: {current_branch}\n目标分支: {target_branch}\n"
-    safe_print(continue_info)
-    safe_flush()
-    if output_callback:
-        output_callback(continue_info)
+    def __init__(self, interval, max_workers=2, result_callback=None):
+        self.interval = interval
+        self.result_callback = result_callback
+        self.executor = ThreadPoolExecutor(max_workers=max_workers)
+        self.lock = threading.Lock()
+        self.states = {}  # 路径 -> {"next_due", "failures", "last_success"}
+        self.processes = {}  # 路径 -> 正在执行的fetch进程（None表示已提交、尚未启动）
+        self.cancelled = set()  # 已取消、尚未结束的预取
     
-    # 执行git操作流程
-    commands = [
-        (f"git pull --rebase origin {target_branch}", "rebase失败，请手动解决冲突！", True, 120, f"步骤1/6: 从{target_branch}分支拉取最新代码并rebase当前分支"),
-        (f"git switch {target_branch}", "切换分支失败！", False, 10, f"步骤2/6: 切换到{target_branch}分支"),
-        ("git pull", "拉取代码失败！", False, 60, f"步骤3/6: 拉取{target_branch}分支最新代码"),
-        (f"git merge {current_branch}", "合并失败，请手动解决冲突！", True, 30, f"步骤4/6: 将{current_branch}分支合并到{target_branch}"),
-        ("git push", "推送失败！", False, 120, f"步骤5/6: 推送更新后的{target_branch}分支到远程仓库"),
-        (f"git switch {current_branch}", "切换回原分支失败！", False, 10, f"步骤6/6: 切换回原开发分支{current_branch}")
-    ]
+    def tick(self, repos, skip_paths=()):
+        """
+        提交到期的仓库
+
+        Args:
+            repos: [(路径, 远程仓库, 目标分支)]
+            skip_paths: 正在运行工作流的仓库路径，本次不预取
+        Returns:
+            本次提交的仓库数量
+        """
+        now = time.time()
+        submitted = 0
+        with self.lock:
+            for path, remote, target_branch in repos:
+                state = self.states.setdefault(path, {"next_due": 0, "failures": 0, "last_success": None})
+                if path in skip_paths or path in self.processes or state["next_due"] > now:
+                    continue
+                self.processes[path] = None
+                self.executor.submit(self.fetch, path, remote, target_branch)
+                submitted += 1
+        return submitted
     
-    # 从中断的步骤继续执行
-    while step_index < len(commands):
-        cmd, error_msg, allow_conflict, timeout, step_desc = commands[step_index]
-        
-        # 对于第一步rebase冲突后继续
-        if step_index == 0 and cmd.startswith("git pull --rebase"):
-            cmd = "git rebase --continue"
-            step_desc = f"步骤1/6: 继续 rebase 操作"
-        
-        # 对于第四步merge冲突后继续
-        if step_index == 3 and cmd.startswith("git merge"):
-            cmd = "git merge --continue"
-            step_desc = f"步骤4/6: 继续 merge 操作"
+    def fetch(self, path, remote, target_branch):
+        """在后台线程中执行一次预取并更新退避状态"""
+        error = None
+        try:
+            with self.lock:
+                if path in self.cancelled:
+                    # 启动前已被取消
+                    self.cancelled.discard(path)
+                    self.processes.pop(path, None)
+                    return
+                process = subprocess.Popen(
+                    build_prefetch_command(target_branch, remote),
+                    cwd=path,
+                    stdin=subprocess.DEVNULL,
+                    stdout=subprocess.DEVNULL,
+                    stderr=subprocess.PIPE,
+                    env=dict(build_git_env(), GIT_TERMINAL_PROMPT="0"),
+                    creationflags=get_subprocess_flags() | getattr(subprocess, "BELOW_NORMAL_PRIORITY_CLASS", 0),
+                    start_new_session=(os.name != 'nt')
+                )
+                self.processes[path] = process
+            if hasattr(os, "setpriority"):
+                try:
+                    os.setpriority(os.PRIO_PROCESS, process.pid, 10)
+                except OSError:
+                    pass
+            try:
+                _, stderr = process.communicate(timeout=PREFETCH_TIMEOUT)
+            except subprocess.TimeoutExpired:
+                kill_process_tree(process)
+                process.communicate()
+                error = f"超过{PREFETCH_TIMEOUT}秒"
+            else:
+                if process.returncode != 0:
+                    lines = stderr.decode('utf-8', errors='replace').strip().splitlines()
+                    error = lines[-1] if lines else f"退出码 {process.returncode}"
+        except OSError as e:
+            error = str(e)
         
-        # 输出步骤描述
-        step_info = f"\n=== {step_desc} ===\n"
-        safe_print(step_info)
-        safe_flush()
-        if output_callback:
-            output_callback(step_info)
-        
-        result = run_git_command(cmd, error_msg, allow_conflict, timeout, output_callback)
-        
-        # 检查是否再次遇到冲突
-        if result.returncode == 10:  # 自定义状态码，表示冲突
-            # 输出冲突状态供GUI解析
-            conflict_info = {
-                "status": "conflict", 
-                "step": step_index, 
-                "branch": current_branch,
-                "target_branch": target_branch,
-                "command": cmd
+        with self.lock:
+            self.processes.pop(path, None)
+            cancelled = path in self.cancelled
+            self.cancelled.discard(path)
+            state = self.states.setdefault(path, {"next_due": 0, "failures": 0, "last_success": None})
+            now = time.time()
+            if cancelled:
+                error = "已取消"
+                state["next_due"] = now + self.interval
+            elif error is None:
+                state.update(failures=0, last_success=now, next_due=now + self.interval)
+            else:
+                state["failures"] += 1
+                state["next_due"] = now + min(self.interval * 2 ** state["failures"], PREFETCH_MAX_BACKOFF)
+            result = {
+                "path": path,
+                "time": now,
+                "success": error is None,
+                "error": error,
+                "failures": state["failures"],
+                "last_success": state["last_success"]
             }
-            output_status(conflict_info)
-            return conflict_info
-        
-        # 检查是否超时或其他错误
-        if result.returncode != 0:
-            if result.returncode == 124:  # 超时
-                log_error("操作超时，请检查网络连接或手动执行命令")
-            return False
-        
-        step_index += 1
+        if self.result_callback:
+            self.result_callback(result)
     
-    log_success("\n所有操作已完成！")
-    safe_print(f"结束时间: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
-    safe_flush()
-    return True
+    def cancel(self, path):
+        """取消仓库正在执行的预取（工作流开始前调用，避免与拉取争用引用锁）"""
+        with self.lock:
+            if path not in self.processes or path in self.cancelled:
+                return
+            self.cancelled.add(path)
+            process = self.processes[path]
+        if process is not None:
+            kill_process_tree(process)
+    
+    def close(self):
+        """取消所有预取，不再接受新的任务"""
+        with self.lock:
+            paths = list(self.processes)
+        for path in paths:
+            self.cancel(path)
+        self.executor.shutdown(wait=False)
 
-def main():
-    if len(sys.argv) < 2:
-        log_error("请传入项目路径作为参数！")
-        safe_print(f"用法: python {os.path.basename(__file__)} \"项目路径\" [--target-branch 目标分支]")
-        # 在打包环境中不显示 input 提示
-        if not hasattr(sys, '_MEIPASS'):
-            input("按回车键退出...")
-        sys.exit(1)
-        
-    project_path = sys.argv[1]
-    target_branch = "develop"  # 默认目标分支
+# 旧版本的运行历史文件名（位于每个用户的应用数据目录中），现在默认保存在配置库中，首次打开配置库时导入
+HISTORY_FILE_NAME = "run_history.jsonl"
+
+_history_lock = threading.Lock()
+
+def get_app_data_dir():
+    """每个用户的应用数据目录: Windows为 %APPDATA%\\GitMergeTool，其它系统为 ~/.local/share/git-merge-tool"""
+    if os.name == 'nt' and os.environ.get('APPDATA'):
+        return os.path.join(os.environ['APPDATA'], "GitMergeTool")
+    data_home = os.environ.get('XDG_DATA_HOME') or os.path.join(os.path.expanduser("~"), ".local", "share")
+    return os.path.join(data_home, "git-merge-tool")
+
+def get_history_path():
+    """旧版本的运行历史文件路径"""
+    return os.path.join(get_app_data_dir(), HISTORY_FILE_NAME)
+
+def append_history(record, history_path=None):
+    """把一次运行的记录追加到运行历史: 默认写入配置库，指定history_path时追加到该文件（每行一条JSON）"""
+    if not history_path:
+        try:
+            get_config_store().add_history(record)
+        except sqlite3.Error as e:
+            raise OSError(str(e))
+        return
+    line = json.dumps(record, ensure_ascii=False) + "\n"
+    with _history_lock:
+        os.makedirs(os.path.dirname(history_path), exist_ok=True)
+        with open(history_path, 'a', encoding='utf-8') as f:
+            f.write(line)
+
+def load_history(history_path=None, repo=None, since=None):
+    """
+    读取运行历史（默认从配置库读取，指定history_path时读取该文件），跳过无法解析的记录
+
+    Args:
+        repo: 只返回该仓库路径的记录
+        since: 只返回开始时间（时间戳）不早于该值的记录
+    """
+    if not history_path:
+        try:
+            return get_config_store().load_history(repo, since)
+        except sqlite3.Error as e:
+            raise OSError(str(e))
+    if not os.path.exists(history_path):
+        return []
+    repo_key = os.path.normcase(os.path.abspath(repo)) if repo else None
     
-    # 解析目标分支参数
-    if "--target-branch" in sys.argv:
+    records = []
+    with open(history_path, 'r', encoding='utf-8', errors='replace') as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                continue
+            if repo_key and os.path.normcase(record.get("repo", "")) != repo_key:
+                continue
+            if since and record.get("started", 0) < since:
+                continue
+            records.append(record)
+    return records
+
+# 配置数据库: 快捷标签、仓库设置、界面设置和运行历史，位于每个用户的应用数据目录中
+CONFIG_DB_FILE_NAME = "git_merge_tool.db"
+# 旧版本GUI保存快捷标签和设置的JSON文件
+LEGACY_CONFIG_FILE_NAME = "quick_tags_config.json"
+# 仓库设置中可以保存的字段
+REPO_SETTING_FIELDS = ("target_branch", "remote", "idle_timeout", "verify_command")
+
+CONFIG_DB_SCHEMA = """
+CREATE TABLE IF NOT EXISTS tags (
+    path_key TEXT PRIMARY KEY,
+    path TEXT NOT NULL,
+    name TEXT NOT NULL,
+    position INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS tags_position ON tags (position);
+CREATE TABLE IF NOT EXISTS repo_settings (
+    path_key TEXT PRIMARY KEY,
+    target_branch TEXT,
+    remote TEXT,
+    idle_timeout INTEGER,
+    verify_command TEXT,
+    updated REAL
+);
+CREATE TABLE IF NOT EXISTS settings (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS history (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    repo_key TEXT NOT NULL,
+    started REAL NOT NULL,
+    record TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS history_repo_started ON history (repo_key, started);
+CREATE INDEX IF NOT EXISTS history_started ON history (started);
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT
+);
+"""
+
+def normalize_repo_path(path):
+    """仓库路径的唯一键: 绝对路径，规范化分隔符和 ..，Windows上不区分大小写"""
+    return os.path.normcase(os.path.normpath(os.path.abspath(path)))
+
+class ConfigStore:
+    """
+    基于SQLite的本地配置库
+
+    每次修改只写入变化的行，并在一个事务中提交（WAL模式），崩溃时不会留下写了一半的数据；
+    标签按规范化的路径唯一，没有数量上限。GUI进程和引擎进程可以同时打开同一个数据库
+    """
+    
+    def __init__(self, path=None):
+        """
+        Args:
+            path: 数据库文件路径，默认位于每个用户的应用数据目录中；":memory:" 表示只保存在内存中
+        """
+        self.path = path or os.path.join(get_app_data_dir(), CONFIG_DB_FILE_NAME)
+        if self.path != ":memory:":
+            self.path = os.path.abspath(self.path)
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        self.lock = threading.Lock()
+        self.connection = sqlite3.connect(self.path, timeout=10, check_same_thread=False)
+        self.connection.row_factory = sqlite3.Row
+        with self.lock:
+            if self.path != ":memory:":
+                self.connection.execute("PRAGMA journal_mode=WAL")
+                self.connection.execute("PRAGMA synchronous=NORMAL")
+            self.connection.executescript(CONFIG_DB_SCHEMA)
+    
+    def execute(self, sql, parameters=()):
+        """在一个事务中执行一条语句，返回全部结果行"""
+        with self.lock, self.connection:
+            return self.connection.execute(sql, parameters).fetchall()
+    
+    def close(self):
+        with self.lock:
+            self.connection.close()
+    
+    # 快捷标签
+    
+    def list_tags(self):
+        """按添加顺序返回所有标签 [{"name", "path"}]"""
+        return [{"name": row["name"], "path": row["path"]} for row in self.execute("SELECT name, path FROM tags ORDER BY position")]
+    
+    def add_tag(self, name, path):
+        """添加标签，同一路径的标签已存在时返回False"""
+        with self.lock, self.connection:
+            cursor = self.connection.execute(
+                "INSERT OR IGNORE INTO tags (path_key, path, name, position) "
+                "SELECT ?, ?, ?, COALESCE(MAX(position), -1) + 1 FROM tags",
+                (normalize_repo_path(path), path, name)
+            )
+            return cursor.rowcount == 1
+    
+    def update_tag(self, old_path, name, path):
+        """
+        修改标签的名称和路径（位置不变），路径变化时仓库设置随之迁移；
+        新路径已有仓库设置时合并两者，同一字段以迁移过来的设置为准
+
+        Raises:
+            ValueError: 新路径已属于另一个标签
+        """
+        old_key, new_key = normalize_repo_path(old_path), normalize_repo_path(path)
         try:
-            target_branch_index = sys.argv.index("--target-branch")
-            if target_branch_index + 1 < len(sys.argv):
-                target_branch = sys.argv[target_branch_index + 1]
-        except (ValueError, IndexError):
-            log_error("无效的 --target-branch 参数")
-            sys.exit(1)
+            with self.lock, self.connection:
+                self.connection.execute("UPDATE tags SET path_key = ?, path = ?, name = ? WHERE path_key = ?", (new_key, path, name, old_key))
+                old_settings = None
+                if new_key != old_key:
+                    old_settings = self.connection.execute("SELECT * FROM repo_settings WHERE path_key = ?", (old_key,)).fetchone()
+                if old_settings is not None:
+                    self.connection.execute("INSERT OR IGNORE INTO repo_settings (path_key) VALUES (?)", (new_key,))
+                    for field in REPO_SETTING_FIELDS:
+                        if old_settings[field] is not None:
+                            self.connection.execute(f"UPDATE repo_settings SET {field} = ? WHERE path_key = ?", (old_settings[field], new_key))
+                    self.connection.execute("UPDATE repo_settings SET updated = ? WHERE path_key = ?", (round(time.time(), 3), new_key))
+                    self.connection.execute("DELETE FROM repo_settings WHERE path_key = ?", (old_key,))
+        except sqlite3.IntegrityError:
+            raise ValueError("该路径的标签已存在")
     
-    # 检查是否是继续执行模式
-    if len(sys.argv) >= 5 and sys.argv[2] == "--continue":
-        step_index = int(sys.argv[3])
-        current_branch = sys.argv[4]
+    def delete_tag(self, path):
+        """删除标签（仓库设置和运行历史保留）"""
+        self.execute("DELETE FROM tags WHERE path_key = ?", (normalize_repo_path(path),))
+    
+    # 仓库设置
+    
+    def get_repo_settings(self, path):
+        """仓库的设置（只包含已保存的字段）"""
+        rows = self.execute("SELECT * FROM repo_settings WHERE path_key = ?", (normalize_repo_path(path),))
+        if not rows:
+            return {}
+        return {field: rows[0][field] for field in REPO_SETTING_FIELDS if rows[0][field] is not None}
+    
+    def set_repo_settings(self, path, **fields):
+        """保存仓库的部分设置，值为None的字段被清除"""
+        unknown = set(fields) - set(REPO_SETTING_FIELDS)
+        if unknown:
+            raise ValueError(f"未知的仓库设置: {', '.join(sorted(unknown))}")
+        key = normalize_repo_path(path)
+        with self.lock, self.connection:
+            self.connection.execute("INSERT OR IGNORE INTO repo_settings (path_key) VALUES (?)", (key,))
+            for field, value in fields.items():
+                self.connection.execute(f"UPDATE repo_settings SET {field} = ? WHERE path_key = ?", (value, key))
+            self.connection.execute("UPDATE repo_settings SET updated = ? WHERE path_key = ?", (round(time.time(), 3), key))
+    
+    def list_repos(self, default_target_branch="develop"):
+        """所有标签及其仓库设置，格式与 load_batch_config 相同"""
+        rows = self.execute(
+            "SELECT tags.name, tags.path, repo_settings.* FROM tags "
+            "LEFT JOIN repo_settings ON repo_settings.path_key = tags.path_key ORDER BY tags.position"
+        )
+        repos = []
+        for row in rows:
+            repo = {"name": row["name"], "path": row["path"]}
+            repo.update({field: row[field] for field in REPO_SETTING_FIELDS})
+            repo["target_branch"] = repo["target_branch"] or default_target_branch
+            repos.append(repo)
+        return repos
+    
+    # 界面设置
+    
+    def get_settings(self):
+        """所有界面设置 {键: 值}"""
+        settings = {}
+        for row in self.execute("SELECT key, value FROM settings"):
+            try:
+                settings[row["key"]] = json.loads(row["value"])
+            except ValueError:
+                continue
+        return settings
+    
+    def set_settings(self, settings):
+        """保存界面设置（只写入给出的键）"""
+        with self.lock, self.connection:
+            self.connection.executemany(
+                "INSERT OR REPLACE INTO settings (key, value) VALUES (?, ?)",
+                [(key, json.dumps(value, ensure_ascii=False)) for key, value in settings.items()]
+            )
+    
+    # 运行历史
+    
+    def add_history(self, record):
+        """追加一次运行的记录"""
+        self.execute(
+            "INSERT INTO history (repo_key, started, record) VALUES (?, ?, ?)",
+            (normalize_repo_path(record.get("repo", "")), record.get("started", 0), json.dumps(record, ensure_ascii=False))
+        )
+    
+    def load_history(self, repo=None, since=None):
+        """按开始时间顺序读取运行历史，可按仓库和开始时间筛选（使用索引）"""
+        conditions, parameters = [], []
+        if repo:
+            conditions.append("repo_key = ?")
+            parameters.append(normalize_repo_path(repo))
+        if since:
+            conditions.append("started >= ?")
+            parameters.append(since)
+        where = f" WHERE {' AND '.join(conditions)}" if conditions else ""
+        records = []
+        for row in self.execute(f"SELECT record FROM history{where} ORDER BY started, id", parameters):
+            try:
+                records.append(json.loads(row["record"]))
+            except ValueError:
+                continue
+        return records
+    
+    # 导入旧版本的JSON文件
+    
+    def import_once(self, key, importer):
+        """每个导入来源只执行一次（记录在meta表中），返回是否执行了导入"""
+        if self.execute("SELECT 1 FROM meta WHERE key = ?", (key,)):
+            return False
+        importer()
+        self.execute("INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)", (key, str(round(time.time(), 3))))
+        return True
+    
+    def import_legacy_config(self, config_path):
+        """导入旧版本GUI的 quick_tags_config.json（快捷标签和界面设置），同一文件只导入一次"""
+        config_path = os.path.abspath(config_path)
+        if not os.path.exists(config_path):
+            return False
         
-        # 在继续模式中也支持目标分支参数
-        continue_target_branch = "develop"
-        if len(sys.argv) >= 7 and sys.argv[5] == "--target-branch":
-            continue_target_branch = sys.argv[6]
+        def importer():
+            with open(config_path, 'r', encoding='utf-8') as f:
+                config = json.load(f)
+            settings = config.get('settings')
+            if isinstance(settings, dict):
+                self.set_settings(settings)
+            for tag in config.get('quick_tags', []):
+                if tag.get('path'):
+                    self.add_tag(tag.get('name') or os.path.basename(tag['path']), tag['path'])
+                    fields = {field: tag[field] for field in REPO_SETTING_FIELDS if tag.get(field)}
+                    if fields:
+                        self.set_repo_settings(tag['path'], **fields)
         
-        return continue_after_conflict(project_path, step_index, current_branch, continue_target_branch)
-    else:
-        return execute_git_workflow(project_path, target_branch)
+        return self.import_once(f"legacy_config:{normalize_repo_path(config_path)}", importer)
+    
+    def import_legacy_history(self, history_path):
+        """导入旧版本的 run_history.jsonl，同一文件只导入一次"""
+        history_path = os.path.abspath(history_path)
+        if not os.path.exists(history_path):
+            return False
+        
+        def importer():
+            rows = []
+            for record in load_history(history_path):
+                rows.append((normalize_repo_path(record.get("repo", "")), record.get("started", 0), json.dumps(record, ensure_ascii=False)))
+            with self.lock, self.connection:
+                self.connection.executemany("INSERT INTO history (repo_key, started, record) VALUES (?, ?, ?)", rows)
+        
+        return self.import_once(f"legacy_history:{normalize_repo_path(history_path)}", importer)
+
+_config_stores = {}
+_config_stores_lock = threading.Lock()
+
+def get_config_store(path=None):
+    """
+    获取（必要时创建）配置库，同一个数据库文件在进程内只有一个实例；
+    首次打开默认配置库时导入旧版本的运行历史文件
+    """
+    db_path = os.path.abspath(path) if path else os.path.join(get_app_data_dir(), CONFIG_DB_FILE_NAME)
+    with _config_stores_lock:
+        store = _config_stores.get(db_path)
+        if store is None:
+            store = ConfigStore(db_path)
+            _config_stores[db_path] = store
+            if path is None:
+                try:
+                    store.import_legacy_history(get_history_path())
+                except (OSError, ValueError, sqlite3.Error) as e:
+                    log_warning(f"导入旧的运行历史失败: {e}")
+        return store
+
+def percentile(values, pct):
+    """最近秩法计算百分位数，values不能为空"""
+    ordered = sorted(values)
+    return ordered[max(0, math.ceil(pct / 100 * len(ordered)) - 1)]
+
+def describe_durations(values):
+    """耗时列表的次数、p50、p95和最大值"""
+    return {
+        "count": len(values),
+        "p50": round(percentile(values, 50), 3),
+        "p95": round(percentile(values, 95), 3),
+        "max": round(max(values), 3)
+    }
+
+def summarize_history(records, period=None):
+    """
+    按仓库和步骤汇总运行历史的耗时分布
+
+    Args:
+        period: None 不按时间分组，"day" / "week" 按开始时间所在的日 / 周（周一）分组
+
+    Returns:
+        行列表，每行包含 repo、period、step（步骤序号，"total" 表示整次运行）和耗时分布，
+        跳过的步骤不计入
+    """
+    groups = {}
+    for record in records:
+        started = datetime.fromtimestamp(record.get("started", 0))
+        if period == "day":
+            bucket = started.strftime('%Y-%m-%d')
+        elif period == "week":
+            bucket = datetime.fromordinal(started.toordinal() - started.weekday()).strftime('%Y-%m-%d')
+        else:
+            bucket = None
+        
+        repo = record.get("repo", "")
+        groups.setdefault((repo, bucket, "total"), []).append(record.get("duration", 0))
+        for step in record.get("steps", []):
+            if step.get("skipped") or step.get("duration") is None:
+                continue
+            groups.setdefault((repo, bucket, step["step"]), []).append(step["duration"])
+    
+    rows = []
+    for (repo, bucket, step), durations in groups.items():
+        rows.append(dict(describe_durations(durations), repo=repo, period=bucket, step=step))
+    # 同一仓库的行排在一起，时间和步骤顺序递增，整次运行排在各步骤之后
+    rows.sort(key=lambda row: (row["repo"], row["period"] or "", row["step"] == "total", row["step"] if row["step"] != "total" else 0))
+    return rows
+
+# 工作流日志文件，位于仓库git目录的 automerge 子目录中
+JOURNAL_FILE_NAME = "journal.json"
+
+def get_journal_path(project_path):
+    """仓库的工作流日志路径: <git目录>/automerge/journal.json，不是git仓库时返回None"""
+    git_dir, _ = find_git_dirs(project_path)
+    if not git_dir:
+        return None
+    return os.path.join(git_dir, "automerge", JOURNAL_FILE_NAME)
+
+def write_json_atomic(path, data):
+    """原子地写入JSON文件: 先写临时文件并刷新到磁盘，再替换原文件，崩溃时不会留下半个文件"""
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    temp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(temp_path, 'w', encoding='utf-8') as f:
+        json.dump(data, f, ensure_ascii=False, indent=2)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(temp_path, path)
+
+def write_journal(journal_path, journal):
+    """原子地写入工作流日志"""
+    write_json_atomic(journal_path, journal)
+
+def load_journal(project_path):
+    """读取仓库中未完成的工作流日志，没有或无法解析时返回None"""
+    journal_path = get_journal_path(project_path)
+    if not journal_path or not os.path.exists(journal_path):
+        return None
+    try:
+        with open(journal_path, 'r', encoding='utf-8') as f:
+            journal = json.load(f)
+    except (OSError, ValueError):
+        return None
+    return journal if isinstance(journal, dict) and "step" in journal else None
+
+def discard_journal(project_path):
+    """删除仓库中的工作流日志"""
+    journal_path = get_journal_path(project_path)
+    if journal_path and os.path.exists(journal_path):
+        os.remove(journal_path)
+
+def journal_options(journal):
+    """继续执行时沿用的运行选项（远程仓库和运行模式）"""
+    return {key: journal[key] for key in ("remote", "engine", "fetch_once", "use_worktree") if key in journal}
+
+def describe_journal(journal):
+    """工作流日志的一行说明，例如 "feature -> origin/develop，停在步骤4/6（冲突），2024-01-01 12:00:00" """
+    states = {"running": "进程意外退出", "conflict": "冲突", "failed": "失败", "timeout": "超时", "cancelled": "已取消"}
+    updated = datetime.fromtimestamp(journal.get("updated", 0)).strftime('%Y-%m-%d %H:%M:%S')
+    return (
+        f"{journal.get('branch')} -> {journal.get('remote', DEFAULT_REMOTE)}/{journal.get('target_branch')}，"
+        f"停在步骤{journal['step'] + 1}/{TOTAL_STEPS}（{states.get(journal.get('state'), journal.get('state'))}），{updated}"
+    )
+
+# 推送前验证: 缓存文件位于每个用户的应用数据目录中，超过条数或大小上限时淘汰最久未使用的记录
+VERIFY_CACHE_FILE_NAME = "verify_cache.json"
+VERIFY_CACHE_MAX_ENTRIES = 2000
+VERIFY_CACHE_MAX_BYTES = 1024 * 1024
+# 验证命令（构建、检查、测试）的最长执行时间（秒），期间允许长时间没有输出
+VERIFY_TIMEOUT = 1800
+
+class VerifyCache:
+    """
+    推送前验证的结果缓存: 记录已经用某个验证命令验证通过的树对象ID
+
+    同一个树对象的内容完全相同，验证通过一次后无论来自哪个仓库、哪次合并都可以跳过。
+    每次读写都重新加载文件并原子地写回，多个线程（批量模式）和多个进程可以共用同一个缓存文件
+    """
+    
+    def __init__(self, path=None, max_entries=VERIFY_CACHE_MAX_ENTRIES, max_bytes=VERIFY_CACHE_MAX_BYTES):
+        self.path = path or os.path.join(get_app_data_dir(), VERIFY_CACHE_FILE_NAME)
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.lock = threading.Lock()
+    
+    def load(self):
+        """读取缓存文件，不存在或损坏时返回空字典"""
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                entries = json.load(f)
+        except (OSError, ValueError):
+            return {}
+        return entries if isinstance(entries, dict) else {}
+    
+    def lookup(self, tree, command):
+        """树对象已用该命令验证通过时返回记录（并更新最近使用时间），否则返回None"""
+        key = f"{tree} {command}"
+        with self.lock:
+            entries = self.load()
+            entry = entries.get(key)
+            if entry is None:
+                return None
+            entry["used"] = round(time.time(), 3)
+            try:
+                write_json_atomic(self.path, entries)
+            except OSError:
+                pass
+            return entry
+    
+    def store(self, tree, command, **info):
+        """
+        记录验证通过的树对象，超过条数上限或文件大小上限（验证命令很长时每条记录都很大）时
+        淘汰最久未使用的记录；写入失败时抛出OSError
+        """
+        now = round(time.time(), 3)
+        with self.lock:
+            entries = self.load()
+            entries[f"{tree} {command}"] = dict(info, tree=tree, command=command, verified=now, used=now)
+            # 按写入文件时的格式估算每条记录的大小
+            sizes = {key: len(json.dumps({key: entry}, ensure_ascii=False, indent=2).encode('utf-8')) for key, entry in entries.items()}
+            total = sum(sizes.values())
+            for key in sorted(entries, key=lambda key: entries[key].get("used", 0)):
+                if len(entries) <= self.max_entries and total <= self.max_bytes or len(entries) == 1:
+                    break
+                total -= sizes[key]
+                del entries[key]
+            write_json_atomic(self.path, entries)
+
+_verify_caches = {}
+_verify_caches_lock = threading.Lock()
+
+def get_verify_cache(path=None):
+    """获取（必要时创建）验证结果缓存，同一个缓存文件在进程内只有一个实例"""
+    cache_path = os.path.abspath(path or os.path.join(get_app_data_dir(), VERIFY_CACHE_FILE_NAME))
+    with _verify_caches_lock:
+        cache = _verify_caches.get(cache_path)
+        if cache is None:
+            cache = VerifyCache(cache_path)
+            _verify_caches[cache_path] = cache
+        return cache
+
+class WorkflowRunner:
+    """
+    单个仓库的git工作流执行器
+
+    每个实例持有自己的仓库路径、环境变量和步骤状态，git命令通过cwd参数在仓库中执行，
+    不会调用os.chdir，因此同一进程中可以同时运行多个实例。
+    
+    Args:
+        project_path: 项目路径
+        target_branch: 目标分支，多个目标分支用逗号分隔（或传入列表）时执行多目标合并（见 run_fanout）
+        output_callback: 实时输出回调函数，接收以换行结尾的文本
+        echo: 是否同时打印到stdout（命令行模式下为True）
+        fetch_once: 网络精简模式，只在开始时fetch一次目标分支，之后只有推送访问远程仓库
+        use_worktree: 在 .git/automerge/worktrees/<目标分支> 中保留一个常驻工作树，
+            合并和推送在其中完成，不再来回切换开发分支的检出
+        engine: 合并引擎，"checkout" 为经典的检出合并，"merge-tree" 为免检出合并（冲突时回退到检出合并）
+        idle_timeout: 带 --progress 的网络命令连续无输出的最长时间（秒），超过后终止命令
+        transcript_path: 转录文件路径，指定时每条命令的完整输出追加到该文件（内存中只保留最后几千行）
+        event_callback: 结构化事件回调函数，接收事件字典，"type" 为以下之一:
+            step_started（step、total、description、command）、
+            step_finished（step、exit_code、duration，跳过的步骤带 skipped）、
+            output_chunk（text、style: error / success / warning / command / step 或 None）、
+            progress（step、phase、percent、text）、
+            conflict（step、branch、target_branch、command，工作树模式下带 worktree，多目标合并中每个冲突的目标分支一次，带 conflicted_files）、
+            target_finished（多目标合并中每个目标分支的结果: target、status、commit、conflicted_files）、
+            command_finished（command、step、started、duration、exit_code）、
+            timeout（kind、command、timeout）、
+            push_retry（推送因非快进被拒绝后重试: attempt、delay）、
+            verify（推送前验证的结果: target、tree、cached、success、duration）、
+            finished（outcome、success、duration、push_retries）
+        remote: 目标分支所在的远程仓库名称
+        atomic: 多目标合并时使用 git push --atomic，任何一个目标分支被拒绝时都不更新
+        push_retries: 推送因其他人先推送（非快进）被拒绝时，重新拉取、合并后重试的最多次数
+        verify_command: 推送前在合并结果上执行的验证命令（构建、检查、测试等），
+            None时使用仓库的 git config automerge.verifyCommand，空字符串表示不验证
+        verify_cache_path: 验证结果缓存文件路径，默认位于每个用户的应用数据目录中
+        journal: 是否在 .git/automerge/journal.json 中记录每个步骤的进度，中断后可以用 resume_journal 从该步骤继续
+        record_history: 是否把本次运行（各步骤和各条git命令的起止时间、结果）追加到运行历史
+        history_path: 运行历史文件路径（每行一条JSON），默认保存在每个用户的配置库中
+    """
+    
+    def __init__(self, project_path, target_branch="develop", output_callback=None, echo=True, fetch_once=False, use_worktree=False, engine="checkout", idle_timeout=DEFAULT_IDLE_TIMEOUT, transcript_path=None, event_callback=None, record_history=True, history_path=None, remote=DEFAULT_REMOTE, journal=True, atomic=False, push_retries=PUSH_RETRY_LIMIT, verify_command=None, verify_cache_path=None):
+        self.project_path = os.path.abspath(project_path)
+        # 多个目标分支（逗号分隔或列表）时执行多目标合并，target_branch为第一个目标分支
+        self.target_branches = parse_target_branches(target_branch)
+        self.target_branch = self.target_branches[0]
+        self.atomic = atomic
+        self.remote = remote
+        self.push_retries = push_retries
+        self.push_retry_count = 0  # 本次运行因非快进而重试推送的次数
+        self.pre_merge_commit = None  # 步骤4合并前目标分支的提交，推送被拒绝后据此判断能否安全重置
+        self.verify_command = verify_command  # None表示使用仓库的 git config automerge.verifyCommand
+        self.verify_cache_path = verify_cache_path
+        self.output_callback = output_callback
+        self.event_callback = event_callback
+        self.echo = echo
+        self.env = build_git_env()
+        self.current_branch = None
+        self.step_index = 0
+        self.outcome = None  # done / conflict / timeout / failed / cancelled / unfinished（有未完成的工作流日志，没有执行）
+        self.started_at = None
+        self.step_started_at = None
+        self.record_history = record_history
+        self.history_path = history_path
+        self.history_record = None  # 本次运行的历史记录，运行期间由事件填充
+        self.fetch_once = fetch_once
+        self.network_ops = 0  # 本次执行访问远程仓库的次数
+        self.fast_forwarded = False  # 是否跳过合并直接快进推送了开发分支
+        self.fast_forward_rejected = False  # 快进推送是否被拒绝（之后回退到完整流程）
+        self.network_stats = None
+        self.use_worktree = use_worktree
+        self.worktree_path = None
+        self.engine = engine
+        self.resumed = False  # 是否是冲突解决后继续执行
+        self.idle_timeout = idle_timeout
+        self.transcript_path = os.path.abspath(transcript_path) if transcript_path else None
+        self.cancel_event = threading.Event()
+        self.query = get_query_service(self.project_path)
+        self.journal_path = get_journal_path(self.project_path) if journal else None
+        self.journal = None  # 本次运行写入的工作流日志
+    
+    def update_journal(self, state, flow=None):
+        """
+        记录当前步骤和状态，写入失败时只输出警告
+
+        flow为 "checkout" 表示步骤按检出合并流程执行（可能已切换到目标分支），
+        "direct" 表示步骤没有切换开发分支的检出（快进推送、merge-tree）
+        """
+        if not self.journal_path:
+            return
+        if self.journal is None:
+            self.journal = {
+                "project_path": self.project_path,
+                "branch": self.current_branch,
+                "target_branch": ",".join(self.target_branches),
+                "remote": self.remote,
+                "engine": self.engine,
+                "fetch_once": self.fetch_once,
+                "use_worktree": self.use_worktree,
+                "pid": os.getpid(),
+                "started": round(time.time(), 3)
+            }
+        self.journal.update(branch=self.current_branch, step=self.step_index, state=state, updated=round(time.time(), 3))
+        if flow:
+            self.journal["flow"] = flow
+        try:
+            write_journal(self.journal_path, self.journal)
+        except OSError as e:
+            self.log_warning(f"写入工作流日志失败: {e}")
+            self.journal_path = None
+    
+    def close_journal(self):
+        """运行结束时: 成功则删除工作流日志，否则记录结果以便之后继续"""
+        if not self.journal_path or self.journal is None:
+            return
+        if self.outcome == "done":
+            try:
+                os.remove(self.journal_path)
+            except OSError:
+                pass
+        else:
+            self.update_journal(self.outcome or "failed")
+    
+    def send_event(self, event_type, **fields):
+        """发送结构化事件"""
+        event = dict(fields, type=event_type, time=round(time.time(), 3))
+        if self.history_record is not None:
+            self.record_event(event)
+        if self.event_callback:
+            self.event_callback(event)
+    
+    def record_event(self, event):
+        """把步骤和命令事件记入本次运行的历史记录"""
+        event_type = event["type"]
+        if event_type == "step_started":
+            self.history_record["steps"].append({
+                "step": event["step"],
+                "description": event["description"],
+                "started": event["time"]
+            })
+        elif event_type == "step_finished":
+            steps = self.history_record["steps"]
+            if steps and steps[-1]["step"] == event["step"]:
+                steps[-1].update(duration=event["duration"], exit_code=event["exit_code"])
+                if event.get("skipped"):
+                    steps[-1]["skipped"] = True
+        elif event_type == "command_finished":
+            self.history_record["commands"].append({
+                key: event[key] for key in ("command", "step", "started", "duration", "exit_code")
+            })
+    
+    def start_history(self):
+        """开始记录本次运行"""
+        self.started_at = time.monotonic()
+        if self.record_history:
+            self.history_record = {
+                "repo": self.project_path,
+                "target_branch": ",".join(self.target_branches),
+                "remote": self.remote,
+                "engine": self.engine,
+                "fetch_once": self.fetch_once,
+                "use_worktree": self.use_worktree,
+                "started": round(time.time(), 3),
+                "steps": [],
+                "commands": []
+            }
+    
+    def save_history(self, duration):
+        """补全本次运行的结果并追加到运行历史，写入失败时只输出警告"""
+        record, self.history_record = self.history_record, None
+        if record is None:
+            return
+        record.update(
+            branch=self.current_branch,
+            resumed=self.resumed,
+            outcome=self.outcome or "failed",
+            duration=duration,
+            push_retries=self.push_retry_count
+        )
+        try:
+            append_history(record, self.history_path)
+        except OSError as e:
+            self.log_warning(f"保存运行历史失败: {e}")
+    
+    def finish_command(self, cmd, started, exit_code):
+        """发送command_finished事件，started为 (时间戳, 单调时钟) 二元组"""
+        self.send_event(
+            "command_finished",
+            command=cmd,
+            step=self.step_index,
+            started=round(started[0], 3),
+            duration=round(time.monotonic() - started[1], 3),
+            exit_code=exit_code
+        )
+    
+    def emit(self, text, style=None):
+        """输出文本到stdout（echo模式）和回调函数，同时发送output_chunk事件"""
+        if self.echo:
+            color = STYLE_COLORS.get(style)
+            if color:
+                safe_print(f"{color}{text.rstrip()}{COLOR_RESET}")
+            else:
+                safe_print(text, end="")
+            safe_flush()
+        if self.output_callback:
+            self.output_callback(text)
+        self.send_event("output_chunk", text=text, style=style)
+    
+    def log_error(self, message):
+        """记录错误信息"""
+        self.emit(f"[ERROR] {message}\n", "error")
+    
+    def log_success(self, message):
+        """记录成功信息"""
+        self.emit(f"[SUCCESS] {message}\n", "success")
+    
+    def log_warning(self, message):
+        """记录警告信息"""
+        self.emit(f"[WARNING] {message}\n", "warning")
+    
+    def start_step(self, step_index, description, command=None, flow="direct"):
+        """输出步骤标题，记录工作流日志并发送step_started事件"""
+        self.step_index = step_index
+        self.step_started_at = time.monotonic()
+        self.update_journal("running", flow)
+        self.emit(f"\n=== {description} ===\n", "step")
+        self.send_event("step_started", step=step_index, total=TOTAL_STEPS, description=description, command=command)
+    
+    def finish_step(self, exit_code, **fields):
+        """发送当前步骤的step_finished事件（包含耗时和退出码）"""
+        duration = round(time.monotonic() - self.step_started_at, 3) if self.step_started_at else 0
+        self.send_event("step_finished", step=self.step_index, exit_code=exit_code, duration=duration, **fields)
+    
+    def report_progress(self, text):
+        """git输出进度信息时发送progress事件"""
+        progress = parse_progress(text)
+        if progress:
+            phase, percent = progress
+            self.send_event("progress", step=self.step_index, phase=phase, percent=percent, text=text.strip())
+    
+    def cancel(self):
+        """请求取消执行: 终止正在执行的git命令，之后的步骤不再执行（可从其它线程调用）"""
+        self.cancel_event.set()
+    
+    def report_status(self, status_dict):
+        """把状态信息（冲突、超时）作为同名事件发送"""
+        self.send_event(status_dict["status"], **{key: value for key, value in status_dict.items() if key != "status"})
+    
+    def run_git_command(self, cmd, error_msg, allow_conflict=False, timeout=60, cwd=None, idle_timeout=None, quiet_failure=False):
+        """
+        在仓库目录（或cwd指定的目录）中执行git命令，同步调用 run_git_command_async
+        
+        Returns:
+            CompletedProcess，returncode为10表示冲突，124表示超过总时长，125表示长时间无输出，130表示被取消
+        """
+        return asyncio.run(self.run_git_command_async(cmd, error_msg, allow_conflict, timeout, cwd, idle_timeout, quiet_failure))
+    
+    async def run_git_command_async(self, cmd, error_msg, allow_conflict=False, timeout=60, cwd=None, idle_timeout=None, quiet_failure=False):
+        """
+        在仓库目录（或cwd指定的目录）中异步执行git命令，支持实时输出
+
+        同时限制总时长（timeout）和无输出时长（idle_timeout），超过任一限制时终止整个进程树；
+        idle_timeout 为None时，带 --progress 的网络命令使用执行器的设置，其它命令不限制无输出时长。
+        quiet_failure 为True时命令失败（超时和取消除外）不输出错误信息，由调用方确定不再重试后
+        调用 log_command_error 输出（用于可能自动重试的推送）
+        """
+        self.emit(f">>> 正在执行: {cmd}\n", "command")
+        if is_network_command(cmd):
+            self.network_ops += 1
+        
+        if idle_timeout is None:
+            idle_timeout = self.idle_timeout if is_network_command(cmd) and "--progress" in cmd else None
+        started = (time.time(), time.monotonic())
+        capture = OutputCapture(spill_path=self.transcript_path)
+        try:
+            capture.open(f"\n>>> [{datetime.now().strftime('%Y-%m-%d %H:%M:%S')}] {cmd}")
+        except OSError as e:
+            self.log_warning(f"无法写入转录文件，本条命令的输出只保留最后 {CAPTURE_MAX_LINES} 行: {e}")
+        
+        try:
+            result = await run_command_async(
+                cmd,
+                cwd=cwd or self.project_path,
+                env=self.env,
+                timeout=timeout,
+                idle_timeout=idle_timeout,
+                line_callback=self.handle_output_line,
+                cancel_event=self.cancel_event,
+                capture=capture,
+                progress_callback=self.report_progress
+            )
+        except OSError as e:
+            self.finish_command(cmd, started, 1)
+            if not quiet_failure:
+                self.log_error(f"{error_msg}")
+            self.log_error(f"无法启动命令: {e}")
+            return subprocess.CompletedProcess(cmd, 1, "", str(e))
+        finally:
+            capture.close()
+        self.finish_command(cmd, started, result.returncode)
+        
+        if result.returncode == TIMEOUT_RETURN_CODE:
+            self.log_error(f"命令执行超时 ({timeout}秒): {cmd}")
+            self.log_error(f"{error_msg}")
+            self.report_status({"status": "timeout", "kind": "total", "command": cmd, "timeout": timeout})
+            return result
+        
+        if result.returncode == IDLE_TIMEOUT_RETURN_CODE:
+            self.log_error(f"命令超过 {idle_timeout} 秒没有任何输出，已终止: {cmd}")
+            self.log_error(f"{error_msg}")
+            self.report_status({"status": "timeout", "kind": "idle", "command": cmd, "timeout": idle_timeout})
+            return result
+        
+        if result.returncode == CANCELLED_RETURN_CODE:
+            self.log_warning(f"操作已取消，已终止: {cmd}")
+            return result
+        
+        if result.returncode == 0:
+            return result
+        
+        # 检查是否是冲突相关的错误（冲突标记在输出到达时已逐行检测）
+        if allow_conflict and capture.conflict_detected:
+            self.log_warning(f"{error_msg}")
+            self.log_warning("检测到冲突，请手动解决冲突后，在界面上点击'继续'按钮...")
+            return subprocess.CompletedProcess(cmd, CONFLICT_RETURN_CODE, result.stdout, "")
+        
+        if not quiet_failure:
+            self.log_command_error(error_msg, result)
+        return result
+    
+    def log_command_error(self, error_msg, result):
+        """输出命令失败的错误信息和错误码；超时和取消在执行时已经输出，不再重复"""
+        if result.returncode in (TIMEOUT_RETURN_CODE, IDLE_TIMEOUT_RETURN_CODE, CANCELLED_RETURN_CODE):
+            return
+        self.log_error(f"{error_msg}")
+        self.log_error(f"错误码: {result.returncode}")
+    
+    def handle_output_line(self, line):
+        """输出命令的一行输出，进度行同时发送progress事件"""
+        self.emit(line + "\n")
+        self.report_progress(line)
+    
+    def run(self, discard_journal=False):
+        """
+        执行完整的git工作流程，返回True、冲突信息字典或False
+
+        仓库中有未完成的工作流日志时不执行，返回 {"status": "unfinished", "journal": 日志}（outcome为 "unfinished"），
+        需要先从日志继续（resume_journal），或指定 discard_journal=True 丢弃日志后重新开始
+        """
+        journal = load_journal(self.project_path) if self.journal_path else None
+        if journal is not None and not discard_journal:
+            self.started_at = time.monotonic()
+            self.log_warning(f"检测到未完成的工作流: {describe_journal(journal)}")
+            self.log_warning("请先从该步骤继续，或丢弃该记录后重新运行，本次不执行")
+            self.outcome = "unfinished"
+            return self.complete({"status": "unfinished", "journal": journal})
+        
+        self.start_history()
+        if self.journal_path and os.path.exists(self.journal_path):
+            try:
+                os.remove(self.journal_path)
+            except OSError:
+                pass
+        return self.complete(self.run_workflow())
+    
+    def resume(self, step_index, current_branch):
+        """冲突解决后从指定步骤继续执行"""
+        self.start_history()
+        return self.complete(self.resume_workflow(step_index, current_branch))
+    
+    def resume_journal(self, journal):
+        """
+        从工作流日志记录的步骤继续执行
+
+        该步骤的rebase/merge仍在进行（冲突，或执行中进程退出）时执行 --continue，否则重新执行该步骤；
+        没有切换过检出的流程和步骤1之前的中断直接重新执行完整流程
+        """
+        self.start_history()
+        self.journal = dict(journal)  # 沿用原来的日志，完成后删除
+        step_index = journal["step"]
+        self.emit(f"从工作流日志继续: {describe_journal(journal)}\n", "warning")
+        if journal.get("flow") != "checkout" or step_index not in range(TOTAL_STEPS):
+            return self.complete(self.run_workflow())
+        
+        in_progress = False
+        if step_index in (0, 3):
+            cwd = self.get_worktree_path() if self.use_worktree and step_index in WORKTREE_STEPS else self.project_path
+            in_progress = bool(cwd and get_query_service(cwd).operation_in_progress())
+        if step_index == 0 and not in_progress:
+            return self.complete(self.run_workflow())
+        return self.complete(self.resume_workflow(step_index, journal["branch"], continue_conflict=in_progress))
+    
+    def complete(self, result):
+        """保存运行历史和工作流日志，发送finished事件并原样返回执行结果"""
+        duration = round(time.monotonic() - self.started_at, 3)
+        self.close_journal()
+        self.save_history(duration)
+        self.send_event("finished", outcome=self.outcome or "failed", success=result is True, duration=duration, push_retries=self.push_retry_count)
+        return result
+    
+    def run_workflow(self):
+        """执行完整的git工作流程"""
+        if not os.path.isdir(self.project_path):
+            self.log_error(f"无法进入目录: {self.project_path}")
+            self.outcome = "failed"
+            return False
+        
+        # 获取当前分支名称，优先从查询服务读取，不启动新进程
+        try:
+            self.current_branch = self.query.current_branch()
+        except OSError:
+            self.current_branch = None
+        if not self.current_branch:
+            result = self.run_git_command('git rev-parse --abbrev-ref HEAD', "获取分支名称失败", timeout=10)
+            if result.returncode != 0:
+                return self.fail(result)
+            self.current_branch = result.stdout.strip()
+        
+        if len(self.target_branches) > 1:
+            return self.run_fanout()
+        
+        # 网络精简模式: 只拉取目标分支一次，后续步骤都使用本地的 <远程>/<目标分支>
+        if self.fetch_once:
+            result = self.run_git_command(build_fetch_command(self.target_branch, self.remote), f"拉取{self.target_branch}分支失败！", timeout=120)
+            if result.returncode != 0:
+                return self.fail(result)
+        
+        # 检查是否有需要同步的本地提交: 当前分支已是 <远程>/<目标分支> 的祖先时无需操作
+        try:
+            up_to_date = self.query.is_ancestor(self.current_branch, f"{self.remote}/{self.target_branch}")
+        except OSError:
+            up_to_date = None
+        if up_to_date is None:
+            result = self.run_git_command(
+                f'git log {self.current_branch} --not {self.remote}/{self.target_branch} --oneline',
+                "检查本地提交失败",
+                timeout=10
+            )
+            if result.returncode != 0:
+                return self.fail(result)
+            up_to_date = not result.stdout.strip()
+        elif not up_to_date:
+            tip = self.query.commit_info(self.current_branch)
+            self.emit(f"待同步的最新提交: {tip['oid'][:7]} {tip['subject']}\n")
+        
+        if up_to_date:
+            self.log_success(f"当前分支 {self.current_branch} 没有需要同步到{self.target_branch}的改动，无需操作")
+            self.outcome = "done"
+            return True
+        
+        self.emit(f"\n当前分支: {self.current_branch}\n目标分支: {self.target_branch}\n开始时间: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n\n")
+        if self.engine == "merge-tree":
+            return self.run_merge_tree()
+        return self.run_checkout(0)
+    
+    def resume_workflow(self, step_index, current_branch, continue_conflict=True):
+        """冲突解决后（continue_conflict为False时为中断后）从指定步骤继续执行"""
+        if not os.path.isdir(self.project_path):
+            self.log_error(f"无法进入目录: {self.project_path}")
+            self.outcome = "failed"
+            return False
+        
+        self.current_branch = current_branch
+        self.resumed = True
+        self.emit(f"\n继续执行，当前分支: {current_branch}\n目标分支: {self.target_branch}\n")
+        # merge-tree引擎只有步骤1的rebase会停在冲突上，继续rebase后仍然走免检出的合并
+        if self.engine == "merge-tree" and step_index == 0:
+            return self.run_merge_tree(continue_conflict=continue_conflict)
+        return self.run_checkout(step_index, continue_conflict=continue_conflict)
+    
+    def run_git_query(self, args, timeout=10, cwd=None):
+        """静默执行只读git查询命令，不输出到终端，返回CompletedProcess"""
+        return subprocess.run(
+            ['git'] + args,
+            cwd=cwd or self.project_path,
+            capture_output=True,
+            text=True,
+            encoding='utf-8',
+            errors='replace',
+            timeout=timeout,
+            env=self.env,
+            creationflags=get_subprocess_flags()
+        )
+    
+    def get_worktree_path(self):
+        """获取目标分支常驻工作树的路径: <git公共目录>/automerge/worktrees/<目标分支>"""
+        result = self.run_git_query(['rev-parse', '--git-common-dir'])
+        if result.returncode != 0:
+            return None
+        common_dir = os.path.join(self.project_path, result.stdout.strip())
+        safe_name = self.target_branch.replace('/', '_').replace('\\', '_')
+        return os.path.normpath(os.path.join(common_dir, "automerge", "worktrees", safe_name))
+    
+    def ensure_worktree(self):
+        """确保目标分支的常驻工作树存在，首次使用时创建（分离HEAD，不占用本地目标分支）"""
+        try:
+            self.worktree_path = self.get_worktree_path()
+        except (OSError, subprocess.SubprocessError) as e:
+            self.log_error(f"获取工作树路径失败: {e}")
+            return False
+        if not self.worktree_path:
+            self.log_error("获取工作树路径失败，请确认项目路径是git仓库")
+            return False
+        
+        if os.path.exists(os.path.join(self.worktree_path, ".git")):
+            self.emit(f"使用已有的{self.target_branch}工作树: {self.worktree_path}\n")
+            return True
+        
+        self.emit(f"首次使用，创建{self.target_branch}工作树: {self.worktree_path}\n")
+        # 清理已被删除的工作树记录，避免路径被占用
+        self.run_git_command("git worktree prune", "清理工作树记录失败！", timeout=30)
+        result = self.run_git_command(
+            f'git worktree add --detach "{self.worktree_path}" {self.remote}/{self.target_branch}',
+            "创建工作树失败！",
+            timeout=600
+        )
+        return result.returncode == 0
+    
+    def run_checkout(self, step_index, continue_conflict=False):
+        """
+        检出合并流程，continue_conflict表示第一步是在冲突解决后继续
+
+        步骤1完成后如果可以快进，直接推送，跳过步骤2-6
+        """
+        if step_index == 0:
+            result = self.execute_steps(0, end_step=1, continue_conflict=continue_conflict)
+            if result is not None:
+                return result
+            
+            fast_forward = self.fast_forward_push()
+            if fast_forward == "pushed":
+                self.fast_forwarded = True
+                return self.finish()
+            if fast_forward == "failed":
+                return False
+            step_index, continue_conflict = 1, False
+        
+        return self.run_steps(step_index, continue_conflict)
+    
+    def run_steps(self, step_index, continue_conflict=False):
+        """从指定步骤开始执行工作流，continue_conflict表示第一步是在冲突解决后继续"""
+        result = self.execute_steps(step_index, continue_conflict=continue_conflict)
+        if result is not None:
+            return result
+        return self.finish()
+    
+    def fast_forward_push(self):
+        """
+        步骤1之后，如果 <远程>/<目标分支> 已经是HEAD的祖先，直接推送 HEAD:<目标分支>，
+        省去两次检出和一次拉取
+
+        Returns:
+            "pushed" 已推送，"fallback" 不能快进或推送被拒绝（需要执行完整流程），"failed" 验证未通过、推送超时或被取消
+        """
+        target_ref = f"{self.remote}/{self.target_branch}"
+        if not self.is_ancestor(target_ref, "HEAD"):
+            return "fallback"
+        
+        # 本地目标分支有未推送的提交时，完整流程会把它们一起合并推送，直接快进则会丢下它们
+        local_ref = f"refs/heads/{self.target_branch}"
+        has_local_target = self.run_git_query(['rev-parse', '--verify', '--quiet', local_ref]).returncode == 0
+        if has_local_target and not self.is_ancestor(local_ref, "HEAD"):
+            self.emit(f"本地 {self.target_branch} 分支有不在当前分支中的提交，执行完整流程\n")
+            return "fallback"
+        
+        if not self.verify_commit("HEAD"):
+            return "failed"
+        
+        cmd = f"git push --progress {self.remote} HEAD:{self.target_branch}"
+        self.start_step(4, f"步骤2-5/6: {target_ref} 是当前分支的祖先，直接快进推送", cmd)
+        result = self.run_git_command(cmd, "快进推送失败！", timeout=120, quiet_failure=True)
+        self.finish_step(result.returncode)
+        if result.returncode in (TIMEOUT_RETURN_CODE, IDLE_TIMEOUT_RETURN_CODE, CANCELLED_RETURN_CODE):
+            self.fail(result)
+            return "failed"
+        if result.returncode != 0:
+            self.log_warning("快进推送被拒绝，回退到完整流程")
+            self.fast_forward_rejected = True
+            return "fallback"
+        
+        # 本地目标分支存在时同步快进（在其它工作树中检出时git会拒绝，远程已更新，只提示）
+        if has_local_target:
+            result = self.run_git_query(['fetch', '.', f'HEAD:{self.target_branch}'])
+            if result.returncode != 0:
+                detail = (result.stderr or result.stdout).strip().splitlines()
+                self.log_warning(f"本地 {self.target_branch} 分支未能同步快进: {detail[-1] if detail else f'退出码 {result.returncode}'}")
+        
+        self.skip_checkout_back()
+        return "pushed"
+    
+    def get_verify_command(self):
+        """推送前的验证命令，没有配置时返回空字符串"""
+        if self.verify_command is None:
+            result = self.run_git_query(['config', '--get', 'automerge.verifyCommand'])
+            self.verify_command = result.stdout.strip() if result.returncode == 0 else ""
+        return self.verify_command
+    
+    def checkout_verify_worktree(self, commit):
+        """
+        把提交检出到验证专用的工作树 <git公共目录>/automerge/verify（分离HEAD，首次使用时创建），
+        返回工作树路径，失败时返回None。未跟踪的构建产物保留，之后的构建可以增量进行
+        """
+        result = self.run_git_query(['rev-parse', '--git-common-dir'])
+        if result.returncode != 0:
+            self.log_error("获取验证工作树路径失败，请确认项目路径是git仓库")
+            return None
+        path = os.path.normpath(os.path.join(self.project_path, result.stdout.strip(), "automerge", "verify"))
+        if os.path.exists(os.path.join(path, ".git")):
+            result = self.run_git_command(f"git checkout --detach --force {commit}", "更新验证工作树失败！", timeout=600, cwd=path)
+        else:
+            self.run_git_command("git worktree prune", "清理工作树记录失败！", timeout=30)
+            result = self.run_git_command(f'git worktree add --detach "{path}" {commit}', "创建验证工作树失败！", timeout=600)
+        return path if result.returncode == 0 else None
+    
+    def verify_commit(self, commit, target=None, cwd=None):
+        """
+        推送前在合并结果上执行验证命令。同一个树对象用同一个命令验证通过后记录在缓存中，之后直接跳过；
+        验证在专用工作树中执行，不受工作区中未提交修改的影响
+
+        Args:
+            commit: 要推送的提交（可以是引用名，在cwd中解析）
+            target: 目标分支，默认为第一个目标分支
+        Returns:
+            通过（或没有配置验证命令）时返回True，失败时设置outcome并返回False
+        """
+        command = self.get_verify_command()
+        if not command:
+            return True
+        target = target or self.target_branch
+        result = self.run_git_query(['rev-parse', f'{commit}^{{commit}}', f'{commit}^{{tree}}'], cwd=cwd)
+        if result.returncode != 0:
+            self.log_error(f"无法解析要验证的提交: {commit}")
+            self.outcome = "failed"
+            return False
+        commit, tree = result.stdout.split()
+        
+        cache = get_verify_cache(self.verify_cache_path)
+        if cache.lookup(tree, command):
+            self.log_success(f"{target} 的合并结果（树 {tree[:7]}）已通过验证，跳过: {command}")
+            self.send_event("verify", target=target, tree=tree, cached=True, success=True, duration=0)
+            return True
+        
+        self.emit(f"\n--- 推送前验证 {target}（树 {tree[:7]}）---\n", "step")
+        path = self.checkout_verify_worktree(commit)
+        if path is None:
+            self.outcome = "failed"
+            return False
+        started = time.monotonic()
+        result = self.run_git_command(command, f"{target} 的合并结果未通过验证，已取消推送！", timeout=VERIFY_TIMEOUT, cwd=path, idle_timeout=VERIFY_TIMEOUT)
+        duration = round(time.monotonic() - started, 3)
+        self.send_event("verify", target=target, tree=tree, cached=False, success=result.returncode == 0, duration=duration)
+        if result.returncode != 0:
+            self.fail(result)
+            return False
+        
+        self.log_success(f"{target} 的合并结果通过验证（{duration}秒）")
+        try:
+            cache.store(tree, command, repo=self.project_path, commit=commit, duration=duration)
+        except OSError as e:
+            self.log_warning(f"保存验证结果缓存失败: {e}")
+        return True
+    
+    def wait_before_push_retry(self, result, targets=None):
+        """
+        推送被拒绝后判断是否重试: 只有远程分支已前进（非快进）且未超过重试次数时，
+        按指数退避加随机抖动等待，然后返回True；等待期间被取消时返回False
+
+        Args:
+            targets: 需要重新合并的目标分支（用于输出），默认为目标分支
+        """
+        if result.returncode in (TIMEOUT_RETURN_CODE, IDLE_TIMEOUT_RETURN_CODE, CANCELLED_RETURN_CODE):
+            return False
+        if self.push_retry_count >= self.push_retries or not is_non_fast_forward(result.stdout):
+            return False
+        self.push_retry_count += 1
+        delay = push_retry_delay(self.push_retry_count)
+        names = ", ".join(f"{self.remote}/{target}" for target in (targets or [self.target_branch]))
+        self.log_warning(f"{names} 已被其他人更新，{delay:.1f}秒后重新拉取并合并（第{self.push_retry_count}/{self.push_retries}次重试）")
+        self.send_event("push_retry", attempt=self.push_retry_count, delay=round(delay, 3))
+        if self.cancel_event.wait(delay):
+            self.log_warning("操作已取消")
+            return False
+        return True
+    
+    def refresh_target(self):
+        """
+        检出合并流程推送被拒绝后: 重新拉取目标分支，并把本地目标分支（工作树模式下为工作树的HEAD）
+        重置到 <远程>/<目标分支>，丢弃未推送的合并提交，之后从步骤4重新合并。
+        只有合并前的目标分支已包含在 <远程>/<目标分支> 中时才重置，否则本地目标分支上
+        未推送的其它提交会丢失，此时不再重试。
+        使用 reset --keep，带到目标分支上的未提交修改会被保留（有冲突时git拒绝重置）
+        """
+        self.step_index = 3
+        self.update_journal("running")
+        result = self.run_git_command(build_fetch_command(self.target_branch, self.remote), f"拉取{self.target_branch}分支失败！", timeout=120)
+        if result.returncode != 0:
+            return self.fail(result)
+        target_ref = f"{self.remote}/{self.target_branch}"
+        if not self.pre_merge_commit or not self.is_ancestor(self.pre_merge_commit, target_ref):
+            self.log_error(f"本地{self.target_branch}分支有未推送到{target_ref}的提交，重置会丢失这些提交，已停止重试，请手动合并后推送")
+            self.outcome = "failed"
+            return False
+        cwd = self.worktree_path if self.use_worktree else None
+        result = self.run_git_command(f"git reset --keep {target_ref}", f"重置{self.target_branch}分支失败！", timeout=60, cwd=cwd)
+        if result.returncode != 0:
+            return self.fail(result)
+        return None
+    
+    def leave_unverified_merge(self):
+        """
+        检出合并流程中推送前验证未通过: 切换回开发分支，提示撤销本地目标分支上未推送的合并提交。
+        同时删除工作流日志，修复后重新运行即可（从推送步骤继续会推送未通过验证的结果）
+        """
+        if self.journal_path:
+            try:
+                discard_journal(self.project_path)
+            except OSError as e:
+                self.log_warning(f"删除工作流日志失败: {e}")
+            self.journal = None
+        
+        result = self.run_git_query(['switch', self.current_branch], timeout=30)
+        if result.returncode != 0:
+            detail = (result.stderr or result.stdout).strip().splitlines()
+            self.log_error(f"切换回原分支 {self.current_branch} 失败: {detail[-1] if detail else f'退出码 {result.returncode}'}")
+            return
+        self.emit(f"已切换回原开发分支 {self.current_branch}\n")
+        if self.pre_merge_commit:
+            undo = f"git branch -f {self.target_branch} {self.pre_merge_commit}"
+        else:
+            undo = f"git switch {self.target_branch} && git reset --keep @{{u}} && git switch {self.current_branch}"
+        self.log_warning(f"本地 {self.target_branch} 分支上留有未推送的合并提交，修复后重新运行前请先撤销: {undo}")
+    
+    def skip_checkout_back(self):
+        """免检出的流程中开发分支没有被切换，跳过步骤6"""
+        self.start_step(5, f"步骤6/6: 开发分支{self.current_branch}未被切换，跳过")
+        self.finish_step(0, skipped=True)
+        self.step_index = 6
+    
+    def execute_steps(self, step_index, end_step=None, continue_conflict=False):
+        """
+        执行 [step_index, end_step) 范围内的步骤
+
+        Returns:
+            全部成功时返回None，遇到冲突返回冲突信息字典，失败返回False
+        """
+        commands = build_workflow_commands(self.current_branch, self.target_branch, self.fetch_once, self.use_worktree, self.remote)
+        end_step = len(commands) if end_step is None else end_step
+        resumed_step = step_index if continue_conflict else None
+        
+        # 工作树模式下，需要在工作树中执行的步骤开始前确保工作树存在
+        if self.use_worktree and self.worktree_path is None and any(i in WORKTREE_STEPS for i in range(step_index, end_step)):
+            if not self.ensure_worktree():
+                self.outcome = "failed"
+                return False
+        
+        self.step_index = step_index
+        while self.step_index < end_step:
+            if self.cancel_event.is_set():
+                self.log_warning("操作已取消")
+                self.outcome = "cancelled"
+                return False
+            
+            cmd, error_msg, allow_conflict, timeout, step_desc = commands[self.step_index]
+            
+            # 对于冲突后继续的步骤，改为执行 --continue（不打开编辑器，使用默认的提交信息）
+            if self.step_index == resumed_step and self.step_index == 0:
+                cmd = "git -c core.editor=true rebase --continue"
+                step_desc = "步骤1/6: 继续 rebase 操作"
+            elif self.step_index == resumed_step and self.step_index == 3:
+                cmd = "git -c core.editor=true merge --continue"
+                step_desc = "步骤4/6: 继续 merge 操作"
+            
+            # 推送前在合并结果上执行验证命令
+            cwd = self.worktree_path if self.use_worktree and self.step_index in WORKTREE_STEPS else None
+            if self.step_index == 4 and cmd is not None and not self.verify_commit("HEAD", cwd=cwd):
+                if not self.use_worktree:
+                    self.leave_unverified_merge()
+                return False
+            
+            self.start_step(self.step_index, step_desc, cmd, flow="checkout")
+            
+            if cmd is None:
+                self.finish_step(0, skipped=True)
+                self.step_index += 1
+                continue
+            
+            # 记录合并前目标分支的提交（冲突后继续时HEAD仍是合并前的提交）
+            if self.step_index == 3:
+                self.pre_merge_commit = self.read_head_commit(cwd)
+            
+            # 推送失败时先判断是否重试，不再重试时才输出错误信息
+            result = self.run_git_command(cmd, error_msg, allow_conflict, timeout, cwd, quiet_failure=self.step_index == 4)
+            self.finish_step(result.returncode)
+            
+            # 推送因其他人先推送被拒绝: 重新拉取并重置目标分支，从步骤4重新合并后再推送
+            # （冲突后继续的步骤已经完成，重新合并时执行原来的 git merge 而不是 --continue）
+            if self.step_index == 4 and result.returncode != 0:
+                if self.wait_before_push_retry(result):
+                    failed = self.refresh_target()
+                    if failed is not None:
+                        return failed
+                    resumed_step = None
+                    continue
+                self.log_command_error(error_msg, result)
+            
+            # 检查是否遇到冲突
+            if result.returncode == CONFLICT_RETURN_CODE:
+                conflict_info = {
+                    "status": "conflict", 
+                    "step": self.step_index, 
+                    "branch": self.current_branch,
+                    "target_branch": self.target_branch,
+                    "remote": self.remote,
+                    "command": cmd
+                }
+                if cwd:
+                    conflict_info["worktree"] = cwd
+                    self.log_warning(f"冲突位于工作树: {cwd}")
+                self.report_status(conflict_info)
+                self.outcome = "conflict"
+                return conflict_info
+            
+            # 检查是否超时或其他错误
+            if result.returncode != 0:
+                return self.fail(result)
+            
+            if self.step_index == resumed_step:
+                resumed_step = None
+            self.step_index += 1
+        
+        return None
+    
+    def read_head_commit(self, cwd=None):
+        """读取HEAD指向的提交ID，失败时返回None"""
+        try:
+            result = self.run_git_query(['rev-parse', '--verify', '--quiet', 'HEAD^{commit}'], cwd=cwd)
+        except (OSError, subprocess.TimeoutExpired):
+            return None
+        return result.stdout.strip() if result.returncode == 0 else None
+    
+    def finish(self):
+        """输出完成信息并返回True"""
+        self.emit("\n")
+        self.log_success("所有操作已完成！")
+        self.emit(f"结束时间: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n")
+        if self.fetch_once and not self.resumed:
+            self.report_network_savings()
+        self.outcome = "done"
+        return True
+    
+    def is_ancestor(self, ancestor, descendant):
+        """判断ancestor是否是descendant的祖先提交（或同一提交），查询服务无法确定时使用 git merge-base"""
+        try:
+            result = self.query.is_ancestor(ancestor, descendant)
+        except OSError:
+            result = None
+        if result is None:
+            result = self.run_git_query(['merge-base', '--is-ancestor', ancestor, descendant]).returncode == 0
+        return result
+    
+    def merge_tree(self, base_ref, ref, timeout=120):
+        """
+        使用 git merge-tree --write-tree 在对象库中计算合并结果，不修改工作区和索引
+
+        Returns:
+            (状态, 树对象ID, 冲突文件列表)，状态为 clean / conflict / failed / timeout
+        """
+        cmd = ['merge-tree', '--write-tree', '--name-only', '--no-messages', base_ref, ref]
+        cmd_text = f"git {' '.join(cmd)}"
+        self.emit(f">>> 正在执行: {cmd_text}\n", "command")
+        started = (time.time(), time.monotonic())
+        try:
+            result = self.run_git_query(cmd, timeout=timeout)
+        except subprocess.TimeoutExpired:
+            self.finish_command(cmd_text, started, TIMEOUT_RETURN_CODE)
+            self.log_error(f"命令执行超时 ({timeout}秒): git merge-tree")
+            return "timeout", None, []
+        except OSError as e:
+            self.finish_command(cmd_text, started, 1)
+            self.log_error(f"无法启动命令: {e}")
+            return "failed", None, []
+        self.finish_command(cmd_text, started, result.returncode)
+        
+        lines = result.stdout.splitlines()
+        if result.returncode not in (0, 1) or not lines:
+            self.emit(result.stdout + result.stderr)
+            return "failed", None, []
+        
+        tree = lines[0].strip()
+        if result.returncode == 0:
+            self.emit(f"合并结果树: {tree}\n")
+            return "clean", tree, []
+        # 冲突时，输出的第一行是树对象ID，之后是冲突文件列表（到空行为止）
+        conflicted_files = []
+        for line in lines[1:]:
+            if not line.strip():
+                break
+            conflicted_files.append(line.strip())
+        return "conflict", tree, conflicted_files
+    
+    def run_merge_tree(self, continue_conflict=False):
+        """
+        免检出的合并流程: 步骤1照常rebase开发分支，之后用 git merge-tree --write-tree
+        在对象库中计算合并结果，用 commit-tree 创建合并提交并直接推送，不修改工作区和索引。
+        merge-tree 报告冲突时回退到检出合并流程，由用户在工作区中解决冲突
+        """
+        result = self.execute_steps(0, end_step=1, continue_conflict=continue_conflict)
+        if result is not None:
+            return result
+        
+        target_ref = f"{self.remote}/{self.target_branch}"
+        # 推送因其他人先推送被拒绝时，重新拉取目标分支并重新计算合并结果
+        while True:
+            self.start_step(1, "步骤2-4/6: 使用merge-tree计算合并结果（不检出、不修改工作区）")
+            
+            self.fast_forwarded = self.is_ancestor(target_ref, self.current_branch)
+            if self.fast_forwarded:
+                # 与 git merge 的默认行为一致，目标分支是开发分支的祖先时直接快进
+                self.emit(f"{target_ref} 是 {self.current_branch} 的祖先，可以直接快进\n")
+                result = self.run_git_command(f"git rev-parse {self.current_branch}", "获取提交失败！", timeout=10)
+                if result.returncode != 0:
+                    self.finish_step(result.returncode)
+                    return self.fail(result)
+                merge_commit = result.stdout.strip()
+            else:
+                status, tree, conflicted_files = self.merge_tree(target_ref, self.current_branch)
+                if status == "conflict":
+                    self.finish_step(1, conflicted_files=conflicted_files)
+                    self.log_warning(f"merge-tree检测到冲突: {', '.join(conflicted_files)}")
+                    self.log_warning("回退到检出合并流程")
+                    result = self.execute_steps(1)
+                    if result is not None:
+                        return result
+                    return self.finish()
+                if status != "clean":
+                    self.finish_step(TIMEOUT_RETURN_CODE if status == "timeout" else 1)
+                    self.log_error("计算合并结果失败！")
+                    self.outcome = status
+                    return False
+            
+                message = f"Merge branch '{self.current_branch}' into {self.target_branch}"
+                result = self.run_git_command(
+                    f'git commit-tree {tree} -p {target_ref} -p {self.current_branch} -m "{message}"',
+                    "创建合并提交失败！",
+                    timeout=30
+                )
+                if result.returncode != 0:
+                    self.finish_step(result.returncode)
+                    return self.fail(result)
+                merge_commit = result.stdout.strip()
+            self.finish_step(0)
+            
+            if not self.verify_commit(merge_commit):
+                return False
+            
+            cmd = f"git push --progress {self.remote} {merge_commit}:refs/heads/{self.target_branch}"
+            self.start_step(4, f"步骤5/6: 推送合并结果到远程{self.target_branch}分支", cmd)
+            result = self.run_git_command(cmd, "推送失败！", timeout=120, quiet_failure=True)
+            self.finish_step(result.returncode)
+            if result.returncode == 0:
+                break
+            if not self.wait_before_push_retry(result):
+                self.log_command_error("推送失败！", result)
+                return self.fail(result)
+            result = self.run_git_command(build_fetch_command(self.target_branch, self.remote), f"拉取{self.target_branch}分支失败！", timeout=120)
+            if result.returncode != 0:
+                return self.fail(result)
+        
+        self.skip_checkout_back()
+        return self.finish()
+    
+    def run_fanout(self):
+        """
+        多目标合并: 一次fetch所有目标分支，用merge-tree分别计算开发分支合并到每个目标分支的结果，
+        最后用一次push（可选 --atomic）发布所有更新；某个目标分支冲突时其它目标分支照常合并。
+
+        开发分支不先rebase（rebase到其中一个目标分支会把它的提交带进其它目标分支），也不切换检出，
+        中断后直接重新运行即可，因此不写工作流日志
+
+        Returns:
+            全部成功时返回True，有目标分支冲突时返回 {"status": "conflict", "branch", "targets"}，
+            其它失败（包括未通过推送前验证）返回False
+        """
+        self.journal_path = None
+        remote_refs = [f"+refs/heads/{target}:refs/remotes/{self.remote}/{target}" for target in self.target_branches]
+        cmd = f"git fetch --progress --no-tags {self.remote} {' '.join(remote_refs)}"
+        self.emit(f"\n当前分支: {self.current_branch}\n目标分支: {', '.join(self.target_branches)}\n开始时间: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n\n")
+        self.start_step(0, "步骤1/6: 一次拉取所有目标分支", cmd)
+        result = self.run_git_command(cmd, "拉取目标分支失败！", timeout=120)
+        self.finish_step(result.returncode)
+        if result.returncode != 0:
+            return self.fail(result)
+        
+        self.start_step(1, "步骤2-4/6: 使用merge-tree计算每个目标分支的合并结果（不检出、不修改工作区）")
+        targets = [self.merge_into_target(target) for target in self.target_branches]
+        self.finish_step(0 if all(target["status"] != "failed" for target in targets) else 1)
+        
+        updates = [target for target in targets if target["status"] in ("merged", "fast-forward")]
+        if not updates:
+            self.start_step(4, "步骤5/6: 没有需要推送的目标分支，跳过")
+            self.finish_step(0, skipped=True)
+        while updates:
+            for target in updates:
+                if not self.verify_commit(target["commit"], target["target"]):
+                    if self.outcome in ("timeout", "cancelled"):
+                        self.report_targets(targets)
+                        return False
+                    target["status"] = "unverified"
+            updates = [target for target in updates if target["status"] != "unverified"]
+            if not updates:
+                break
+            refspecs = " ".join(f"{target['commit']}:refs/heads/{target['target']}" for target in updates)
+            cmd = f"git push --progress --porcelain {'--atomic ' if self.atomic else ''}{self.remote} {refspecs}"
+            self.start_step(4, f"步骤5/6: 一次推送 {len(updates)} 个目标分支", cmd)
+            result = self.run_git_command(cmd, "推送失败！", timeout=120, quiet_failure=True)
+            self.finish_step(result.returncode)
+            if result.returncode == 0:
+                break
+            
+            pushed = parse_push_porcelain(result.stdout)
+            stale = find_non_fast_forward_refs(result.stdout)
+            rejected = []
+            for target in updates:
+                # 原子推送失败时所有引用都没有更新；超时、取消或无法解析时按未推送处理
+                if self.atomic or pushed.get(f"refs/heads/{target['target']}") in (None, "!"):
+                    target["status"] = "rejected"
+                    rejected.append(target)
+            # 只有因非快进被拒绝的目标分支（原子推送时为全部）重新拉取、合并后重试
+            retry = rejected if self.atomic and stale else [target for target in rejected if f"refs/heads/{target['target']}" in stale]
+            if not retry or not self.wait_before_push_retry(result, [target["target"] for target in retry]):
+                self.log_command_error("推送失败！", result)
+                if result.returncode in (TIMEOUT_RETURN_CODE, IDLE_TIMEOUT_RETURN_CODE, CANCELLED_RETURN_CODE) or self.cancel_event.is_set():
+                    self.report_targets(targets)
+                    return self.fail(result)
+                break
+            
+            names = [target["target"] for target in retry]
+            remote_refs = [f"+refs/heads/{name}:refs/remotes/{self.remote}/{name}" for name in names]
+            result = self.run_git_command(f"git fetch --progress --no-tags {self.remote} {' '.join(remote_refs)}", "拉取目标分支失败！", timeout=120)
+            if result.returncode != 0:
+                self.report_targets(targets)
+                return self.fail(result)
+            self.start_step(1, f"步骤2-4/6: 重新计算 {', '.join(names)} 的合并结果")
+            merged = {name: self.merge_into_target(name) for name in names}
+            targets = [merged.get(target["target"], target) for target in targets]
+            self.finish_step(0 if all(target["status"] != "failed" for target in merged.values()) else 1)
+            updates = [merged[name] for name in names if merged[name]["status"] in ("merged", "fast-forward")]
+        
+        self.skip_checkout_back()
+        self.report_targets(targets)
+        
+        statuses = {target["status"] for target in targets}
+        if statuses <= {"merged", "fast-forward", "up-to-date"}:
+            return self.finish()
+        if "conflict" in statuses and not statuses & {"rejected", "failed"}:
+            self.log_warning("部分目标分支存在冲突，请对这些目标分支单独运行（检出合并）并手动解决冲突")
+            self.outcome = "conflict"
+            return {"status": "conflict", "branch": self.current_branch, "targets": targets}
+        self.log_error("部分目标分支合并或推送失败")
+        self.outcome = "failed"
+        return False
+    
+    def merge_into_target(self, target):
+        """
+        计算开发分支合并到一个目标分支的结果，不修改工作区和索引
+
+        Returns:
+            {"target", "status", "commit", "conflicted_files"}，status为 merged / fast-forward / up-to-date / conflict / failed
+        """
+        outcome = {"target": target, "status": "failed", "commit": None, "conflicted_files": []}
+        target_ref = f"{self.remote}/{target}"
+        self.emit(f"\n--- {self.current_branch} -> {target_ref} ---\n")
+        if self.query.resolve(target_ref) is None:
+            self.log_error(f"远程分支 {target_ref} 不存在")
+            return outcome
+        
+        if self.is_ancestor(self.current_branch, target_ref):
+            outcome["status"] = "up-to-date"
+            self.emit(f"{target_ref} 已包含 {self.current_branch}\n")
+            return outcome
+        
+        if self.is_ancestor(target_ref, self.current_branch):
+            outcome.update(status="fast-forward", commit=self.query.resolve(self.current_branch))
+            self.emit(f"{target_ref} 是 {self.current_branch} 的祖先，可以直接快进\n")
+            return outcome
+        
+        status, tree, conflicted_files = self.merge_tree(target_ref, self.current_branch)
+        if status == "conflict":
+            outcome.update(status="conflict", conflicted_files=conflicted_files)
+            self.log_warning(f"{target} 存在冲突: {', '.join(conflicted_files)}")
+            self.report_status({
+                "status": "conflict",
+                "step": self.step_index,
+                "branch": self.current_branch,
+                "target_branch": target,
+                "remote": self.remote,
+                "command": f"git merge-tree --write-tree --name-only --no-messages {target_ref} {self.current_branch}",
+                "conflicted_files": conflicted_files
+            })
+            return outcome
+        if status != "clean":
+            self.log_error(f"计算 {target} 的合并结果失败！")
+            return outcome
+        
+        message = f"Merge branch '{self.current_branch}' into {target}"
+        result = self.run_git_command(
+            f'git commit-tree {tree} -p {target_ref} -p {self.current_branch} -m "{message}"',
+            "创建合并提交失败！",
+            timeout=30
+        )
+        if result.returncode == 0:
+            outcome.update(status="merged", commit=result.stdout.strip())
+        return outcome
+    
+    def report_targets(self, targets):
+        """输出每个目标分支的结果并发送target_finished事件"""
+        self.emit("\n多目标合并结果:\n", "step")
+        for target in targets:
+            text = TARGET_STATUS_TEXT[target["status"]]
+            if target["conflicted_files"]:
+                text += f": {', '.join(target['conflicted_files'])}"
+            elif target["commit"]:
+                text += f" ({target['commit'][:7]})"
+            style = "success" if target["status"] in ("merged", "fast-forward", "up-to-date") else "warning" if target["status"] == "conflict" else "error"
+            self.emit(f"  {pad_display(target['target'], 24)} {text}\n", style)
+            self.send_event("target_finished", **target)
+    
+    def estimate_ref_advertisement_bytes(self):
+        """
+        估算一次全量fetch的引用通告大小（字节）
+
+        根据本地已知的远程分支和标签计算，每行格式为 "<长度4字节><oid> <引用名>\\n"，
+        不包含其它分支的对象数据，因此只是节省流量的下限
+        """
+        remote_prefix = f"refs/remotes/{self.remote}/"
+        result = self.run_git_query(['for-each-ref', '--format=%(refname)', remote_prefix, 'refs/tags/'])
+        if result.returncode != 0:
+            return 0
+        
+        total = 0
+        for refname in result.stdout.split():
+            if refname.startswith(remote_prefix):
+                refname = "refs/heads/" + refname[len(remote_prefix):]
+            total += 4 + 40 + 1 + len(refname) + 1
+        return total
+    
+    def report_network_savings(self):
+        """
+        输出与经典模式相比节省的网络操作次数和流量
+
+        经典模式的次数按本次实际走的流程计算: 可以快进时经典模式同样跳过步骤3的拉取，
+        被拒绝的快进推送和每次推送重试（重新拉取和推送）在两种模式下都会发生
+        """
+        try:
+            saved_bytes = self.estimate_ref_advertisement_bytes()
+        except (OSError, subprocess.SubprocessError):
+            saved_bytes = 0
+        
+        classic_ops = CLASSIC_FAST_FORWARD_NETWORK_OPS if self.fast_forwarded else CLASSIC_NETWORK_OPS
+        classic_ops += int(self.fast_forward_rejected) + 2 * self.push_retry_count
+        saved_ops = max(0, classic_ops - self.network_ops)
+        self.network_stats = {
+            "network_ops": self.network_ops,
+            "classic_network_ops": classic_ops,
+            "saved_network_ops": saved_ops,
+            "saved_bytes_estimate": saved_bytes
+        }
+        self.emit(
+            f"网络操作: {self.network_ops} 次（经典模式 {classic_ops} 次），"
+            f"节省 {saved_ops} 次往返，"
+            f"跳过全量fetch至少节省 {saved_bytes} 字节\n"
+        )
+    
+    def fail(self, result):
+        """根据命令结果记录失败原因并返回False"""
+        if result.returncode in (TIMEOUT_RETURN_CODE, IDLE_TIMEOUT_RETURN_CODE):
+            self.log_error("操作超时，请检查网络连接或手动执行命令")
+            self.outcome = "timeout"
+        elif result.returncode == CANCELLED_RETURN_CODE or self.cancel_event.is_set():
+            self.outcome = "cancelled"
+        else:
+            self.outcome = "failed"
+        return False
+
+def run_git_command(cmd, error_msg, allow_conflict=False, timeout=60, output_callback=None, cwd=None):
+    """
+    执行git命令，添加超时机制，支持实时输出
+    
+    Args:
+        cmd: 要执行的命令
+        error_msg: 错误消息
+        allow_conflict: 是否允许冲突，不允许时命令失败会退出程序
+        timeout: 超时时间（秒），默认60秒
+        cwd: 执行命令的目录，默认为当前目录
+    """
+    runner = WorkflowRunner(cwd or os.getcwd(), output_callback=output_callback)
+    result = runner.run_git_command(cmd, error_msg, allow_conflict, timeout)
+    if result.returncode != 0 and not allow_conflict:
+        pause_before_exit()
+        sys.exit(1)
+    return result
+
+def execute_git_workflow(project_path, target_branch="develop", output_callback=None, discard_journal=False, **options):
+    """执行git工作流程，options为WorkflowRunner的可选参数（如fetch_once）；discard_journal见 WorkflowRunner.run"""
+    return WorkflowRunner(project_path, target_branch, output_callback, **options).run(discard_journal)
+
+def continue_after_conflict(project_path, step_index, current_branch, target_branch="develop", output_callback=None, **options):
+    """冲突解决后继续执行"""
+    return WorkflowRunner(project_path, target_branch, output_callback, **options).resume(step_index, current_branch)
+
+def resume_from_journal(project_path, output_callback=None, **options):
+    """
+    从仓库中未完成的工作流日志继续执行，目标分支、远程仓库和运行模式使用日志中的记录
+
+    Returns:
+        执行结果，没有工作流日志时返回None
+    """
+    journal = load_journal(project_path)
+    if journal is None:
+        return None
+    options.update(journal_options(journal))
+    runner = WorkflowRunner(project_path, journal.get("target_branch") or "develop", output_callback, **options)
+    return runner.resume_journal(journal)
+
+def get_cli_option(name, default=None):
+    """从命令行参数中读取 `name value` 形式的选项"""
+    if name in sys.argv:
+        index = sys.argv.index(name)
+        if index + 1 < len(sys.argv):
+            return sys.argv[index + 1]
+    return default
+
+def get_runner_options():
+    """从命令行参数中读取WorkflowRunner的可选参数"""
+    options = {}
+    if "--fetch-once" in sys.argv:
+        options["fetch_once"] = True
+    if "--worktree" in sys.argv:
+        options["use_worktree"] = True
+    transcript_path = get_cli_option("--transcript")
+    if transcript_path:
+        options["transcript_path"] = transcript_path
+    if "--no-history" in sys.argv:
+        options["record_history"] = False
+    history_path = get_cli_option("--history")
+    if history_path:
+        options["history_path"] = os.path.abspath(history_path)
+    remote = get_cli_option("--remote")
+    if remote:
+        options["remote"] = remote
+    if "--atomic" in sys.argv:
+        options["atomic"] = True
+    verify_command = get_cli_option("--verify")
+    if verify_command is not None:
+        options["verify_command"] = verify_command
+    verify_cache_path = get_cli_option("--verify-cache")
+    if verify_cache_path:
+        options["verify_cache_path"] = os.path.abspath(verify_cache_path)
+    push_retries = get_cli_option("--push-retries")
+    if push_retries:
+        try:
+            options["push_retries"] = max(0, int(push_retries))
+        except ValueError:
+            log_error("无效的 --push-retries 参数")
+            sys.exit(1)
+    engine = get_cli_option("--engine")
+    idle_timeout = get_cli_option("--idle-timeout")
+    if idle_timeout:
+        try:
+            options["idle_timeout"] = int(idle_timeout)
+        except ValueError:
+            log_error("无效的 --idle-timeout 参数")
+            sys.exit(1)
+    if engine:
+        if engine not in ("checkout", "merge-tree"):
+            log_error(f"无效的 --engine 参数: {engine}")
+            sys.exit(1)
+        options["engine"] = engine
+    return options
+
+def check_fanout_options(target_branch, options):
+    """
+    多目标合并不检出目标分支、总是用merge-tree计算合并结果（一次fetch所有目标分支，相当于 --fetch-once），
+    不支持工作树模式和检出合并引擎
+
+    Returns:
+        目标分支与选项冲突时返回错误信息，否则返回None
+    """
+    if len(parse_target_branches(target_branch)) < 2:
+        return None
+    if options.get("use_worktree"):
+        return "多目标合并不检出目标分支，不能与 --worktree 一起使用"
+    if options.get("engine") == "checkout":
+        return "多目标合并总是使用merge-tree计算合并结果，不能与 --engine checkout 一起使用"
+    return None
+
+def get_event_log():
+    """根据 --events 参数打开事件日志，未指定时返回None"""
+    events_path = get_cli_option("--events")
+    if not events_path:
+        return None
+    try:
+        return open_event_log(events_path)
+    except OSError as e:
+        log_error(f"无法打开事件日志: {e}")
+        sys.exit(1)
+
+def load_batch_config(config_path, default_target_branch="develop"):
+    """
+    读取批量模式的仓库列表，格式与quick_tags_config.json相同
+
+    每个标签可以额外指定 target_branch、remote、idle_timeout 和 verify_command（推送前验证命令），
+    未指定时使用默认目标分支和命令行中的设置
+    """
+    with open(config_path, 'r', encoding='utf-8') as f:
+        config = json.load(f)
+    
+    repos = []
+    for tag in config.get('quick_tags', []):
+        path = tag.get('path')
+        if not path:
+            continue
+        repos.append({
+            "name": tag.get('name') or os.path.basename(path),
+            "path": path,
+            "target_branch": tag.get('target_branch') or default_target_branch,
+            "remote": tag.get('remote'),
+            "idle_timeout": tag.get('idle_timeout'),
+            "verify_command": tag.get('verify_command')
+        })
+    return repos
+
+def load_repo_list(option, default_target_branch="develop"):
+    """
+    批量模式和冲突预测的仓库列表: 选项后是配置文件路径时读取该文件，
+    省略时使用配置库中的快捷标签（GUI中添加的标签）及其仓库设置
+    """
+    config_path = get_cli_option(option)
+    if config_path and not config_path.startswith("--"):
+        return load_batch_config(config_path, default_target_branch)
+    try:
+        return get_config_store().list_repos(default_target_branch)
+    except sqlite3.Error as e:
+        raise OSError(str(e))
+
+# 批量汇总中仓库的结果，未列出的结果一律计为 failed；
+# unfinished 表示仓库中有未完成的工作流日志，本次跳过该仓库
+BATCH_STATUSES = ("done", "conflict", "timeout", "failed", "cancelled", "unfinished")
+
+def run_batch_repo(repo, print_lock, runner_options, event_log=None):
+    """
+    为单个仓库执行工作流，根据执行器的事件输出（逐行加上仓库前缀）并汇总结果
+
+    event_log不为None时，每个事件加上 repo 字段后同时写入事件日志
+    """
+    prefix = f"[{repo['name']}] "
+    steps = []
+    last_events = {}
+    
+    def event_callback(event):
+        event_type = event["type"]
+        if event_type == "output_chunk":
+            with print_lock:
+                for line in event["text"].rstrip("\n").split("\n"):
+                    safe_print(prefix + line)
+                safe_flush()
+        elif event_type == "step_finished":
+            steps.append({"step": event["step"], "exit_code": event["exit_code"], "duration": event["duration"]})
+        elif event_type in ("conflict", "timeout"):
+            last_events[event_type] = event
+        if event_log:
+            event_log(dict(event, repo=repo["name"]))
+    
+    # 每个仓库使用单独的转录文件: transcript.log -> transcript.<标签名>.log
+    if runner_options.get("transcript_path"):
+        root, ext = os.path.splitext(runner_options["transcript_path"])
+        safe_name = "".join(c if c.isalnum() or c in "-_" else "_" for c in repo["name"])
+        runner_options = dict(runner_options, transcript_path=f"{root}.{safe_name}{ext}")
+    if repo.get("remote"):
+        runner_options = dict(runner_options, remote=repo["remote"])
+    if repo.get("verify_command") is not None:
+        runner_options = dict(runner_options, verify_command=repo["verify_command"])
+    if repo.get("idle_timeout"):
+        runner_options = dict(runner_options, idle_timeout=repo["idle_timeout"])
+    
+    runner = WorkflowRunner(repo["path"], repo["target_branch"], echo=False, event_callback=event_callback, **runner_options)
+    start_time = time.monotonic()
+    try:
+        runner.run()
+    except Exception as e:
+        runner.log_error(f"执行出错: {e}")
+        runner.outcome = "failed"
+    
+    result = {
+        "name": repo["name"],
+        "path": repo["path"],
+        "target_branch": repo["target_branch"],
+        "status": runner.outcome if runner.outcome in BATCH_STATUSES else "failed",
+        "duration": round(time.monotonic() - start_time, 3),
+        "steps": steps
+    }
+    if runner.outcome == "conflict" and "conflict" in last_events:
+        result["step"] = last_events["conflict"]["step"]
+    elif runner.outcome == "timeout" and "timeout" in last_events:
+        result["command"] = last_events["timeout"]["command"]
+    if runner.network_stats:
+        result["network"] = runner.network_stats
+    return result
+
+def run_batch(repos, jobs=4, runner_options=None, event_log=None):
+    """
+    在有界的并发池中为多个仓库执行工作流
+
+    总耗时接近最慢的单个仓库，而不是所有仓库耗时之和
+    """
+    print_lock = threading.Lock()
+    runner_options = runner_options or {}
+    start_time = time.monotonic()
+    jobs = max(1, min(jobs, len(repos) or 1))
+    
+    with ThreadPoolExecutor(max_workers=jobs) as executor:
+        results = list(executor.map(lambda repo: run_batch_repo(repo, print_lock, runner_options, event_log), repos))
+    
+    counts = dict.fromkeys(BATCH_STATUSES, 0)
+    for result in results:
+        counts[result["status"]] += 1
+    
+    return {
+        "total": len(results),
+        "jobs": jobs,
+        "wall_time": round(time.monotonic() - start_time, 3),
+        "counts": counts,
+        "repos": results
+    }
+
+def batch_main():
+    """批量模式入口: --batch [配置文件] [--jobs N] [--target-branch 目标分支] [--summary 输出文件] [--events 事件日志] [--remote 远程仓库] [--fetch-once] [--worktree] [--engine merge-tree]"""
+    try:
+        jobs = int(get_cli_option("--jobs", "4"))
+    except ValueError:
+        log_error("无效的 --jobs 参数")
+        sys.exit(1)
+    
+    try:
+        repos = load_repo_list("--batch", get_cli_option("--target-branch", "develop"))
+    except (OSError, ValueError) as e:
+        log_error(f"读取配置文件失败: {e}")
+        sys.exit(1)
+    
+    runner_options = get_runner_options()
+    for repo in repos:
+        error = check_fanout_options(repo["target_branch"], runner_options)
+        if error:
+            log_error(f"[{repo['name']}] {error}")
+            sys.exit(1)
+    
+    summary = run_batch(repos, jobs, runner_options, get_event_log())
+    summary_json = json.dumps(summary, ensure_ascii=False)
+    
+    summary_file = get_cli_option("--summary")
+    if summary_file:
+        with open(summary_file, 'w', encoding='utf-8') as f:
+            json.dump(summary, f, ensure_ascii=False, indent=2)
+    
+    safe_print(f"BATCH_SUMMARY_JSON:{summary_json}")
+    safe_flush()
+    sys.exit(0 if summary["counts"]["done"] == summary["total"] else 1)
+
+# 冲突预测中每个目标分支的结果说明
+PREDICTION_STATUS_TEXT = {
+    "clean": "可以合并",
+    "fast-forward": "可以快进",
+    "up-to-date": "已包含开发分支",
+    "conflict": "冲突",
+    "failed": "失败",
+}
+
+def run_quiet_git(args, cwd, timeout=120):
+    """静默执行git命令，返回CompletedProcess（文本输出）"""
+    return subprocess.run(
+        ['git'] + args,
+        cwd=cwd,
+        capture_output=True,
+        text=True,
+        encoding='utf-8',
+        errors='replace',
+        timeout=timeout,
+        env=dict(build_git_env(), GIT_TERMINAL_PROMPT="0"),
+        creationflags=get_subprocess_flags()
+    )
+
+def predict_conflicts(project_path, target_branch="develop", remote=DEFAULT_REMOTE, fetch=True):
+    """
+    预测当前分支合并到每个目标分支是否冲突（git merge-tree，不修改工作区、索引和本地分支）
+
+    Args:
+        target_branch: 目标分支，可以是逗号分隔的多个
+        fetch: 是否先静默fetch目标分支（只更新 <远程>/<目标分支>）
+    Returns:
+        [{"target", "status", "conflicted_files", "error"}]，status为 clean / fast-forward / up-to-date / conflict / failed
+    """
+    targets = parse_target_branches(target_branch)
+    
+    def failed(error):
+        return [{"target": target, "status": "failed", "conflicted_files": [], "error": error} for target in targets]
+    
+    service = get_query_service(project_path)
+    try:
+        branch = service.current_branch()
+    except OSError as e:
+        return failed(str(e))
+    if not branch:
+        return failed("不是git仓库")
+    if branch == "HEAD":
+        return failed("当前处于分离HEAD状态")
+    
+    try:
+        if fetch:
+            result = run_quiet_git(build_prefetch_command(targets, remote)[1:], project_path)
+            if result.returncode != 0:
+                lines = result.stderr.strip().splitlines()
+                return failed(f"fetch失败: {lines[-1] if lines else result.returncode}")
+        
+        predictions = []
+        for target in targets:
+            target_ref = f"{remote}/{target}"
+            prediction = {"target": target, "status": "failed", "conflicted_files": [], "error": None}
+            predictions.append(prediction)
+            if service.resolve(target_ref) is None:
+                prediction["error"] = f"远程分支 {target_ref} 不存在"
+            elif service.is_ancestor(branch, target_ref):
+                prediction["status"] = "up-to-date"
+            elif service.is_ancestor(target_ref, branch):
+                prediction["status"] = "fast-forward"
+            else:
+                result = run_quiet_git(['merge-tree', '--write-tree', '--name-only', '--no-messages', target_ref, branch], project_path)
+                lines = result.stdout.splitlines()
+                if result.returncode == 0:
+                    prediction["status"] = "clean"
+                elif result.returncode == 1 and lines:
+                    # 第一行是树对象ID，之后是冲突文件列表（到空行为止）
+                    files = []
+                    for line in lines[1:]:
+                        if not line.strip():
+                            break
+                        files.append(line.strip())
+                    prediction.update(status="conflict", conflicted_files=files)
+                else:
+                    prediction["error"] = (result.stderr.strip().splitlines() or [f"退出码 {result.returncode}"])[-1]
+        return predictions
+    except (OSError, subprocess.TimeoutExpired) as e:
+        return failed(str(e))
+
+def predict_repos(repos, jobs=4, fetch=True, result_callback=None):
+    """
+    在有界的并发池中为多个仓库预测冲突
+
+    Args:
+        repos: load_batch_config 格式的仓库列表
+        result_callback: 每个仓库完成时以结果调用（在后台线程中）
+    Returns:
+        [{"name", "path", "branch", "remote", "targets": [...]}]，与repos顺序一致
+    """
+    def predict(repo):
+        remote = repo.get("remote") or DEFAULT_REMOTE
+        try:
+            branch = get_query_service(repo["path"]).current_branch()
+        except OSError:
+            branch = None
+        result = {
+            "name": repo["name"],
+            "path": repo["path"],
+            "branch": branch,
+            "remote": remote,
+            "targets": predict_conflicts(repo["path"], repo["target_branch"], remote, fetch)
+        }
+        if result_callback:
+            result_callback(result)
+        return result
+    
+    jobs = max(1, min(jobs, len(repos) or 1))
+    with ThreadPoolExecutor(max_workers=jobs) as executor:
+        return list(executor.map(predict, repos))
+
+def format_prediction(result):
+    """一个仓库的预测结果（每个目标分支一行）"""
+    lines = []
+    for target in result["targets"]:
+        text = PREDICTION_STATUS_TEXT[target["status"]]
+        if target["conflicted_files"]:
+            text += f": {', '.join(target['conflicted_files'])}"
+        if target["error"]:
+            text += f": {target['error']}"
+        lines.append(f"{pad_display(result['name'], 24)} {pad_display(result['branch'] or '-', 20)} -> {result['remote']}/{target['target']}  {text}")
+    return "\n".join(lines)
+
+def predict_main():
+    """冲突预测入口: --predict [配置文件] [--jobs N] [--target-branch 目标分支] [--no-fetch] [--json] [--clean-config 输出文件]"""
+    try:
+        jobs = int(get_cli_option("--jobs", "8"))
+    except ValueError:
+        log_error("无效的 --jobs 参数")
+        sys.exit(1)
+    try:
+        repos = load_repo_list("--predict", get_cli_option("--target-branch", "develop"))
+    except (OSError, ValueError) as e:
+        log_error(f"读取配置文件失败: {e}")
+        sys.exit(1)
+    
+    as_json = "--json" in sys.argv
+    print_lock = threading.Lock()
+    
+    def print_result(result):
+        if not as_json:
+            with print_lock:
+                safe_print(format_prediction(result))
+                safe_flush()
+    
+    results = predict_repos(repos, jobs, fetch="--no-fetch" not in sys.argv, result_callback=print_result)
+    statuses = {target["status"] for result in results for target in result["targets"]}
+    clean = [all(target["status"] not in ("conflict", "failed") for target in result["targets"]) for result in results]
+    
+    # 没有冲突的仓库写成批量模式的配置文件，可以直接用 --batch 合并
+    clean_config = get_cli_option("--clean-config")
+    if clean_config:
+        tags = []
+        for repo, is_clean in zip(repos, clean):
+            if is_clean:
+                tag = {"name": repo["name"], "path": repo["path"], "target_branch": repo["target_branch"]}
+                if repo.get("remote"):
+                    tag["remote"] = repo["remote"]
+                tags.append(tag)
+        with open(clean_config, 'w', encoding='utf-8') as f:
+            json.dump({"quick_tags": tags}, f, ensure_ascii=False, indent=2)
+    
+    if as_json:
+        safe_print(json.dumps(results, ensure_ascii=False, indent=2))
+    else:
+        conflicted = [result["name"] for result, is_clean in zip(results, clean) if not is_clean]
+        safe_print(f"\n共 {len(results)} 个仓库，{sum(clean)} 个可以直接合并" + (f"，需要处理: {', '.join(conflicted)}" if conflicted else ""))
+    safe_flush()
+    
+    # 退出码: 0 全部可以合并, 10 有冲突, 1 有失败
+    if "failed" in statuses:
+        sys.exit(1)
+    sys.exit(10 if "conflict" in statuses else 0)
+
+# 合并队列守护进程的默认端口（只监听127.0.0.1）
+DEFAULT_DAEMON_PORT = 8765
+# 一批最多合并的分支数
+MERGE_QUEUE_MAX_BATCH = 8
+# 推送因目标分支前进被拒绝（非快进）时重新fetch并重试的次数（退避时间见 push_retry_delay）
+MERGE_QUEUE_PUSH_RETRIES = PUSH_RETRY_LIMIT
+# 保留在内存中的已完成请求数
+MERGE_QUEUE_MAX_FINISHED = 1000
+
+# 合并请求的状态说明
+MERGE_REQUEST_STATUS_TEXT = {
+    "queued": "排队中",
+    "running": "合并中",
+    "merged": "已合并",
+    "up-to-date": "已包含在目标分支中",
+    "conflict": "冲突",
+    "failed": "失败",
+}
+
+class MergeQueue:
+    """
+    本地合并队列: 按 (仓库, 远程, 目标分支) 串行处理合并请求
+
+    每个队列有一个工作线程，每次取出最多max_batch个排队的分支，在最新的 <远程>/<目标分支> 上
+    依次用 git merge-tree 和 git commit-tree 生成合并提交（不修改工作区、索引和本地分支），
+    最后只推送一次。推送因非快进被拒绝时重新fetch后重试；某个分支冲突或不存在时只把该分支
+    标记为冲突/失败，其余分支重新合并；推送被服务器拒绝（无法确定与哪个分支有关）时，
+    把这一批拆成两半分别重试，直到找出有问题的分支
+    """
+    
+    def __init__(self, max_batch=MERGE_QUEUE_MAX_BATCH, push_retries=MERGE_QUEUE_PUSH_RETRIES, event_callback=None):
+        """
+        Args:
+            event_callback: 请求状态变化时以请求字典的副本调用（在工作线程中）
+        """
+        self.max_batch = max(1, max_batch)
+        self.push_retries = max(0, push_retries)
+        self.event_callback = event_callback
+        self.lock = threading.Lock()
+        self.requests = {}
+        self.finished = deque()
+        self.queues = {}
+        self.running = {}
+        self.workers = {}
+        self.repos = {}
+        self.next_id = 1
+        self.started = time.time()
+        self.stats = {
+            "submitted": 0,
+            "merged": 0,
+            "up-to-date": 0,
+            "conflict": 0,
+            "failed": 0,
+            "batches": 0,
+            "pushes": 0,
+            "push_retries": 0,
+            "splits": 0,
+        }
+        self.latencies = deque(maxlen=1000)
+    
+    def submit(self, repo, branch, target_branch="develop", remote=DEFAULT_REMOTE):
+        """
+        加入一个合并请求，返回请求字典的副本
+
+        Raises:
+            ValueError: 参数无效或路径不是git仓库
+        """
+        if not repo or not branch:
+            raise ValueError("缺少 repo 或 branch")
+        repo = os.path.abspath(repo)
+        if not os.path.isdir(repo) or run_quiet_git(['rev-parse', '--git-dir'], repo, timeout=30).returncode != 0:
+            raise ValueError(f"不是git仓库: {repo}")
+        
+        key = (os.path.normcase(repo), remote or DEFAULT_REMOTE, target_branch or "develop")
+        with self.lock:
+            request = {
+                "id": self.next_id,
+                "repo": repo,
+                "branch": branch,
+                "target_branch": key[2],
+                "remote": key[1],
+                "status": "queued",
+                "submitted": time.time(),
+                "started": None,
+                "finished": None,
+                "commit": None,
+                "batch_size": None,
+                "conflicted_files": [],
+                "error": None,
+            }
+            self.next_id += 1
+            self.requests[request["id"]] = request
+            self.queues.setdefault(key, deque()).append(request["id"])
+            self.repos.setdefault(key, repo)
+            self.stats["submitted"] += 1
+            if key not in self.workers:
+                worker = threading.Thread(target=self.process_queue, args=(key,), daemon=True)
+                self.workers[key] = worker
+                worker.start()
+            return dict(request)
+    
+    def get(self, request_id):
+        """请求字典的副本，不存在时返回None"""
+        with self.lock:
+            request = self.requests.get(request_id)
+            return dict(request) if request else None
+    
+    def snapshot(self):
+        """队列状态和吞吐量统计"""
+        with self.lock:
+            uptime = time.time() - self.started
+            queues = []
+            for key in sorted(set(self.queues) | set(self.running)):
+                queues.append({
+                    "repo": self.repos[key],
+                    "remote": key[1],
+                    "target_branch": key[2],
+                    "queued": [self.requests[request_id]["branch"] for request_id in self.queues.get(key, ())],
+                    "running": [self.requests[request_id]["branch"] for request_id in self.running.get(key, [])],
+                })
+            completed = self.stats["merged"] + self.stats["up-to-date"]
+            return {
+                "uptime": round(uptime, 1),
+                "queues": queues,
+                "stats": dict(self.stats),
+                "throughput_per_minute": round(completed / uptime * 60, 2) if uptime > 0 else 0.0,
+                "latency": describe_durations(list(self.latencies)) if self.latencies else None,
+            }
+    
+    def update(self, request_ids, **fields):
+        """更新请求字段；进入最终状态时记录统计并通知"""
+        with self.lock:
+            changed = []
+            for request_id in request_ids:
+                request = self.requests[request_id]
+                request.update(fields)
+                if request["status"] not in ("queued", "running"):
+                    request["finished"] = time.time()
+                    self.stats[request["status"]] += 1
+                    self.latencies.append(request["finished"] - request["submitted"])
+                    self.finished.append(request_id)
+                changed.append(dict(request))
+            # 只保留最近的已完成请求
+            while len(self.finished) > MERGE_QUEUE_MAX_FINISHED:
+                self.requests.pop(self.finished.popleft(), None)
+        if self.event_callback:
+            for request in changed:
+                self.event_callback(request)
+    
+    def process_queue(self, key):
+        """一个队列的工作线程: 逐批处理直到队列为空"""
+        while True:
+            with self.lock:
+                queue = self.queues.get(key)
+                if not queue:
+                    self.queues.pop(key, None)
+                    self.workers.pop(key, None)
+                    return
+                batch = [queue.popleft() for _ in range(min(self.max_batch, len(queue)))]
+                self.running[key] = batch
+            self.update(batch, status="running", started=time.time())
+            try:
+                self.process_batch(key, batch)
+            except Exception as e:
+                with self.lock:
+                    pending = [request_id for request_id in batch if self.requests.get(request_id, {}).get("status") == "running"]
+                self.update(pending, status="failed", error=str(e))
+            finally:
+                with self.lock:
+                    self.running.pop(key, None)
+    
+    def process_batch(self, key, batch, batch_size=None):
+        """
+        合并一批分支: 冲突或不存在的分支单独标记后，其余分支重新合并；
+        推送被拒绝时拆成两半分别处理
+
+        Args:
+            batch_size: 记录在请求中的批次大小（拆分前取出的分支数），默认为len(batch)
+        """
+        batch_size = batch_size or len(batch)
+        while batch:
+            outcome = self.merge_batch(key, batch)
+            status = outcome["status"]
+            if status == "merged":
+                for request_id, branch_status in outcome["branches"].items():
+                    self.update([request_id], status=branch_status, commit=outcome["commit"], batch_size=batch_size)
+                return
+            if status in ("conflict", "invalid"):
+                # merge_batch 已经确定是哪个分支，只标记该分支，其余分支不受影响
+                request_id = outcome["request_id"]
+                self.update([request_id], status="conflict" if status == "conflict" else "failed",
+                            conflicted_files=outcome.get("conflicted_files", []), error=outcome["error"], batch_size=batch_size)
+                batch = [other for other in batch if other != request_id]
+                continue
+            if status == "error" or len(batch) == 1:
+                # fetch失败等与分支无关的错误不拆分，整批失败
+                self.update(batch, status="failed", error=outcome.get("error"), batch_size=batch_size)
+                return
+            with self.lock:
+                self.stats["splits"] += 1
+            middle = len(batch) // 2
+            self.process_batch(key, batch[:middle], batch_size)
+            self.process_batch(key, batch[middle:], batch_size)
+            return
+    
+    def merge_batch(self, key, batch):
+        """
+        在最新的目标分支上依次合并一批分支并推送一次
+
+        Returns:
+            {"status": "merged", "commit", "branches": {请求ID: merged / up-to-date}}，
+            {"status": "conflict" / "invalid", "request_id", "conflicted_files", "error"}（该分支冲突或不存在），
+            {"status": "rejected", "error"}（推送被服务器拒绝，可能与某个分支有关，可以拆分批次），
+            或 {"status": "error", "error"}（与分支无关，不拆分）
+        """
+        repo, remote, target = self.repos[key], key[1], key[2]
+        target_ref = f"refs/remotes/{remote}/{target}"
+        branches = [(request_id, self.requests[request_id]["branch"]) for request_id in batch]
+        with self.lock:
+            self.stats["batches"] += 1
+        
+        def last_line(result):
+            lines = (result.stderr or result.stdout).strip().splitlines()
+            return lines[-1] if lines else f"退出码 {result.returncode}"
+        
+        for attempt in range(self.push_retries + 1):
+            if attempt:
+                with self.lock:
+                    self.stats["push_retries"] += 1
+                time.sleep(push_retry_delay(attempt))
+            result = run_quiet_git(build_prefetch_command(target, remote)[1:], repo)
+            if result.returncode != 0:
+                return {"status": "error", "error": f"fetch失败: {last_line(result)}"}
+            result = run_quiet_git(['rev-parse', '--verify', '--quiet', target_ref], repo, timeout=30)
+            if result.returncode != 0:
+                return {"status": "error", "error": f"远程分支 {remote}/{target} 不存在"}
+            base = head = result.stdout.strip()
+            
+            statuses = {}
+            merged_branches = []  # 本次已合并到head上的分支
+            for request_id, branch in branches:
+                result = run_quiet_git(['rev-parse', '--verify', '--quiet', f"{branch}^{{commit}}"], repo, timeout=30)
+                if result.returncode != 0:
+                    return {"status": "invalid", "request_id": request_id, "error": f"分支 {branch} 不存在"}
+                commit = result.stdout.strip()
+                if run_quiet_git(['merge-base', '--is-ancestor', commit, head], repo, timeout=60).returncode == 0:
+                    statuses[request_id] = "up-to-date"
+                    continue
+                statuses[request_id] = "merged"
+                if run_quiet_git(['merge-base', '--is-ancestor', head, commit], repo, timeout=60).returncode == 0:
+                    head = commit
+                    merged_branches.append(branch)
+                    continue
+                
+                result = run_quiet_git(['merge-tree', '--write-tree', '--name-only', '--no-messages', head, commit], repo)
+                lines = result.stdout.splitlines()
+                if result.returncode == 1 and lines:
+                    files = []
+                    for line in lines[1:]:
+                        if not line.strip():
+                            break
+                        files.append(line.strip())
+                    if merged_branches:
+                        # head已包含同一批中先合并的分支，冲突可能来自这些分支
+                        error = f"{branch} 与 {remote}/{target} 合并 {', '.join(merged_branches)} 后的结果冲突"
+                    else:
+                        error = f"{branch} 与 {remote}/{target} 冲突"
+                    return {"status": "conflict", "request_id": request_id, "conflicted_files": files, "error": error}
+                if result.returncode != 0 or not lines:
+                    return {"status": "error", "error": f"计算 {branch} 的合并结果失败: {last_line(result)}"}
+                result = run_quiet_git(['commit-tree', lines[0], '-p', head, '-p', commit,
+                                        '-m', f"Merge branch '{branch}' into {target}"], repo, timeout=30)
+                if result.returncode != 0:
+                    return {"status": "error", "error": f"创建合并提交失败: {last_line(result)}"}
+                head = result.stdout.strip()
+                merged_branches.append(branch)
+            
+            if head == base:
+                return {"status": "merged", "commit": head, "branches": statuses}
+            
+            result = run_quiet_git(['push', '--porcelain', remote, f"{head}:refs/heads/{target}"], repo)
+            with self.lock:
+                self.stats["pushes"] += 1
+            if result.returncode == 0:
+                return {"status": "merged", "commit": head, "branches": statuses}
+            flag = parse_push_porcelain(result.stdout).get(f"refs/heads/{target}")
+            if flag != "!":
+                return {"status": "error", "error": f"推送失败: {last_line(result)}"}
+            if not is_non_fast_forward(result.stdout):
+                # 被服务器钩子等拒绝，可能与某个分支的内容有关
+                summary = next((line.split("\t")[-1] for line in result.stdout.splitlines() if line.startswith("!\t")), last_line(result))
+                return {"status": "rejected", "error": f"推送被拒绝: {summary}"}
+        return {"status": "error", "error": f"目标分支持续更新，重试 {self.push_retries} 次后仍推送失败"}
+
+class MergeQueueHandler(BaseHTTPRequestHandler):
+    """
+    合并队列的HTTP接口
+
+    POST /merge           {"repo", "branch", "target_branch", "remote"}，返回202和请求
+    GET  /requests/<id>   请求状态
+    GET  /queue           队列状态和吞吐量统计
+    """
+    
+    def send_json(self, status, data):
+        body = json.dumps(data, ensure_ascii=False).encode('utf-8')
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+    
+    def do_GET(self):
+        queue = self.server.merge_queue
+        if self.path == "/queue":
+            return self.send_json(200, queue.snapshot())
+        if self.path.startswith("/requests/"):
+            try:
+                request = queue.get(int(self.path[len("/requests/"):]))
+            except ValueError:
+                request = None
+            if request:
+                return self.send_json(200, request)
+        self.send_json(404, {"error": "not found"})
+    
+    def do_POST(self):
+        if self.path != "/merge":
+            return self.send_json(404, {"error": "not found"})
+        try:
+            length = int(self.headers.get("Content-Length") or 0)
+            data = json.loads(self.rfile.read(length).decode('utf-8') or "{}")
+            if not isinstance(data, dict):
+                raise ValueError("请求体必须是JSON对象")
+            request = self.server.merge_queue.submit(
+                data.get("repo"), data.get("branch"),
+                data.get("target_branch") or data.get("target") or "develop",
+                data.get("remote") or DEFAULT_REMOTE
+            )
+        except ValueError as e:
+            return self.send_json(400, {"error": str(e)})
+        self.send_json(202, request)
+    
+    def log_message(self, format, *args):
+        pass
+
+def format_merge_request(request):
+    """一个合并请求的状态（一行）"""
+    text = MERGE_REQUEST_STATUS_TEXT[request["status"]]
+    if request["conflicted_files"]:
+        text += f": {', '.join(request['conflicted_files'])}"
+    elif request["error"]:
+        text += f": {request['error']}"
+    elif request["commit"]:
+        text += f" ({request['commit'][:7]}，本批 {request['batch_size']} 个分支)"
+    return f"#{request['id']} {request['branch']} -> {request['remote']}/{request['target_branch']}  {text}"
+
+def daemon_main():
+    """合并队列守护进程入口: --daemon [--port N] [--max-batch N]"""
+    try:
+        port = int(get_cli_option("--port", str(DEFAULT_DAEMON_PORT)))
+        max_batch = int(get_cli_option("--max-batch", str(MERGE_QUEUE_MAX_BATCH)))
+    except ValueError:
+        log_error("无效的 --port 或 --max-batch 参数")
+        sys.exit(1)
+    
+    def print_request(request):
+        if request["status"] != "running":
+            safe_print(f"[{datetime.now().strftime('%H:%M:%S')}] {format_merge_request(request)}")
+            safe_flush()
+    
+    try:
+        server = ThreadingHTTPServer(("127.0.0.1", port), MergeQueueHandler)
+    except OSError as e:
+        log_error(f"无法监听端口 {port}: {e}")
+        sys.exit(1)
+    server.merge_queue = MergeQueue(max_batch=max_batch, event_callback=print_request)
+    safe_print(f"合并队列已启动: http://127.0.0.1:{server.server_address[1]}")
+    safe_flush()
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+    sys.exit(0)
+
+def queue_client_main(project_path, target_branch):
+    """把当前分支提交到合并队列并等待结果: 项目路径 --queue [--port N] [--branch 分支] [--remote 远程仓库]"""
+    port = get_cli_option("--port", str(DEFAULT_DAEMON_PORT))
+    base_url = f"http://127.0.0.1:{port}"
+    branch = get_cli_option("--branch")
+    if not branch:
+        try:
+            branch = get_query_service(project_path).current_branch()
+        except OSError:
+            branch = None
+        if not branch or branch == "HEAD":
+            log_error("无法确定当前分支，请用 --branch 指定")
+            sys.exit(1)
+    
+    data = json.dumps({
+        "repo": os.path.abspath(project_path),
+        "branch": branch,
+        "target_branch": target_branch,
+        "remote": get_cli_option("--remote", DEFAULT_REMOTE),
+    }).encode('utf-8')
+    try:
+        with urllib.request.urlopen(urllib.request.Request(f"{base_url}/merge", data=data, headers={"Content-Type": "application/json"}), timeout=30) as response:
+            request = json.loads(response.read().decode('utf-8'))
+        safe_print(f"已加入合并队列: {format_merge_request(request)}")
+        safe_flush()
+        while request["status"] in ("queued", "running"):
+            time.sleep(1)
+            with urllib.request.urlopen(f"{base_url}/requests/{request['id']}", timeout=30) as response:
+                request = json.loads(response.read().decode('utf-8'))
+    except urllib.error.HTTPError as e:
+        log_error(f"合并队列拒绝了请求: {e.read().decode('utf-8', errors='replace')}")
+        sys.exit(1)
+    except (OSError, ValueError) as e:
+        log_error(f"无法连接合并队列 {base_url}: {e}")
+        sys.exit(1)
+    
+    if request["status"] in ("merged", "up-to-date"):
+        log_success(format_merge_request(request))
+        sys.exit(0)
+    log_error(format_merge_request(request))
+    sys.exit(CONFLICT_RETURN_CODE if request["status"] == "conflict" else 1)
+
+def worker_main():
+    """
+    常驻引擎进程入口（--worker）: 模块只加载一次，之后从stdin逐行读取JSON命令，向stdout逐行写入JSON消息
+
+    命令:
+        {"cmd": "run", "id": 1, "project_path": ..., "target_branch": ..., "options": {...}, "discard_journal": false}
+        {"cmd": "continue", "id": 2, "project_path": ..., "step": 3, "branch": ..., "target_branch": ..., "options": {...}}
+        {"cmd": "resume", "id": 3, "project_path": ..., "options": {...}}（从工作流日志继续）
+        {"cmd": "cancel", "id": 1}
+        {"cmd": "shutdown"}
+    消息:
+        WorkflowRunner的结构化事件加上请求ID，例如
+        {"id": 1, "type": "output_chunk", "text": ..., "style": ...}
+        {"id": 1, "type": "finished", "outcome": "done", "success": true, "duration": ...}
+        执行器抛出异常时: {"id": 1, "type": "error", "error": ...}
+    每个run/continue命令在单独的线程中执行，执行期间仍可接收cancel命令
+    """
+    stdin = sys.stdin.buffer if sys.stdin is not None else os.fdopen(0, 'rb')
+    stdout = sys.stdout.buffer if sys.stdout is not None else os.fdopen(1, 'wb')
+    # stdout专用于协议消息，其它打印输出改到stderr
+    sys.stdout = sys.stderr
+    
+    write_lock = threading.Lock()
+    runners = {}
+    threads = []
+    
+    def send(message):
+        data = (json.dumps(message, ensure_ascii=False) + "\n").encode('utf-8')
+        with write_lock:
+            try:
+                stdout.write(data)
+                stdout.flush()
+            except (OSError, ValueError):
+                pass  # GUI已退出
+    
+    def execute(request):
+        request_id = request.get("id")
+        try:
+            target_branch = request.get("target_branch") or "develop"
+            options = dict(request.get("options", {}))
+            journal = None
+            if request["cmd"] == "resume":
+                journal = load_journal(request["project_path"])
+                if journal is None:
+                    raise ValueError("没有未完成的工作流日志")
+                target_branch = journal.get("target_branch") or target_branch
+                options.update(journal_options(journal))
+            
+            runner = WorkflowRunner(
+                request["project_path"],
+                target_branch,
+                echo=False,
+                event_callback=lambda event: send(dict(event, id=request_id)),
+                **options
+            )
+            runners[request_id] = runner
+            if request["cmd"] == "continue":
+                runner.resume(int(request["step"]), request["branch"])
+            elif journal is not None:
+                runner.resume_journal(journal)
+            else:
+                runner.run(discard_journal=bool(request.get("discard_journal")))
+        except Exception as e:
+            send({"id": request_id, "type": "error", "error": str(e)})
+        finally:
+            runners.pop(request_id, None)
+    
+    for raw in stdin:
+        try:
+            request = json.loads(raw.decode('utf-8'))
+        except ValueError:
+            continue
+        
+        cmd = request.get("cmd")
+        if cmd in ("run", "continue", "resume"):
+            thread = threading.Thread(target=execute, args=(request,), daemon=True)
+            thread.start()
+            threads = [t for t in threads if t.is_alive()] + [thread]
+        elif cmd == "cancel":
+            runner = runners.get(request.get("id"))
+            if runner:
+                runner.cancel()
+        elif cmd == "shutdown":
+            break
+    
+    # 管道关闭或收到shutdown: 取消仍在执行的工作流并退出
+    for runner in list(runners.values()):
+        runner.cancel()
+    for thread in threads:
+        thread.join(timeout=5)
+    close_query_services()
+
+def pad_display(text, width):
+    """按终端显示宽度（中文字符占两列）在右侧补齐空格"""
+    text = str(text)
+    display_width = sum(2 if unicodedata.east_asian_width(c) in "WF" else 1 for c in text)
+    return text + " " * max(0, width - display_width)
+
+def format_step_label(step):
+    """报告中步骤的显示名称"""
+    return "整次运行" if step == "total" else f"步骤{step + 1}"
+
+def report_main():
+    """运行历史报告入口: --report [--repo 项目路径] [--days N] [--period day|week] [--history 文件] [--json]"""
+    since = None
+    days = get_cli_option("--days")
+    if days:
+        try:
+            since = time.time() - float(days) * 86400
+        except ValueError:
+            log_error("无效的 --days 参数")
+            sys.exit(1)
+    period = get_cli_option("--period")
+    if period not in (None, "day", "week"):
+        log_error(f"无效的 --period 参数: {period}")
+        sys.exit(1)
+    
+    try:
+        records = load_history(get_cli_option("--history"), get_cli_option("--repo"), since)
+    except OSError as e:
+        log_error(f"读取运行历史失败: {e}")
+        sys.exit(1)
+    rows = summarize_history(records, period)
+    
+    # 推送因非快进被拒绝后重试的运行
+    retried = [record.get("push_retries", 0) for record in records if record.get("push_retries")]
+    
+    if "--json" in sys.argv:
+        safe_print(json.dumps({"runs": len(records), "retried_runs": len(retried), "push_retries": sum(retried), "rows": rows}, ensure_ascii=False, indent=2))
+        return
+    
+    if not rows:
+        safe_print("没有运行历史记录")
+        return
+    
+    retry_text = f"，其中 {len(retried)} 次推送被拒绝后重试（共重试 {sum(retried)} 次）" if retried else ""
+    safe_print(f"共 {len(records)} 次运行{retry_text}，耗时单位: 秒")
+    current_repo = None
+    for row in rows:
+        if row["repo"] != current_repo:
+            current_repo = row["repo"]
+            safe_print(f"\n{current_repo}")
+            safe_print(f"  {pad_display('时间', 12)}{pad_display('步骤', 10)}{'次数':>4}{'p50':>10}{'p95':>10}{'max':>10}")
+        safe_print(
+            f"  {pad_display(row['period'] or '全部', 12)}{pad_display(format_step_label(row['step']), 10)}"
+            f"{row['count']:>6}{row['p50']:>10.3f}{row['p95']:>10.3f}{row['max']:>10.3f}"
+        )
+
+def main():
+    if "--worker" in sys.argv:
+        return worker_main()
+    if "--report" in sys.argv:
+        return report_main()
+    if "--batch" in sys.argv:
+        return batch_main()
+    if "--predict" in sys.argv:
+        return predict_main()
+    if "--daemon" in sys.argv:
+        return daemon_main()
+    
+    if len(sys.argv) < 2:
+        log_error("请传入项目路径作为参数！")
+        safe_print(f"用法: python {os.path.basename(__file__)} \"项目路径\" [--target-branch 目标分支[,目标分支...]] [--atomic] [--remote 远程仓库] [--push-retries N] [--verify 验证命令] [--fetch-once] [--worktree] [--engine checkout|merge-tree] [--transcript 文件] [--events 事件日志] [--resume | --discard-journal]")
+        safe_print(f"      python {os.path.basename(__file__)} --batch [配置文件] [--jobs N] [--summary 输出文件]")
+        safe_print(f"      python {os.path.basename(__file__)} --predict [配置文件] [--jobs N] [--no-fetch] [--json] [--clean-config 输出文件]")
+        safe_print(f"      python {os.path.basename(__file__)} --daemon [--port N] [--max-batch N]")
+        safe_print(f"      python {os.path.basename(__file__)} \"项目路径\" --queue [--branch 分支] [--target-branch 目标分支] [--remote 远程仓库] [--port N]")
+        safe_print(f"      python {os.path.basename(__file__)} --report [--repo 项目路径] [--days N] [--period day|week] [--json]")
+        safe_print(f"      python {os.path.basename(__file__)} --worker")
+        pause_before_exit()
+        sys.exit(1)
+        
+    project_path = sys.argv[1]
+    target_branch = "develop"  # 默认目标分支
+    
+    # 解析目标分支参数
+    if "--target-branch" in sys.argv:
+        try:
+            target_branch_index = sys.argv.index("--target-branch")
+            if target_branch_index + 1 < len(sys.argv):
+                target_branch = sys.argv[target_branch_index + 1]
+        except (ValueError, IndexError):
+            log_error("无效的 --target-branch 参数")
+            sys.exit(1)
+    
+    if "--queue" in sys.argv:
+        return queue_client_main(project_path, target_branch)
+    
+    # 检查是否是继续执行模式
+    if len(sys.argv) >= 5 and sys.argv[2] == "--continue":
+        step_index = int(sys.argv[3])
+        current_branch = sys.argv[4]
+        
+        # 在继续模式中也支持目标分支参数
+        continue_target_branch = "develop"
+        if len(sys.argv) >= 7 and sys.argv[5] == "--target-branch":
+            continue_target_branch = sys.argv[6]
+        
+        result = continue_after_conflict(project_path, step_index, current_branch, continue_target_branch, event_callback=get_event_log(), **get_runner_options())
+    elif "--resume" in sys.argv:
+        result = resume_from_journal(project_path, event_callback=get_event_log(), **get_runner_options())
+        if result is None:
+            log_error("没有找到未完成的工作流日志")
+            sys.exit(1)
+    else:
+        # 上次运行没有完成时，需要明确选择继续还是丢弃，避免在目标分支上重新开始流程
+        journal = load_journal(project_path)
+        if journal is not None:
+            if "--discard-journal" in sys.argv:
+                discard_journal(project_path)
+            else:
+                log_warning(f"检测到未完成的工作流: {describe_journal(journal)}")
+                log_warning("加上 --resume 从该步骤继续，或加上 --discard-journal 丢弃记录后重新开始")
+                sys.exit(1)
+        runner_options = get_runner_options()
+        error = check_fanout_options(target_branch, runner_options)
+        if error:
+            log_error(error)
+            sys.exit(1)
+        result = execute_git_workflow(project_path, target_branch, event_callback=get_event_log(), **runner_options)
+    
+    # 退出码: 0 完成, 10 冲突, 1 失败
+    if isinstance(result, dict) and result.get("status") == "conflict":
+        sys.exit(10)
+    if result is not True:
+        pause_before_exit()
+        sys.exit(1)
+    sys.exit(0)
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -6,9 +6,9 @@ import os
 import threading
 import queue
 import json
+import time
 import importlib.util
-import io
-from contextlib import redirect_stdout, redirect_stderr
+from concurrent.futures import ThreadPoolExecutor
 
 def debug_print(message):
     """在开发环境中显示调试信息，在打包环境中静默"""
@@ -21,6 +21,196 @@ def get_subprocess_flags():
         return subprocess.CREATE_NO_WINDOW
     return 0
 
+# 终端默认最多保留的行数，超过后删除最早的行
+DEFAULT_MAX_TERMINAL_LINES = 5000
+
+# 两次刷新终端之间的最短间隔（毫秒），期间到达的输出合并为一次插入
+RENDER_FRAME_MS = 33
+
+# 兜底检查消息队列的间隔（毫秒），唤醒事件丢失时消息最多延迟这么久显示
+QUEUE_POLL_MS = 1000
+
+# 引擎输出样式对应的终端标签，未列出的样式与标签同名
+OUTPUT_STYLE_TAGS = {"command": "info"}
+
+# 运行历史的时间范围选项（天数，None表示全部）和分组选项
+HISTORY_RANGES = {"最近7天": 7, "最近30天": 30, "最近90天": 90, "全部": None}
+HISTORY_PERIODS = {"不分组": None, "按天": "day", "按周": "week"}
+
+# 快捷标签状态的检查间隔（毫秒）和并发数；未变化的仓库只检查文件修改时间，不启动git进程
+STATUS_REFRESH_MS = 5000
+STATUS_WORKERS = 4
+
+# 快捷标签按钮的颜色: 有操作正在进行 / 有未提交的修改 / 正常
+TAG_COLOR_OPERATION = "#f56c6c"
+TAG_COLOR_DIRTY = "#e6a23c"
+TAG_COLOR_NORMAL = "#409eff"
+
+def format_tag_status(status):
+    """把仓库状态快照格式化为标签按钮的第二行，例如 "feature ↑2 ↓1 *" """
+    if not status:
+        return "无法读取状态"
+    parts = [status["branch"]]
+    if status["ahead"] is not None:
+        parts.append(f"↑{status['ahead']} ↓{status['behind']}")
+    if status["dirty"]:
+        parts.append("*")
+    if status["operation"]:
+        parts.append(f"{status['operation']}中")
+    return " ".join(parts)
+
+# 后台预取的检查间隔（毫秒）和同时执行的fetch数量；预取间隔（分钟）在设置中修改，0表示关闭
+PREFETCH_TICK_MS = 30000
+PREFETCH_WORKERS = 2
+
+# 冲突预测同时处理的仓库数量
+PREDICT_JOBS = 8
+
+# 冲突后检查解决进度的间隔（毫秒）；索引未变化时只检查文件修改时间
+CONFLICT_WATCH_MS = 1000
+
+# 冲突解决后的处理方式: 显示名称 -> 设置值
+AUTO_CONTINUE_MODES = {"解决后询问是否继续": "confirm", "解决后自动继续": "auto", "不自动继续": "off"}
+
+_engine_module = None
+_engine_module_lock = threading.Lock()
+
+def load_engine_module():
+    """加载git_merge_auto模块（整个进程只加载一次，可从任意线程调用），打包环境中从临时目录加载"""
+    with _engine_module_lock:
+        return load_engine_module_locked()
+
+def load_engine_module_locked():
+    global _engine_module
+    if _engine_module is None:
+        if hasattr(sys, '_MEIPASS'):
+            script_path = os.path.join(getattr(sys, '_MEIPASS'), "git_merge_auto.py")
+        else:
+            script_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), "git_merge_auto.py")
+        spec = importlib.util.spec_from_file_location("git_merge_auto", script_path)
+        if spec is None or spec.loader is None:
+            raise ImportError(f"无法加载模块: {script_path}")
+        module = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(module)
+        _engine_module = module
+    return _engine_module
+
+class EngineWorker:
+    """
+    常驻的引擎进程，随GUI启动，git_merge_auto模块在其中只加载一次
+
+    通过stdin/stdout管道逐行收发JSON（协议见 git_merge_auto.worker_main），
+    收到的消息交给message_callback（在读取线程中调用）。引擎与Tk主循环不共享GIL和工作目录，
+    进程意外退出时，下一次发送命令会自动重新启动。
+    """
+    
+    def __init__(self, message_callback):
+        self.message_callback = message_callback
+        self.process = None
+        self.lock = threading.Lock()
+        self.next_id = 0
+        self.active_ids = set()  # 已发送但还没有收到结束消息的请求
+    
+    def get_command(self):
+        """打包环境中以 --engine-worker 参数重新启动exe自身，开发环境中运行 git_merge_auto.py --worker"""
+        if hasattr(sys, '_MEIPASS'):
+            return [sys.executable, "--engine-worker"]
+        script_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), "git_merge_auto.py")
+        return [sys.executable, script_path, "--worker"]
+    
+    def start(self):
+        """启动引擎进程（调用方需持有lock）"""
+        self.process = subprocess.Popen(
+            self.get_command(),
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            creationflags=get_subprocess_flags()
+        )
+        threading.Thread(target=self.read_messages, args=(self.process,), daemon=True).start()
+    
+    def read_messages(self, process):
+        """读取引擎进程的消息，放入消息队列"""
+        for raw in process.stdout:
+            try:
+                message = json.loads(raw.decode('utf-8'))
+            except ValueError:
+                continue
+            if message.get("type") in ("finished", "error"):
+                with self.lock:
+                    self.active_ids.discard(message.get("id"))
+            self.message_callback(message)
+        
+        # 进程退出: 未完成的请求全部报告为出错
+        with self.lock:
+            if self.process is not process:
+                return
+            lost_ids, self.active_ids = self.active_ids, set()
+        for request_id in lost_ids:
+            self.message_callback({"id": request_id, "type": "error", "error": "引擎进程意外退出"})
+    
+    def send(self, request):
+        """发送一条命令，引擎进程未启动或已退出时先启动"""
+        data = (json.dumps(request, ensure_ascii=False) + "\n").encode('utf-8')
+        with self.lock:
+            if self.process is None or self.process.poll() is not None:
+                self.start()
+            self.process.stdin.write(data)
+            self.process.stdin.flush()
+    
+    def submit(self, request):
+        """发送run/continue命令，返回请求ID"""
+        with self.lock:
+            self.next_id += 1
+            request["id"] = self.next_id
+            self.active_ids.add(self.next_id)
+        try:
+            self.send(request)
+        except OSError:
+            with self.lock:
+                self.active_ids.discard(request["id"])
+            raise
+        return request["id"]
+    
+    def run(self, project_path, target_branch, options=None, discard_journal=False):
+        """执行完整的工作流，discard_journal为True时先丢弃仓库中未完成的工作流日志"""
+        return self.submit({"cmd": "run", "project_path": project_path, "target_branch": target_branch, "options": options or {}, "discard_journal": discard_journal})
+    
+    def continue_run(self, project_path, step_index, current_branch, target_branch, options=None):
+        """冲突解决后从指定步骤继续执行"""
+        return self.submit({
+            "cmd": "continue",
+            "project_path": project_path,
+            "step": step_index,
+            "branch": current_branch,
+            "target_branch": target_branch,
+            "options": options or {}
+        })
+    
+    def resume(self, project_path, options=None):
+        """从仓库中未完成的工作流日志继续执行"""
+        return self.submit({"cmd": "resume", "project_path": project_path, "options": options or {}})
+    
+    def cancel(self, request_id):
+        """取消正在执行的请求，引擎会终止当前的git进程树"""
+        try:
+            self.send({"cmd": "cancel", "id": request_id})
+        except OSError:
+            pass
+    
+    def close(self):
+        """通知引擎进程退出，等待片刻后强制结束"""
+        with self.lock:
+            process, self.process = self.process, None
+        if process is None or process.poll() is not None:
+            return
+        try:
+            process.stdin.write(b'{"cmd": "shutdown"}\n')
+            process.stdin.flush()
+            process.stdin.close()
+            process.wait(timeout=3)
+        except (OSError, subprocess.TimeoutExpired):
+            process.kill()
+
 class GitMergeGUI:
     def __init__(self, master):
         self.master = master
@@ -44,19 +234,39 @@ class GitMergeGUI:
             except Exception as e:
                 print(f"设置窗口属性失败: {e}")
         
-        # 配置文件路径
-        self.config_file = "quick_tags_config.json"
+        # 快捷标签、仓库设置和界面设置保存在每个用户的配置库中，每次修改只写入变化的部分
+        self.store = self.open_config_store()
+        self.settings = {"max_terminal_lines": DEFAULT_MAX_TERMINAL_LINES, "auto_continue": "confirm", "prefetch_interval": 0}
         
         # 当前项目状态
         self.current_project_path = ""
         self.conflict_state = None  # 存储冲突状态信息
-        self.current_process = None  # 当前运行的进程
-        self.worker_thread = None  # 工作线程
         self.message_queue = queue.Queue()  # 消息队列
         self.is_running = False  # 标记是否正在执行任务
-        
-        # 启动消息处理
-        self.process_queue()
+        self.current_request_id = None  # 当前在引擎进程中执行的请求
+        self.current_step_text = "运行中"  # 运行按钮上显示的当前步骤
+        self.branch_executor = ThreadPoolExecutor(max_workers=1)  # 读取分支列表的后台线程
+        
+        # 快捷标签的仓库状态: 规范化路径 -> 状态快照；按钮和目标分支同样按规范化路径（tag_key）记录
+        self.tag_buttons = {}
+        self.tag_status = {}
+        self.tag_targets = {}  # 规范化路径 -> (远程仓库, 目标分支)，默认 origin/develop
+        self.status_pending = set()  # 正在后台计算状态的仓库（规范化路径）
+        self.status_executor = ThreadPoolExecutor(max_workers=STATUS_WORKERS)
+        self.prefetch_scheduler = None  # 启用后台预取后才创建
+        self.tag_prefetch = {}  # 规范化路径 -> 最近一次预取的结果
+        
+        # 终端输出先缓存为 (文本, 标签) 片段，每帧最多插入一次
+        self.pending_segments = []
+        self.render_scheduled = False
+        self.wakeup_pending = False  # 已通知Tk主循环有新消息，尚未处理
+        
+        # 有新消息时才唤醒Tk主循环，不再定时轮询消息队列
+        self.master.bind("<<EngineMessage>>", lambda event: self.schedule_render())
+        
+        # 随GUI启动常驻的引擎进程，之后每次运行不再重新启动解释器或加载模块
+        self.engine_worker = EngineWorker(self.post_message)
+        threading.Thread(target=self.start_engine_worker, daemon=True).start()
         
         # 绑定窗口关闭事件（点击X按钮时直接关闭程序）
         self.master.protocol("WM_DELETE_WINDOW", self.on_window_close)
@@ -72,8 +282,8 @@ class GitMergeGUI:
         self.tag_container = tk.Frame(self.tag_frame, bg="#ffffff")
         self.tag_container.pack(fill=tk.X, expand=True)
         
-        # 初始化快捷标签
-        self.existing_paths = []
+        # 初始化快捷标签: 规范化路径 -> {"name", "path"}，按添加顺序排列
+        self.tags = {}
         self.load_quick_tags()  # 加载保存的标签
         
         # 输入框
@@ -85,12 +295,20 @@ class GitMergeGUI:
                                  highlightbackground="#dcdfe6", relief=tk.FLAT)
         self.path_entry.pack(fill=tk.X, pady=(0, 10))
         
-        # 目标分支选择
+        # 目标分支选择（左侧为远程仓库）
         self.branch_label = tk.Label(self.top_frame, text="目标分支:", font=("Helvetica", 14), fg="#606266", cursor="hand2")
         self.branch_label.pack(anchor=tk.W, pady=(0, 5))
         
-        self.branch_combobox = ttk.Combobox(self.top_frame, width=47, font=("Helvetica", 14), state="readonly")
-        self.branch_combobox.pack(fill=tk.X, pady=(0, 10))
+        self.branch_row = tk.Frame(self.top_frame, bg="#ffffff")
+        self.branch_row.pack(fill=tk.X, pady=(0, 10))
+        
+        self.remote_combobox = ttk.Combobox(self.branch_row, width=10, font=("Helvetica", 14), state="readonly")
+        self.remote_combobox.pack(side=tk.LEFT, padx=(0, 10))
+        self.remote_combobox.set("origin")  # 默认远程仓库
+        self.remote_combobox.bind("<<ComboboxSelected>>", self.on_path_change)
+        
+        self.branch_combobox = ttk.Combobox(self.branch_row, width=35, font=("Helvetica", 14), state="readonly")
+        self.branch_combobox.pack(side=tk.LEFT, fill=tk.X, expand=True)
         self.branch_combobox.set("develop")  # 默认选择develop分支
         
         # 绑定路径输入框变化事件来刷新分支列表
@@ -119,6 +337,24 @@ class GitMergeGUI:
         )
         self.settings_btn.pack(side=tk.RIGHT, padx=(10, 0))
         
+        # 冲突预测按钮: 对所有快捷标签的仓库并行执行 git merge-tree，不修改工作区
+        self.predict_button = tk.Button(
+            self.button_frame,
+            text="冲突预测",
+            command=self.predict_conflicts,
+            bg="#e6a23c",
+            fg="white",
+            activebackground="#ebb563",
+            activeforeground="white",
+            relief=tk.FLAT,
+            bd=0,
+            padx=20,
+            pady=10,
+            font=("Helvetica", 14, "bold"),
+            cursor="hand2"
+        )
+        self.predict_button.pack(side=tk.RIGHT, padx=(10, 0))
+        
         # 运行按钮
         self.run_button = tk.Button(
             self.button_frame, 
@@ -184,6 +420,11 @@ class GitMergeGUI:
         )
         self.terminal.pack(fill=tk.BOTH, expand=True)
         
+        # 后台逐个刷新快捷标签的仓库状态，并按设置定期预取目标分支
+        self.refresh_tag_statuses()
+        self.master.after(PREFETCH_TICK_MS, self.prefetch_tick)
+        self.master.after(QUEUE_POLL_MS, self.poll_queue)
+        
         # 配置颜色标签
         self.terminal.tag_config("error", foreground="red")
         self.terminal.tag_config("success", foreground="#67c23a")
@@ -193,58 +434,46 @@ class GitMergeGUI:
     
 
     
-    def get_remote_branches(self, project_path):
-        """获取远程分支列表"""
+    def get_branch_choices(self, project_path, remote):
+        """
+        读取远程仓库和远程分支列表（在后台线程中调用）
+
+        直接读取git目录中的引用，按文件修改时间缓存，不启动git进程
+
+        Returns:
+            (远程仓库列表, 选中的远程仓库, 分支列表)
+        """
         if not project_path or not os.path.exists(project_path):
-            return ["develop"]  # 默认返回 develop
+            return ["origin"], "origin", ["develop"]  # 默认返回 origin/develop
         
-        original_cwd = os.getcwd()  # 在函数开始时获取
         try:
-            # 切换到项目目录
-            os.chdir(project_path)
-            
-            # 获取远程分支
-            result = subprocess.run(
-                ['git', 'branch', '-r'],
-                capture_output=True,
-                text=True,
-                timeout=10,
-                creationflags=get_subprocess_flags()
-            )
+            service = load_engine_module().get_query_service(project_path)
+            remotes = service.remotes() or ["origin"]
+            if remote not in remotes:
+                remote = remotes[0]
             
-            if result.returncode == 0:
-                branches = []
-                for line in result.stdout.strip().split('\n'):
-                    line = line.strip()
-                    if line and not line.startswith('origin/HEAD'):
-                        # 移除 origin/ 前缀
-                        if line.startswith('origin/'):
-                            branch_name = line[7:]  # 移除 'origin/' 前缀
-                            if branch_name:  # 确保不为空
-                                branches.append(branch_name)
-                
-                # 如果没有获取到分支，返回默认值
-                if not branches:
-                    branches = ["develop"]
-                
-                return sorted(set(branches))  # 去重并排序
-            else:
-                return ["develop"]
+            # 如果没有获取到分支，返回默认值
+            return remotes, remote, service.remote_branches(remote) or ["develop"]
                 
         except Exception as e:
             # 在打包环境中静默失败，开发环境中显示错误
             if not hasattr(sys, '_MEIPASS'):
                 print(f"获取远程分支失败: {e}")
-            return ["develop"]
-        finally:
-            try:
-                os.chdir(original_cwd)
-            except:
-                pass
+            return ["origin"], "origin", ["develop"]
     
-    def refresh_branches(self, project_path):
-        """刷新分支列表"""
-        branches = self.get_remote_branches(project_path)
+    def load_branch_choices(self, project_path, remote):
+        """后台读取分支列表，结果通过消息队列交给主线程"""
+        remotes, remote, branches = self.get_branch_choices(project_path, remote)
+        self.post_message({"type": "branches", "path": project_path, "remotes": remotes, "remote": remote, "branches": branches})
+    
+    def refresh_branches(self, message):
+        """刷新远程仓库和分支列表（路径已经变化时忽略过期的结果）"""
+        if message["path"] != self.path_entry.get().strip():
+            return
+        
+        self.remote_combobox['values'] = message["remotes"]
+        self.remote_combobox.set(message["remote"])
+        branches = message["branches"]
         self.branch_combobox['values'] = branches
         
         # 如果当前选中的分支不在列表中，设置为第一个分支
@@ -253,25 +482,145 @@ class GitMergeGUI:
             self.branch_combobox.set(branches[0] if branches else "develop")
     
     def on_path_change(self, event=None):
-        """路径变化时的事件处理"""
+        """路径或远程仓库变化时的事件处理"""
         project_path = self.path_entry.get().strip()
         if project_path:
-            # 在后台线程中刷新分支列表，避免阻塞 UI
-            threading.Thread(
-                target=lambda: self.master.after(0, lambda: self.refresh_branches(project_path)),
-                daemon=True
-            ).start()
+            # 在后台线程中读取分支列表，避免阻塞 UI
+            self.branch_executor.submit(self.load_branch_choices, project_path, self.remote_combobox.get())
         else:
             # 如果路径为空，重置分支列表为默认值
+            self.remote_combobox['values'] = ["origin"]
+            self.remote_combobox.set("origin")
             self.branch_combobox['values'] = ["develop"]
             self.branch_combobox.set("develop")
-
+    
     def select_project_path(self, path):
-        """选择项目路径并刷新分支列表"""
+        """选择项目路径，预选该仓库上次使用的远程仓库和目标分支，并刷新分支列表"""
         self.path_entry.delete(0, tk.END)
         self.path_entry.insert(0, path)
+        key = self.tag_key(path)
+        if key in self.tag_targets:
+            remote, target_branch = self.tag_targets[key]
+            self.remote_combobox.set(remote)
+            self.branch_combobox.set(target_branch)
         # 自动刷新分支列表
         self.on_path_change()
+        # 工作区文件的修改不会改变索引，点击标签时强制重新检查该仓库
+        self.submit_tag_status(path, force=True)
+    
+    def refresh_tag_statuses(self):
+        """定时为所有快捷标签提交后台状态检查"""
+        for path in self.tag_paths():
+            self.submit_tag_status(path)
+        self.master.after(STATUS_REFRESH_MS, self.refresh_tag_statuses)
+    
+    def submit_tag_status(self, path, force=False):
+        """提交一个仓库的状态检查，同一仓库上一次检查未完成时跳过"""
+        key = self.tag_key(path)
+        if key in self.status_pending:
+            return
+        self.status_pending.add(key)
+        remote, target_branch = self.tag_targets.get(key, ("origin", "develop"))
+        self.status_executor.submit(self.load_tag_status, path, remote, target_branch, force)
+    
+    def load_tag_status(self, path, remote, target_branch, force):
+        """在后台线程中计算仓库状态快照，结果通过消息队列交给主线程"""
+        status = None
+        try:
+            if os.path.exists(path):
+                status = load_engine_module().get_query_service(path).status_snapshot(target_branch, remote, force)
+        except Exception as e:
+            debug_print(f"获取仓库状态失败: {e}")
+        self.post_message({"type": "tag_status", "path": path, "status": status})
+    
+    def update_tag_status(self, message):
+        """状态有变化时更新对应的标签按钮"""
+        key = self.tag_key(message["path"])
+        self.status_pending.discard(key)
+        status = message["status"]
+        if key in self.tag_status and self.tag_status[key] is status:
+            return  # 快照未变化（缓存返回同一个对象）
+        self.tag_status[key] = status
+        button = self.tag_buttons.get(key)
+        if button is not None:
+            self.apply_tag_status(button, key)
+    
+    def apply_tag_status(self, button, key):
+        """把仓库状态和最近一次预取的时间显示在标签按钮上（key为规范化路径）"""
+        tag = self.tags.get(key)
+        if tag is None or (key not in self.tag_status and key not in self.tag_prefetch):
+            return
+        status = self.tag_status.get(key)
+        color = TAG_COLOR_NORMAL
+        if status and status["operation"]:
+            color = TAG_COLOR_OPERATION
+        elif status and status["dirty"]:
+            color = TAG_COLOR_DIRTY
+        
+        summary = format_tag_status(status) if key in self.tag_status else ""
+        prefetch = self.tag_prefetch.get(key)
+        if prefetch:
+            last_success = prefetch["last_success"]
+            prefetch_text = f"↻{time.strftime('%H:%M', time.localtime(last_success))}" if last_success else "↻"
+            if not prefetch["success"]:
+                prefetch_text += "失败" if prefetch_text == "↻" else " 失败"
+            summary = f"{summary} {prefetch_text}".strip()
+        button.config(text=f"{tag['name']}\n{summary}", fg=color)
+    
+    def get_prefetch_scheduler(self):
+        """按设置返回后台预取调度器，预取关闭时返回None"""
+        interval = self.settings.get("prefetch_interval", 0) * 60
+        if interval <= 0:
+            if self.prefetch_scheduler is not None:
+                self.prefetch_scheduler.close()
+                self.prefetch_scheduler = None
+            return None
+        if self.prefetch_scheduler is None:
+            self.prefetch_scheduler = load_engine_module().PrefetchScheduler(
+                interval,
+                max_workers=PREFETCH_WORKERS,
+                result_callback=lambda result: self.post_message(dict(result, type="prefetch"))
+            )
+        self.prefetch_scheduler.interval = interval
+        return self.prefetch_scheduler
+    
+    def prefetch_tick(self):
+        """没有工作流在运行时，提交到期的快捷标签仓库进行后台预取"""
+        self.master.after(PREFETCH_TICK_MS, self.prefetch_tick)
+        if self.is_running:
+            return
+        try:
+            scheduler = self.get_prefetch_scheduler()
+        except Exception as e:
+            debug_print(f"启动后台预取失败: {e}")
+            return
+        if scheduler is None:
+            return
+        
+        # 停在冲突上或有rebase/merge正在进行的仓库不预取（调度器按标签的路径记录仓库）
+        skip_paths = {
+            tag["path"] for key, tag in self.tags.items()
+            if self.tag_status.get(key) and self.tag_status[key]["operation"]
+        }
+        if self.conflict_state:
+            conflict_tag = self.find_tag(self.current_project_path)
+            skip_paths.add(conflict_tag["path"] if conflict_tag else self.current_project_path)
+        repos = [
+            (tag["path"], *self.tag_targets.get(key, ("origin", "develop")))
+            for key, tag in self.tags.items() if os.path.isdir(tag["path"])
+        ]
+        scheduler.tick(repos, skip_paths)
+    
+    def update_prefetch(self, result):
+        """记录预取结果并更新标签按钮"""
+        path = result["path"]
+        key = self.tag_key(path)
+        self.tag_prefetch[key] = result
+        if not result["success"] and result["error"] != "已取消":
+            debug_print(f"预取失败 {path}: {result['error']}（连续失败{result['failures']}次）")
+        button = self.tag_buttons.get(key)
+        if button is not None:
+            self.apply_tag_status(button, key)
 
     def get_icon_path(self):
         """获取图标文件路径"""
@@ -337,6 +686,15 @@ class GitMergeGUI:
             pass  # 图标文件不存在，跳过图标设置
 
 
+    def start_engine_worker(self):
+        """在后台预先启动引擎进程，启动失败时在第一次运行时重试"""
+        try:
+            with self.engine_worker.lock:
+                if self.engine_worker.process is None:
+                    self.engine_worker.start()
+        except OSError as e:
+            debug_print(f"启动引擎进程失败: {e}")
+    
     def on_window_close(self):
         """处理窗口关闭事件（点击系统关闭按钮）"""
         # 直接关闭程序
@@ -346,6 +704,10 @@ class GitMergeGUI:
     
     def close_window(self):
         """关闭窗口"""
+        self.engine_worker.close()
+        self.status_executor.shutdown(wait=False)
+        if self.prefetch_scheduler is not None:
+            self.prefetch_scheduler.close()
         try:
             # 关闭窗口
             self.master.quit()
@@ -363,17 +725,56 @@ class GitMergeGUI:
     
 
     
+    def post_message(self, message):
+        """放入消息队列（可从任意线程调用），队列由空变为非空时唤醒Tk主循环"""
+        self.message_queue.put(message)
+        if not self.wakeup_pending:
+            self.wakeup_pending = True
+            try:
+                self.master.event_generate("<<EngineMessage>>", when="tail")
+            except (tk.TclError, RuntimeError):
+                # 主循环尚未启动或窗口已关闭，唤醒失败；清除标记，之后的消息重新唤醒（或由兜底检查处理）
+                self.wakeup_pending = False
+    
+    def poll_queue(self):
+        """低频兜底检查消息队列，唤醒事件丢失时消息也不会一直滞留在队列中"""
+        self.master.after(QUEUE_POLL_MS, self.poll_queue)
+        if not self.message_queue.empty():
+            self.schedule_render()
+    
     def process_queue(self):
-        """处理消息队列"""
+        """处理消息队列中的全部消息"""
+        self.wakeup_pending = False
         try:
             while True:
                 message = self.message_queue.get_nowait()
                 message_type = message.get("type")
                 
-                if message_type == "output":
-                    self.process_output(message.get("text", ""))
-                elif message_type == "status":
-                    self.handle_status_update(message.get("data"))
+                # 忽略已取消（重置）的请求的后续消息
+                if "id" in message and message["id"] != self.current_request_id:
+                    continue
+                
+                if message_type == "output_chunk":
+                    style = message.get("style")
+                    self.append_output(message.get("text", ""), OUTPUT_STYLE_TAGS.get(style, style))
+                elif message_type == "step_started":
+                    self.handle_step_started(message)
+                elif message_type == "progress":
+                    self.handle_progress(message)
+                elif message_type == "conflict":
+                    self.handle_conflict(message)
+                elif message_type == "branches":
+                    self.refresh_branches(message)
+                elif message_type == "tag_status":
+                    self.update_tag_status(message)
+                elif message_type == "prefetch":
+                    self.update_prefetch(message)
+                elif message_type == "prediction":
+                    self.handle_prediction(message)
+                elif message_type == "prediction_done":
+                    self.handle_prediction_done(message)
+                elif message_type == "conflict_resolution":
+                    self.handle_conflict_resolution(message)
                 elif message_type == "finished":
                     self.handle_task_finished(message.get("success", False))
                 elif message_type == "error":
@@ -382,9 +783,6 @@ class GitMergeGUI:
                     
         except queue.Empty:
             pass
-        
-        # 定期检查队列
-        self.master.after(100, self.process_queue)
     
     def run_merge(self):
         """运行合并操作"""
@@ -393,6 +791,7 @@ class GitMergeGUI:
             
         project_path = self.path_entry.get()
         target_branch = self.branch_combobox.get().strip()
+        remote = self.remote_combobox.get().strip() or "origin"
         
         if not project_path:
             self.append_output("请先输入项目路径！\n", "error")
@@ -402,132 +801,196 @@ class GitMergeGUI:
             self.append_output("请选择目标分支！\n", "error")
             return
         
+        # 同一项目上次停在冲突上时，解决冲突后重新点击运行即从冲突的步骤继续
+        conflict_state = self.conflict_state if project_path == self.current_project_path else None
+        
+        # 在执行合并前检查并添加标签，并记录该仓库使用的远程仓库和目标分支
+        tag = self.find_tag(project_path)
+        if tag is None and project_path.strip():
+            self.add_quick_tag(os.path.basename(os.path.normpath(project_path.strip())), project_path)
+            tag = self.find_tag(project_path)
+        if tag is not None:
+            self.tag_targets[self.tag_key(tag["path"])] = (remote, target_branch)
+        self.call_store(self.store.set_repo_settings, project_path, remote=remote, target_branch=target_branch)
+        options = {"remote": remote}
+        repo_settings = self.call_store(self.store.get_repo_settings, project_path) or {}
+        if repo_settings.get("idle_timeout"):
+            options["idle_timeout"] = repo_settings["idle_timeout"]
+        if repo_settings.get("verify_command") is not None:
+            options["verify_command"] = repo_settings["verify_command"]
+        
+        # 上次运行中断（GUI被关闭或崩溃）时，询问是从工作流日志记录的步骤继续，还是丢弃日志重新开始；
+        # 引擎不会自行丢弃日志，没有选择丢弃时遇到日志会拒绝执行
+        resume_journal = False
+        discard_journal = False
+        if not conflict_state:
+            try:
+                journal = load_engine_module().load_journal(project_path)
+            except Exception as e:
+                debug_print(f"读取工作流日志失败: {e}")
+                journal = None
+            if journal is not None:
+                resume_journal = messagebox.askyesnocancel(
+                    "继续未完成的合并",
+                    f"检测到未完成的工作流:\n{load_engine_module().describe_journal(journal)}\n\n"
+                    "是否从该步骤继续？\n选择“否”将丢弃该记录并重新开始，选择“取消”不执行。"
+                )
+                if resume_journal is None:
+                    return
+                discard_journal = not resume_journal
+        
         self.reset_state()
         self.current_project_path = project_path
         self.set_running_state(True)
         
-        # 在执行合并前检查并添加标签
-        path = project_path.strip()
-        if path and path not in self.existing_paths:
-            # 标准化路径格式
-            path = path.replace('/', '\\').lower()
-            # 检查路径是否已存在（忽略大小写）
-            if not any(existing_path.lower() == path for existing_path in self.existing_paths):
-                name = os.path.basename(path)
-                self.add_quick_tag(name, project_path)  # 使用原始路径
-        
-        self.append_output(f"正在执行合并操作，项目路径: {project_path}\n")
-        self.append_output(f"目标分支: {target_branch}\n")
-        
-        # 在新线程中执行任务
-        self.worker_thread = threading.Thread(
-            target=self.execute_git_task,
-            args=(project_path, target_branch),
-            daemon=True
-        )
-        self.worker_thread.start()
-    
-
-    
-    def execute_git_task(self, project_path, target_branch="develop"):
-        """在后台线程中执行git任务"""
+        # 终止该仓库正在执行的后台预取，避免与工作流中的拉取争用引用锁
+        if self.prefetch_scheduler is not None:
+            self.prefetch_scheduler.cancel(tag["path"] if tag is not None else project_path)
         
-        def output_callback(text):
-            """实时输出回调函数"""
-            self.message_queue.put({"type": "output", "text": text})
         try:
-            # 在打包环境中直接导入并执行git_merge_auto模块，避免启动新进程
-            if hasattr(sys, '_MEIPASS'):
-                # PyInstaller打包后，直接导入模块
-                import importlib.util
-                script_path = os.path.join(getattr(sys, '_MEIPASS'), "git_merge_auto.py")
-                spec = importlib.util.spec_from_file_location("git_merge_auto", script_path)
-                if spec is None or spec.loader is None:
-                    raise ImportError(f"无法加载模块: {script_path}")
-                git_merge_auto = importlib.util.module_from_spec(spec)
-                spec.loader.exec_module(git_merge_auto)
-                
-                # 直接调用，不重定向输出，使用回调函数实时发送输出
-                try:
-                    result = git_merge_auto.execute_git_workflow(project_path, target_branch, output_callback)
-                    success = bool(result) and result is not False
-                except Exception as e:
-                    self.message_queue.put({"type": "error", "error": str(e)})
-                    return
-                
-                self.message_queue.put({"type": "finished", "success": success})
-                
-            else:
-                # 开发环境，使用子进程
-                cmd = [sys.executable, "git_merge_auto.py", project_path, "--target-branch", target_branch]
-                
-                # 启动进程
-                self.current_process = subprocess.Popen(
-                    cmd,
-                    stdout=subprocess.PIPE,
-                    stderr=subprocess.PIPE,
-                    universal_newlines=True,
-                    bufsize=1,  # 行缓冲
-                    creationflags=get_subprocess_flags()
+            if resume_journal:
+                self.append_output(f"从上次中断的步骤继续，项目路径: {project_path}\n")
+                self.current_request_id = self.engine_worker.resume(project_path)
+            elif conflict_state:
+                self.append_output(f"继续执行冲突后的操作，项目路径: {project_path}\n")
+                self.current_request_id = self.engine_worker.continue_run(
+                    project_path,
+                    conflict_state["step"],
+                    conflict_state["branch"],
+                    conflict_state.get("target_branch", target_branch),
+                    dict(options, remote=conflict_state.get("remote", remote))
                 )
-                
-                # 实时读取输出
-                while True:
-                    if self.current_process.poll() is not None:
-                        break
-                        
-                    if self.current_process.stdout is not None:
-                        output = self.current_process.stdout.readline()
-                        if output:
-                            # 检查是否是状态信息
-                            if output.startswith("STATUS_JSON:"):
-                                try:
-                                    status_json = output.replace("STATUS_JSON:", "").strip()
-                                    status_data = json.loads(status_json)
-                                    self.message_queue.put({"type": "status", "data": status_data})
-                                except Exception as e:
-                                    self.message_queue.put({"type": "output", "text": output})
-                            else:
-                                self.message_queue.put({"type": "output", "text": output})
-                
-                # 读取剩余输出
-                remaining_stdout, stderr = self.current_process.communicate()
-                if remaining_stdout:
-                    for line in remaining_stdout.splitlines():
-                        if line.startswith("STATUS_JSON:"):
-                            try:
-                                status_json = line.replace("STATUS_JSON:", "").strip()
-                                status_data = json.loads(status_json)
-                                self.message_queue.put({"type": "status", "data": status_data})
-                            except Exception as e:
-                                self.message_queue.put({"type": "output", "text": line + "\n"})
-                        else:
-                            self.message_queue.put({"type": "output", "text": line + "\n"})
-                
-                if stderr:
-                    self.message_queue.put({"type": "output", "text": stderr})
-                
-                # 检查退出码
-                return_code = self.current_process.returncode
-                success = return_code == 0
-                
-                self.message_queue.put({"type": "finished", "success": success})
-            
+            else:
+                self.append_output(f"正在执行合并操作，项目路径: {project_path}\n")
+                self.append_output(f"目标分支: {remote}/{target_branch}\n")
+                self.current_request_id = self.engine_worker.run(project_path, target_branch, options, discard_journal)
+        except OSError as e:
+            self.append_output(f"执行出错: 无法启动引擎进程: {e}\n", "error")
+            self.set_running_state(False)
+    
+    def predict_conflicts(self):
+        """对所有快捷标签的仓库并行预测合并冲突，结果逐个显示在终端中"""
+        if self.is_running:
+            self.append_output("正在执行合并操作，请在完成后再进行冲突预测\n", "warning")
+            return
+        repos = []
+        for tag in self.tags.values():
+            remote, target_branch = self.tag_targets.get(self.tag_key(tag["path"]), ("origin", "develop"))
+            repos.append({"name": tag["name"], "path": tag["path"], "target_branch": target_branch, "remote": remote})
+        if not repos:
+            self.append_output("没有快捷标签，请先添加项目\n", "warning")
+            return
+        
+        self.predict_button.config(state=tk.DISABLED, cursor="no", text="预测中...")
+        self.append_output(f"\n=== 冲突预测: {len(repos)} 个仓库（fetch目标分支后执行 git merge-tree，不修改工作区） ===\n", "step")
+        threading.Thread(target=self.load_predictions, args=(repos,), daemon=True).start()
+    
+    def load_predictions(self, repos):
+        """在后台线程中执行冲突预测，每个仓库完成时通过消息队列交给主线程"""
+        results = []
+        try:
+            engine = load_engine_module()
+            results = engine.predict_repos(
+                repos,
+                jobs=PREDICT_JOBS,
+                result_callback=lambda result: self.post_message({"type": "prediction", "result": result, "text": engine.format_prediction(result)})
+            )
         except Exception as e:
-            self.message_queue.put({"type": "error", "error": str(e)})
+            self.post_message({"type": "output_chunk", "text": f"冲突预测出错: {e}\n", "style": "error"})
+        self.post_message({"type": "prediction_done", "results": results})
+    
+    def handle_prediction(self, message):
+        """显示一个仓库的预测结果"""
+        statuses = {target["status"] for target in message["result"]["targets"]}
+        tag = "error" if "failed" in statuses else "warning" if "conflict" in statuses else "success"
+        self.append_output(message["text"] + "\n", tag)
     
-    def handle_status_update(self, status_data):
-        """处理状态更新"""
-        if status_data and status_data.get("status") == "conflict":
-            self.conflict_state = status_data
+    def handle_prediction_done(self, message):
+        """输出预测汇总并恢复按钮"""
+        results = message["results"]
+        conflicted = [
+            result["name"] for result in results
+            if any(target["status"] in ("conflict", "failed") for target in result["targets"])
+        ]
+        if results:
+            summary = f"共 {len(results)} 个仓库，{len(results) - len(conflicted)} 个可以直接合并"
+            if conflicted:
+                summary += f"，需要处理: {', '.join(conflicted)}"
+            self.append_output(summary + "\n", "warning" if conflicted else "success")
+        self.predict_button.config(state=tk.NORMAL, cursor="hand2", text="冲突预测")
+    
+    def handle_step_started(self, event):
+        """步骤开始时在运行按钮上显示当前步骤"""
+        self.current_step_text = f"步骤 {event['step'] + 1}/{event['total']}"
+        self.run_button.config(text=f"{self.current_step_text}...")
+    
+    def handle_progress(self, event):
+        """git输出进度时在运行按钮上显示百分比"""
+        self.run_button.config(text=f"{self.current_step_text} {event['percent']}%")
+    
+    def handle_conflict(self, event):
+        """处理冲突事件"""
+        self.conflict_state = event
+        self.set_running_state(False)
+        if self.settings.get("auto_continue", "confirm") == "off":
             self.append_output("检测到冲突，请手动解决冲突后重新运行...\n", "warning")
-            self.set_running_state(False)
+            return
+        self.append_output("检测到冲突，请手动解决冲突并用 git add 标记为已解决，之后将自动继续...\n", "warning")
+        self.master.after(CONFLICT_WATCH_MS, self.watch_conflict, event)
+    
+    def watch_conflict(self, conflict):
+        """冲突未被重置或继续时，在后台检查一次解决进度"""
+        if self.conflict_state is not conflict or self.is_running:
+            return
+        path = conflict.get("worktree") or self.current_project_path
+        self.status_executor.submit(self.load_conflict_resolution, conflict, path)
+    
+    def load_conflict_resolution(self, conflict, path):
+        """在后台线程中读取冲突解决进度，结果通过消息队列交给主线程"""
+        try:
+            state = load_engine_module().get_query_service(path).conflict_resolution()
+        except Exception as e:
+            debug_print(f"检查冲突状态失败: {e}")
+            state = "unresolved"
+        self.post_message({"type": "conflict_resolution", "conflict": conflict, "state": state})
+    
+    def handle_conflict_resolution(self, message):
+        """冲突解决后从冲突的步骤继续；仍未解决时稍后再检查"""
+        conflict = message["conflict"]
+        if self.conflict_state is not conflict or self.is_running:
+            return  # 已重置或已手动继续
+        
+        state = message["state"]
+        if state == "unresolved":
+            self.master.after(CONFLICT_WATCH_MS, self.watch_conflict, conflict)
+            return
+        
+        if state == "ended":
+            # rebase/merge已在外部继续或中止，重新运行完整流程即可
+            self.conflict_state = None
+            self.append_output("检测到冲突的操作已在外部结束，请重新运行\n", "warning")
+            return
+        
+        self.append_output("冲突已全部解决\n", "success")
+        if self.settings.get("auto_continue", "confirm") == "confirm":
+            if not messagebox.askyesno("冲突已解决", "所有冲突文件都已加入索引，是否继续执行？"):
+                self.append_output("已取消自动继续，可以点击运行按钮继续\n", "warning")
+                return
+            if self.conflict_state is not conflict or self.is_running:
+                return
+        
+        # 路径输入框已切换到其它项目时，先切换回冲突的项目
+        if self.path_entry.get() != self.current_project_path:
+            self.select_project_path(self.current_project_path)
+        self.run_merge()
     
     def handle_task_finished(self, success):
         """处理任务完成"""
+        self.current_request_id = None
         if success:
             self.append_output("操作完成！\n", "success")
             self.reset_state()
+        self.submit_tag_status(self.current_project_path, force=True)
         
         self.set_running_state(False)
     
@@ -537,6 +1000,7 @@ class GitMergeGUI:
         
         if running:
             # 禁用运行按钮
+            self.current_step_text = "运行中"
             self.run_button.config(state=tk.DISABLED, cursor="no", text="运行中...")
         else:
             # 启用运行按钮
@@ -548,91 +1012,121 @@ class GitMergeGUI:
     
     def reset_merge(self):
         """重置当前操作，清空终端，准备重新开始"""
-        # 如果正在运行，终止进程
-        if self.is_running and self.current_process and self.current_process.poll() is None:
-            try:
-                self.current_process.terminate()
-                try:
-                    self.current_process.wait(timeout=5)
-                except subprocess.TimeoutExpired:
-                    self.current_process.kill()
-                    self.current_process.wait()
-            except Exception as e:
-                self.append_output(f"终止进程时出错: {str(e)}\n", "error")
+        # 如果正在运行，通知引擎取消（引擎会终止正在执行的git进程树），之后的消息不再显示
+        if self.is_running and self.current_request_id is not None:
+            self.engine_worker.cancel(self.current_request_id)
+        self.current_request_id = None
         
         self.set_running_state(False)
         self.reset_state()
+        self.pending_segments = []
         self.terminal.config(state=tk.NORMAL)
         self.terminal.delete(1.0, tk.END)
         self.terminal.config(state=tk.DISABLED)
         self.append_output("程序已重置，可以开始新的操作。\n", "success")
     
     def append_output(self, text, tag=None):
-        """添加输出到终端"""
-        self.terminal.config(state=tk.NORMAL)
-        if tag:
-            self.terminal.insert(tk.END, text, tag)
+        """添加输出到终端（先缓存，在下一帧与其它输出合并插入）"""
+        if self.pending_segments and self.pending_segments[-1][1] == tag:
+            self.pending_segments[-1][0].append(text)
         else:
-            self.terminal.insert(tk.END, text)
+            self.pending_segments.append(([text], tag))
+        self.schedule_render()
+    
+    def schedule_render(self):
+        """安排一次终端刷新，一帧内多次调用只刷新一次"""
+        if not self.render_scheduled:
+            self.render_scheduled = True
+            self.master.after(RENDER_FRAME_MS, self.render_pending)
+    
+    def render_pending(self):
+        """处理消息队列，把缓存的全部输出一次性插入终端，并限制回滚行数"""
+        self.process_queue()
+        segments, self.pending_segments = self.pending_segments, []
+        self.render_scheduled = False
+        if not segments:
+            return
+        
+        # 一次insert调用插入多段带不同标签的文本: insert(index, 文本1, 标签1, 文本2, 标签2, ...)
+        args = []
+        for texts, tag in segments:
+            args.append("".join(texts))
+            args.append(tag or ())
+        
+        self.terminal.config(state=tk.NORMAL)
+        self.terminal.insert(tk.END, *args)
+        self.trim_scrollback()
         self.terminal.see(tk.END)
         self.terminal.config(state=tk.DISABLED)
     
-    def load_quick_tags(self):
-        """加载保存的快捷标签"""
+    def trim_scrollback(self):
+        """终端行数超过上限时删除最早的行"""
+        max_lines = self.settings.get("max_terminal_lines") or DEFAULT_MAX_TERMINAL_LINES
+        line_count = int(self.terminal.index("end-1c").split(".")[0])
+        if line_count > max_lines:
+            self.terminal.delete("1.0", f"{line_count - max_lines + 1}.0")
+    
+    def open_config_store(self):
+        """打开配置库，并导入当前目录中旧版本的 quick_tags_config.json（同一文件只导入一次）"""
+        engine = load_engine_module()
         try:
-            if os.path.exists(self.config_file):
-                with open(self.config_file, 'r', encoding='utf-8') as f:
-                    config = json.load(f)
-                    tags = config.get('quick_tags', [])
-                    for tag in tags:
-                        if 'name' in tag and 'path' in tag:
-                            self.add_quick_tag(tag['name'], tag['path'], save_config=False)
+            store = engine.get_config_store()
         except Exception as e:
-            # 在打包环境中静默失败，开发环境中显示错误
+            # 配置库无法打开时使用内存中的配置库，本次运行的修改不会保存
             if not hasattr(sys, '_MEIPASS'):
-                print(f"加载配置文件失败: {e}")
-            # 如果加载失败，添加一个默认标签
-            self.add_quick_tag("urban-lifeline-web", "C:\\Users\\Mrliu\\Desktop\\project\\Urban-lifeline")
+                print(f"打开配置库失败: {e}")
+            store = engine.ConfigStore(":memory:")
+        self.call_store(store.import_legacy_config, os.path.abspath(engine.LEGACY_CONFIG_FILE_NAME))
+        return store
     
-    def save_quick_tags(self):
-        """保存快捷标签到配置文件"""
+    def call_store(self, action, *args, **kwargs):
+        """调用配置库，失败时返回None（界面中的修改仍然生效，只是不会保存）"""
         try:
-            tags = []
-            for path in self.existing_paths:
-                name = os.path.basename(path)
-                tags.append({'name': name, 'path': path})
-            
-            config = {'quick_tags': tags}
-            with open(self.config_file, 'w', encoding='utf-8') as f:
-                json.dump(config, f, ensure_ascii=False, indent=2)
+            return action(*args, **kwargs)
         except Exception as e:
             # 在打包环境中静默失败，开发环境中显示错误
             if not hasattr(sys, '_MEIPASS'):
-                print(f"保存配置文件失败: {e}")
+                print(f"读写配置库失败: {e}")
+            return None
+    
+    def load_quick_tags(self):
+        """从配置库加载界面设置、快捷标签和各仓库上次使用的目标分支"""
+        self.settings.update(self.call_store(self.store.get_settings) or {})
+        for repo in self.call_store(self.store.list_repos) or []:
+            self.tag_targets[self.tag_key(repo["path"])] = (repo["remote"] or "origin", repo["target_branch"])
+            self.add_quick_tag(repo["name"], repo["path"], save_config=False)
+    
+    def tag_paths(self):
+        """所有快捷标签的路径（按添加顺序）"""
+        return [tag["path"] for tag in self.tags.values()]
+    
+    def tag_key(self, path):
+        """快捷标签及其状态、按钮和目标分支使用的键: 规范化的绝对路径（Windows上不区分大小写）"""
+        return load_engine_module().normalize_repo_path(path.strip())
+    
+    def find_tag(self, path):
+        """按规范化的路径查找快捷标签，不存在时返回None"""
+        if not path.strip():
+            return None
+        return self.tags.get(self.tag_key(path))
     
     def add_quick_tag(self, name, path, save_config=True):
-        """添加快捷标签"""
-        # 检查是否已经存在
-        if path in self.existing_paths:
-            return
-        
+        """添加快捷标签，同一路径的标签已存在时返回False"""
         # 标准化路径格式
-        path = path.replace('/', '\\').strip()
+        path = os.path.abspath(path.strip())
+        key = self.tag_key(path)
+        if key in self.tags:
+            return False
         
-        # 限制最多10个标签
-        if len(self.existing_paths) >= 10:
-            return
-        
-        # 记录路径
-        if path not in self.existing_paths:
-            self.existing_paths.append(path)
+        self.tags[key] = {"name": name, "path": path}
         
         # 创建标签组件
         self.create_tag_widget(name, path)
         
-        # 保存配置
+        # 保存到配置库（只插入这一行）
         if save_config:
-            self.save_quick_tags()
+            self.call_store(self.store.add_tag, name, path)
+        return True
     
     def create_tag_widget(self, name, path):
         """创建标签组件"""
@@ -662,22 +1156,9 @@ class GitMergeGUI:
             cursor="hand2"
         )
         tag_button.pack()
-    
-    def process_output(self, text):
-        """处理输出文本"""
-        # 处理带颜色的输出
-        if "[ERROR]" in text:
-            self.append_output(text, "error")
-        elif "[SUCCESS]" in text:
-            self.append_output(text, "success")
-        elif "[WARNING]" in text:
-            self.append_output(text, "warning")
-        elif ">>> 正在执行:" in text:
-            self.append_output(text, "info")
-        elif "=== 步骤" in text and "===" in text:
-            self.append_output(text, "step")
-        else:
-            self.append_output(text)
+        key = self.tag_key(path)
+        self.tag_buttons[key] = tag_button
+        self.apply_tag_status(tag_button, key)
     
     def open_settings(self):
         """打开设置对话框"""
@@ -707,6 +1188,168 @@ class GitMergeGUI:
         notebook.add(tag_frame, text="快捷标签设置")
         
         self.create_tag_settings_tab(tag_frame)
+        
+        # 终端设置选项卡
+        terminal_frame = ttk.Frame(notebook)
+        notebook.add(terminal_frame, text="终端设置")
+        
+        self.create_terminal_settings_tab(terminal_frame)
+        
+        # 运行历史选项卡
+        history_frame = ttk.Frame(notebook)
+        notebook.add(history_frame, text="运行历史")
+        
+        self.create_history_tab(history_frame)
+    
+    def create_history_tab(self, parent):
+        """创建运行历史选项卡: 按仓库和步骤显示耗时的p50/p95/最大值"""
+        main_frame = tk.Frame(parent, bg="#ffffff")
+        main_frame.pack(fill=tk.BOTH, expand=True, padx=10, pady=10)
+        
+        # 筛选条件
+        filter_frame = tk.Frame(main_frame, bg="#ffffff")
+        filter_frame.pack(fill=tk.X, pady=(0, 10))
+        
+        tk.Label(filter_frame, text="时间范围:", bg="#ffffff", fg="#606266", font=("Helvetica", 10)).pack(side=tk.LEFT)
+        range_combobox = ttk.Combobox(filter_frame, values=list(HISTORY_RANGES), state="readonly", width=10)
+        range_combobox.set("最近30天")
+        range_combobox.pack(side=tk.LEFT, padx=(5, 15))
+        
+        tk.Label(filter_frame, text="分组:", bg="#ffffff", fg="#606266", font=("Helvetica", 10)).pack(side=tk.LEFT)
+        period_combobox = ttk.Combobox(filter_frame, values=list(HISTORY_PERIODS), state="readonly", width=8)
+        period_combobox.set("不分组")
+        period_combobox.pack(side=tk.LEFT, padx=(5, 15))
+        
+        summary_label = tk.Label(filter_frame, text="", bg="#ffffff", fg="#909399", font=("Helvetica", 10))
+        summary_label.pack(side=tk.RIGHT)
+        
+        # 结果表格
+        columns = ("repo", "period", "step", "count", "p50", "p95", "max")
+        headings = ("仓库", "时间", "步骤", "次数", "p50(秒)", "p95(秒)", "最大(秒)")
+        widths = (150, 90, 80, 50, 70, 70, 70)
+        table_frame = tk.Frame(main_frame, bg="#ffffff")
+        table_frame.pack(fill=tk.BOTH, expand=True)
+        tree = ttk.Treeview(table_frame, columns=columns, show="headings")
+        for column, heading, width in zip(columns, headings, widths):
+            tree.heading(column, text=heading)
+            tree.column(column, width=width, anchor=tk.W if column in ("repo", "period", "step") else tk.E)
+        scrollbar = ttk.Scrollbar(table_frame, orient="vertical", command=tree.yview)
+        tree.configure(yscrollcommand=scrollbar.set)
+        tree.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
+        scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
+        
+        def refresh_history(event=None):
+            engine = load_engine_module()
+            days = HISTORY_RANGES[range_combobox.get()]
+            since = time.time() - days * 86400 if days else None
+            try:
+                records = engine.load_history(since=since)
+            except OSError as e:
+                summary_label.config(text=f"读取运行历史失败: {e}")
+                return
+            rows = engine.summarize_history(records, HISTORY_PERIODS[period_combobox.get()])
+            
+            tree.delete(*tree.get_children())
+            for row in rows:
+                tree.insert("", tk.END, values=(
+                    os.path.basename(row["repo"]) or row["repo"],
+                    row["period"] or "全部",
+                    engine.format_step_label(row["step"]),
+                    row["count"],
+                    f"{row['p50']:.2f}",
+                    f"{row['p95']:.2f}",
+                    f"{row['max']:.2f}"
+                ))
+            summary_label.config(text=f"共 {len(records)} 次运行")
+        
+        range_combobox.bind("<<ComboboxSelected>>", refresh_history)
+        period_combobox.bind("<<ComboboxSelected>>", refresh_history)
+        refresh_history()
+    
+    def create_terminal_settings_tab(self, parent):
+        """创建终端设置选项卡内容"""
+        main_frame = tk.Frame(parent, bg="#ffffff")
+        main_frame.pack(fill=tk.BOTH, expand=True, padx=10, pady=10)
+        
+        form_frame = tk.LabelFrame(main_frame, text="终端输出", bg="#ffffff", fg="#303133", font=("Helvetica", 12, "bold"))
+        form_frame.pack(fill=tk.X, pady=(0, 10))
+        
+        row = tk.Frame(form_frame, bg="#ffffff")
+        row.pack(fill=tk.X, padx=15, pady=15)
+        tk.Label(row, text="最多保留行数:", bg="#ffffff", fg="#606266", anchor="w", font=("Helvetica", 10)).pack(side=tk.LEFT)
+        lines_spinbox = tk.Spinbox(row, from_=100, to=1000000, increment=1000, width=10, font=("Helvetica", 11))
+        lines_spinbox.delete(0, tk.END)
+        lines_spinbox.insert(0, str(self.settings.get("max_terminal_lines", DEFAULT_MAX_TERMINAL_LINES)))
+        lines_spinbox.pack(side=tk.LEFT, padx=(10, 0))
+        
+        conflict_frame = tk.LabelFrame(main_frame, text="冲突处理", bg="#ffffff", fg="#303133", font=("Helvetica", 12, "bold"))
+        conflict_frame.pack(fill=tk.X, pady=(0, 10))
+        
+        conflict_row = tk.Frame(conflict_frame, bg="#ffffff")
+        conflict_row.pack(fill=tk.X, padx=15, pady=15)
+        tk.Label(conflict_row, text="冲突解决后:", bg="#ffffff", fg="#606266", anchor="w", font=("Helvetica", 10)).pack(side=tk.LEFT)
+        auto_continue_combobox = ttk.Combobox(conflict_row, values=list(AUTO_CONTINUE_MODES), state="readonly", width=18)
+        current_mode = self.settings.get("auto_continue", "confirm")
+        auto_continue_combobox.set(next((name for name, mode in AUTO_CONTINUE_MODES.items() if mode == current_mode), "解决后询问是否继续"))
+        auto_continue_combobox.pack(side=tk.LEFT, padx=(10, 0))
+        
+        prefetch_frame = tk.LabelFrame(main_frame, text="后台预取", bg="#ffffff", fg="#303133", font=("Helvetica", 12, "bold"))
+        prefetch_frame.pack(fill=tk.X, pady=(0, 10))
+        
+        prefetch_row = tk.Frame(prefetch_frame, bg="#ffffff")
+        prefetch_row.pack(fill=tk.X, padx=15, pady=15)
+        tk.Label(prefetch_row, text="预取间隔（分钟，0为关闭）:", bg="#ffffff", fg="#606266", anchor="w", font=("Helvetica", 10)).pack(side=tk.LEFT)
+        prefetch_spinbox = tk.Spinbox(prefetch_row, from_=0, to=1440, increment=5, width=6, font=("Helvetica", 11))
+        prefetch_spinbox.delete(0, tk.END)
+        prefetch_spinbox.insert(0, str(self.settings.get("prefetch_interval", 0)))
+        prefetch_spinbox.pack(side=tk.LEFT, padx=(10, 0))
+        
+        def save_terminal_settings():
+            try:
+                max_lines = int(lines_spinbox.get())
+            except ValueError:
+                messagebox.showerror("错误", "请输入有效的行数！")
+                return
+            if max_lines < 100:
+                messagebox.showerror("错误", "行数不能少于100！")
+                return
+            try:
+                prefetch_interval = int(prefetch_spinbox.get())
+            except ValueError:
+                messagebox.showerror("错误", "请输入有效的预取间隔！")
+                return
+            if prefetch_interval < 0:
+                messagebox.showerror("错误", "预取间隔不能小于0！")
+                return
+            self.settings["max_terminal_lines"] = max_lines
+            self.settings["auto_continue"] = AUTO_CONTINUE_MODES[auto_continue_combobox.get()]
+            self.settings["prefetch_interval"] = prefetch_interval
+            self.call_store(self.store.set_settings, self.settings)
+            self.trim_terminal_now()
+            messagebox.showinfo("成功", "终端设置已保存！")
+        
+        # 保存按钮
+        save_button = tk.Button(
+            main_frame,
+            text="保存",
+            command=save_terminal_settings,
+            bg="#409eff",
+            fg="white",
+            activebackground="#66b1ff",
+            relief=tk.FLAT,
+            bd=0,
+            padx=25,
+            pady=10,
+            font=("Helvetica", 11),
+            cursor="hand2"
+        )
+        save_button.pack(anchor=tk.W, pady=(0, 15))
+    
+    def trim_terminal_now(self):
+        """按新的行数上限立即裁剪终端"""
+        self.terminal.config(state=tk.NORMAL)
+        self.trim_scrollback()
+        self.terminal.config(state=tk.DISABLED)
     
     def create_tag_settings_tab(self, parent):
         """创建快捷标签设置选项卡内容"""
@@ -746,8 +1389,8 @@ class GitMergeGUI:
         canvas.pack(side="left", fill="both", expand=True)
         scrollbar.pack(side="right", fill="y")
         
-        # 用于存储当前编辑的标签索引
-        self.editing_tag_index = None
+        # 用于存储当前编辑的标签路径
+        self.editing_tag_path = None
         
         # 显示已有标签
         self.refresh_tag_list(scrollable_frame)
@@ -769,11 +1412,19 @@ class GitMergeGUI:
         
         # 路径输入
         path_frame = tk.Frame(form_content, bg="#ffffff")
-        path_frame.pack(fill=tk.X, pady=(0, 20))
+        path_frame.pack(fill=tk.X, pady=(0, 15))
         tk.Label(path_frame, text="路径:", bg="#ffffff", fg="#606266", width=8, anchor="w", font=("Helvetica", 10)).pack(side=tk.LEFT)
         self.tag_path_entry = tk.Entry(path_frame, font=("Helvetica", 11), bd=1, relief=tk.SOLID)
         self.tag_path_entry.pack(fill=tk.X, expand=True, padx=(10, 0))
         
+        # 无输出超时输入（留空使用默认值）
+        timeout_frame = tk.Frame(form_content, bg="#ffffff")
+        timeout_frame.pack(fill=tk.X, pady=(0, 20))
+        tk.Label(timeout_frame, text="无输出超时（秒）:", bg="#ffffff", fg="#606266", anchor="w", font=("Helvetica", 10)).pack(side=tk.LEFT)
+        self.tag_timeout_entry = tk.Entry(timeout_frame, font=("Helvetica", 11), bd=1, relief=tk.SOLID, width=10)
+        self.tag_timeout_entry.pack(side=tk.LEFT, padx=(10, 0))
+        tk.Label(timeout_frame, text="留空使用默认值", bg="#ffffff", fg="#909399", font=("Helvetica", 9)).pack(side=tk.LEFT, padx=(10, 0))
+        
         # 按钮组
         button_frame = tk.Frame(form_content, bg="#ffffff")
         button_frame.pack(fill=tk.X)
@@ -822,8 +1473,8 @@ class GitMergeGUI:
             widget.destroy()
         
         # 显示每个标签
-        for i, path in enumerate(self.existing_paths):
-            name = os.path.basename(path)
+        for i, tag in enumerate(self.tags.values()):
+            name, path = tag["name"], tag["path"]
             
             # 创建行容器
             row_frame = tk.Frame(list_frame, bg="#ffffff" if i % 2 == 0 else "#fafafa")
@@ -846,7 +1497,7 @@ class GitMergeGUI:
             edit_button = tk.Button(
                 action_frame,
                 text="编辑",
-                command=lambda idx=i: self.edit_tag(idx),
+                command=lambda p=path: self.edit_tag(p),
                 bg="#67c23a",
                 fg="white",
                 activebackground="#85ce61",
@@ -863,7 +1514,7 @@ class GitMergeGUI:
             delete_button = tk.Button(
                 action_frame,
                 text="删除",
-                command=lambda idx=i: self.delete_tag_from_settings(idx),
+                command=lambda p=path: self.delete_tag_from_settings(p),
                 bg="#f56c6c",
                 fg="white",
                 activebackground="#f78989",
@@ -876,35 +1527,35 @@ class GitMergeGUI:
             )
             delete_button.pack(side=tk.LEFT)
     
-    def edit_tag(self, index):
-        """编辑指定索引的标签"""
-        if 0 <= index < len(self.existing_paths):
-            path = self.existing_paths[index]
-            name = os.path.basename(path)
+    def edit_tag(self, path):
+        """编辑指定路径的标签"""
+        tag = self.find_tag(path)
+        if tag is not None:
+            repo_settings = self.call_store(self.store.get_repo_settings, path) or {}
             
             # 填充表单
             self.tag_name_entry.delete(0, tk.END)
-            self.tag_name_entry.insert(0, name)
+            self.tag_name_entry.insert(0, tag["name"])
             self.tag_path_entry.delete(0, tk.END)
-            self.tag_path_entry.insert(0, path)
+            self.tag_path_entry.insert(0, tag["path"])
+            self.tag_timeout_entry.delete(0, tk.END)
+            self.tag_timeout_entry.insert(0, str(repo_settings.get("idle_timeout") or ""))
             
-            # 记录编辑的标签索引
-            self.editing_tag_index = index
+            # 记录编辑的标签路径
+            self.editing_tag_path = tag["path"]
             
             # 更改按钮文本
             self.submit_button.config(text="更新")
     
-    def delete_tag_from_settings(self, index):
-        """从设置中删除指定索引的标签"""
-        if 0 <= index < len(self.existing_paths):
-            path = self.existing_paths[index]
-            result = messagebox.askyesno("确认", f"确定要删除标签 '{os.path.basename(path)}' 吗？")
+    def delete_tag_from_settings(self, path):
+        """从设置中删除指定路径的标签"""
+        tag = self.find_tag(path)
+        if tag is not None:
+            result = messagebox.askyesno("确认", f"确定要删除标签 '{tag['name']}' 吗？")
             if result:
-                # 从列表中删除
-                self.existing_paths.pop(index)
-                
-                # 保存配置
-                self.save_quick_tags()
+                # 从列表和配置库中删除（仓库设置保留，重新添加标签后继续使用）
+                del self.tags[self.tag_key(path)]
+                self.call_store(self.store.delete_tag, path)
                 
                 # 刷新界面显示
                 self.refresh_tags_display()
@@ -921,6 +1572,7 @@ class GitMergeGUI:
         """提交标签表单"""
         name = self.tag_name_entry.get().strip()
         path = self.tag_path_entry.get().strip()
+        timeout_text = self.tag_timeout_entry.get().strip()
         
         if not name:
             messagebox.showerror("错误", "请输入标签名称！")
@@ -935,24 +1587,47 @@ class GitMergeGUI:
             messagebox.showerror("错误", "路径不存在，请检查后重试！")
             return
         
+        idle_timeout = None
+        if timeout_text:
+            try:
+                idle_timeout = int(timeout_text)
+            except ValueError:
+                messagebox.showerror("错误", "请输入有效的超时秒数！")
+                return
+            if idle_timeout <= 0:
+                messagebox.showerror("错误", "超时秒数必须大于0！")
+                return
+        
         # 标准化路径
-        path = path.replace('/', '\\').strip()
+        path = os.path.abspath(path)
+        key = self.tag_key(path)
         
-        if self.editing_tag_index is not None:
+        if self.editing_tag_path is not None:
             # 编辑模式
-            old_path = self.existing_paths[self.editing_tag_index]
+            old_path = self.editing_tag_path
+            old_key = self.tag_key(old_path)
             
             # 检查是否与其他标签重复
-            for i, existing_path in enumerate(self.existing_paths):
-                if i != self.editing_tag_index and existing_path.lower() == path.lower():
-                    messagebox.showerror("错误", "该路径的标签已存在！")
-                    return
-            
-            # 更新标签
-            self.existing_paths[self.editing_tag_index] = path
+            if key != old_key and key in self.tags:
+                messagebox.showerror("错误", "该路径的标签已存在！")
+                return
+            try:
+                self.store.update_tag(old_path, name, path)
+            except ValueError as e:
+                messagebox.showerror("错误", f"{e}！")
+                return
+            except Exception as e:
+                messagebox.showerror("错误", f"保存标签失败: {e}")
+                return
             
-            # 保存配置
-            self.save_quick_tags()
+            # 更新标签（位置不变），目标分支随路径迁移
+            self.tags = {
+                (key if tag_key == old_key else tag_key): ({"name": name, "path": path} if tag_key == old_key else tag)
+                for tag_key, tag in self.tags.items()
+            }
+            if old_key in self.tag_targets:
+                self.tag_targets[key] = self.tag_targets.pop(old_key)
+            self.call_store(self.store.set_repo_settings, path, idle_timeout=idle_timeout)
             
             # 刷新界面显示
             self.refresh_tags_display()
@@ -961,17 +1636,13 @@ class GitMergeGUI:
         else:
             # 新增模式
             # 检查是否已存在
-            if any(existing_path.lower() == path.lower() for existing_path in self.existing_paths):
+            if key in self.tags:
                 messagebox.showerror("错误", "该路径的标签已存在！")
                 return
             
-            # 限制数量
-            if len(self.existing_paths) >= 10:
-                messagebox.showwarning("警告", "最多只能添加10个快捷标签，请先删除一些后再添加！")
-                return
-            
             # 添加新标签
             self.add_quick_tag(name, path)
+            self.call_store(self.store.set_repo_settings, path, idle_timeout=idle_timeout)
             
             messagebox.showinfo("成功", f"快捷标签 '{name}' 添加成功！")
         
@@ -985,21 +1656,29 @@ class GitMergeGUI:
         """清空标签表单"""
         self.tag_name_entry.delete(0, tk.END)
         self.tag_path_entry.delete(0, tk.END)
-        self.editing_tag_index = None
+        self.tag_timeout_entry.delete(0, tk.END)
+        self.editing_tag_path = None
         self.submit_button.config(text="提交")
     
     def refresh_tags_display(self):
         """刷新主界面中的标签显示"""
-        # 清空现有标签
-        for widget in self.tag_container.winfo_children():
+        # 清空现有标签（每行一个容器，全部删除后重新创建第一行）
+        for widget in self.tag_frame.winfo_children():
             widget.destroy()
+        self.tag_buttons.clear()
+        self.tag_container = tk.Frame(self.tag_frame, bg="#ffffff")
+        self.tag_container.pack(fill=tk.X, expand=True)
         
         # 重新添加所有标签
-        for path in self.existing_paths:
-            name = os.path.basename(path)
-            self.create_tag_widget(name, path)
+        for tag in self.tags.values():
+            self.create_tag_widget(tag["name"], tag["path"])
 
 if __name__ == "__main__":
+    # 打包环境中，GUI以 --engine-worker 参数重新启动exe自身作为常驻引擎进程
+    if "--engine-worker" in sys.argv:
+        load_engine_module().worker_main()
+        sys.exit(0)
+    
     # 在 Windows 上隐藏控制台窗口（仅在打包环境中）
     if hasattr(sys, '_MEIPASS') and os.name == 'nt':
         try:
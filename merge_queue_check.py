@@ -0,0 +1,180 @@
+"""
+合并队列（MergeQueue）的离线检查: 在临时目录中创建本地裸仓库 "origin" 和开发仓库，
+不经过HTTP接口直接驱动队列，检查批量合并、冲突分支隔离、推送非快进后重试和服务器钩子拒绝时的拆分
+
+用法:
+    python merge_queue_check.py [--workdir 目录] [--keep]
+
+每项检查的结果输出到stderr，全部通过时退出码为 0，否则为 1
+"""
+import os
+import sys
+import shutil
+import subprocess
+import tempfile
+from collections import deque
+
+import git_merge_auto
+from git_merge_auto import get_cli_option, MergeQueue
+
+# 拒绝包含该文件的推送的服务器钩子
+PRE_RECEIVE_HOOK = """#!/bin/sh
+while read old new ref; do
+    if git rev-list "$new" --not --all | xargs -r -n1 git ls-tree -r --name-only | grep -qx forbidden.txt; then
+        echo "forbidden.txt is not allowed" >&2
+        exit 1
+    fi
+done
+exit 0
+"""
+
+def log(message):
+    print(message, file=sys.stderr, flush=True)
+
+def git(args, cwd):
+    """执行git命令，失败时抛出CalledProcessError，返回去掉首尾空白的stdout"""
+    result = subprocess.run(['git'] + args, cwd=cwd, capture_output=True, text=True, check=True)
+    return result.stdout.strip()
+
+def commit_file(repo, path, content, message):
+    with open(os.path.join(repo, path), 'w', encoding='utf-8') as f:
+        f.write(content)
+    git(['add', path], repo)
+    git(['commit', '-q', '-m', message], repo)
+
+def create_branch(repo, branch, path, content):
+    """从 origin/develop 创建开发分支并提交一个文件"""
+    git(['checkout', '-q', '-B', branch, 'origin/develop'], repo)
+    commit_file(repo, path, content, f"{branch}: {path}")
+    git(['checkout', '-q', '--detach'], repo)
+
+def advance_origin(seed, path, content):
+    """模拟其他人向 origin/develop 推送"""
+    git(['pull', '-q', '--no-rebase', 'origin', 'develop'], seed)
+    commit_file(seed, path, content, f"upstream: {path}")
+    git(['push', '-q', 'origin', 'develop'], seed)
+
+def setup(root):
+    """创建 origin.git、用于模拟其他人推送的 seed 和提交合并请求的 repo"""
+    origin = os.path.join(root, "origin.git")
+    seed = os.path.join(root, "seed")
+    repo = os.path.join(root, "repo")
+    os.makedirs(root)
+    git(['init', '-q', '--bare', origin], root)
+    git(['init', '-q', '-b', 'develop', seed], root)
+    git(['config', 'user.name', 'Check'], seed)
+    git(['config', 'user.email', 'check@example.com'], seed)
+    commit_file(seed, "shared.txt", "line 1\nline 2\n", "initial")
+    git(['remote', 'add', 'origin', origin], seed)
+    git(['push', '-q', 'origin', 'develop'], seed)
+    git(['clone', '-q', origin, repo], root)
+    git(['config', 'user.name', 'Check'], repo)
+    git(['config', 'user.email', 'check@example.com'], repo)
+    return origin, seed, repo
+
+def run_queue(queue, repo, branches):
+    """
+    把全部分支作为同一批排队，在当前线程中处理完毕，返回 {分支: 请求}
+
+    预先登记占位的工作线程，submit 不会启动新线程，批次大小因此是确定的
+    """
+    key = (os.path.normcase(os.path.abspath(repo)), git_merge_auto.DEFAULT_REMOTE, "develop")
+    queue.workers[key] = None
+    request_ids = [queue.submit(repo, branch)["id"] for branch in branches]
+    queue.process_queue(key)
+    return {queue.get(request_id)["branch"]: queue.get(request_id) for request_id in request_ids}
+
+def check(results, name, condition, detail=""):
+    results.append(bool(condition))
+    log(f"[{'PASS' if condition else 'FAIL'}] {name}" + (f": {detail}" if detail and not condition else ""))
+
+def check_batch(root, results):
+    """一批中一个分支与先合并的分支冲突、一个分支不存在时，只标记这两个分支，其余分支一次推送"""
+    origin, seed, repo = setup(os.path.join(root, "batch"))
+    create_branch(repo, "feat-a", "a.txt", "a\n")
+    create_branch(repo, "feat-x", "shared.txt", "line x\nline 2\n")
+    create_branch(repo, "feat-y", "shared.txt", "line y\nline 2\n")
+    create_branch(repo, "feat-b", "b.txt", "b\n")
+    queue = MergeQueue(max_batch=8)
+    requests = run_queue(queue, repo, ["feat-a", "feat-x", "feat-y", "feat-b", "feat-missing"])
+    statuses = {branch: request["status"] for branch, request in requests.items()}
+
+    check(results, "批量合并: 无冲突的分支全部合并",
+          all(statuses[branch] == "merged" for branch in ("feat-a", "feat-x", "feat-b")), statuses)
+    check(results, "批量合并: 只有冲突的分支标记为冲突",
+          statuses["feat-y"] == "conflict" and requests["feat-y"]["conflicted_files"] == ["shared.txt"], statuses)
+    check(results, "批量合并: 冲突信息指出先合并的分支", "feat-x" in (requests["feat-y"]["error"] or ""),
+          requests["feat-y"]["error"])
+    check(results, "批量合并: 不存在的分支标记为失败", statuses["feat-missing"] == "failed", statuses)
+    check(results, "批量合并: batch_size 为取出时的批次大小",
+          all(request["batch_size"] == 5 for request in requests.values()),
+          {branch: request["batch_size"] for branch, request in requests.items()})
+    check(results, "批量合并: 不拆分批次、只推送一次",
+          queue.stats["splits"] == 0 and queue.stats["pushes"] == 1, queue.stats)
+    remote_files = git(['ls-tree', '-r', '--name-only', 'develop'], origin).splitlines()
+    check(results, "批量合并: 远程包含合并的分支", {"a.txt", "b.txt"} <= set(remote_files), remote_files)
+
+def check_push_retry(root, results):
+    """第一次推送前其他人先推送了目标分支，推送因非快进被拒绝后重新fetch并重试"""
+    origin, seed, repo = setup(os.path.join(root, "retry"))
+    create_branch(repo, "feat-a", "a.txt", "a\n")
+    create_branch(repo, "feat-b", "b.txt", "b\n")
+
+    original = git_merge_auto.run_quiet_git
+    pending = deque([True])
+
+    def run_quiet_git(args, cwd, timeout=120):
+        if args[0] == 'push' and pending:
+            pending.popleft()
+            advance_origin(seed, "upstream.txt", "upstream\n")
+        return original(args, cwd, timeout)
+
+    git_merge_auto.run_quiet_git = run_quiet_git
+    try:
+        queue = MergeQueue(max_batch=8)
+        requests = run_queue(queue, repo, ["feat-a", "feat-b"])
+    finally:
+        git_merge_auto.run_quiet_git = original
+
+    statuses = {branch: request["status"] for branch, request in requests.items()}
+    check(results, "推送重试: 非快进被拒绝后合并成功", all(status == "merged" for status in statuses.values()), statuses)
+    check(results, "推送重试: 重试一次、推送两次",
+          queue.stats["push_retries"] == 1 and queue.stats["pushes"] == 2, queue.stats)
+    remote_files = git(['ls-tree', '-r', '--name-only', 'develop'], origin).splitlines()
+    check(results, "推送重试: 保留其他人的提交", {"upstream.txt", "a.txt", "b.txt"} <= set(remote_files), remote_files)
+
+def check_hook_rejection(root, results):
+    """推送被服务器钩子拒绝时拆分批次，找出被拒绝的分支，其余分支照常合并"""
+    origin, seed, repo = setup(os.path.join(root, "hook"))
+    hook = os.path.join(origin, "hooks", "pre-receive")
+    with open(hook, 'w', encoding='utf-8', newline='\n') as f:
+        f.write(PRE_RECEIVE_HOOK)
+    os.chmod(hook, 0o755)
+    create_branch(repo, "feat-a", "a.txt", "a\n")
+    create_branch(repo, "feat-bad", "forbidden.txt", "bad\n")
+    create_branch(repo, "feat-b", "b.txt", "b\n")
+    queue = MergeQueue(max_batch=8)
+    requests = run_queue(queue, repo, ["feat-a", "feat-bad", "feat-b"])
+    statuses = {branch: request["status"] for branch, request in requests.items()}
+
+    check(results, "钩子拒绝: 被拒绝的分支标记为失败", statuses["feat-bad"] == "failed", statuses)
+    check(results, "钩子拒绝: 其余分支合并", statuses["feat-a"] == "merged" and statuses["feat-b"] == "merged", statuses)
+    check(results, "钩子拒绝: 拆分了批次", queue.stats["splits"] >= 1, queue.stats)
+
+def main():
+    root = tempfile.mkdtemp(prefix="git-merge-queue-check-", dir=get_cli_option("--workdir"))
+    results = []
+    try:
+        for check_function in (check_batch, check_push_retry, check_hook_rejection):
+            check_function(root, results)
+    finally:
+        if "--keep" in sys.argv:
+            log(f"检查目录: {root}")
+        else:
+            shutil.rmtree(root, ignore_errors=True)
+
+    log(f"{sum(results)}/{len(results)} 项通过")
+    sys.exit(0 if all(results) else 1)
+
+if __name__ == "__main__":
+    main()